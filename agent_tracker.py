@@ -0,0 +1,124 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+# Backoff stops doubling after this many failed probes
+MAX_BACKOFF_DOUBLINGS = 6
+
+
+class AgentStats(object):
+
+    __slots__ = ["srtt", "rttvar", "failures", "retry_at"]
+
+    def __init__(self):
+        self.srtt = None
+        self.rttvar = None
+        self.failures = 0
+        self.retry_at = 0
+
+
+class AgentTracker(object):
+
+    """ Keeps track of how quickly agents answer and how often they don't
+
+    Round trip times are smoothed the same way TCP does (RFC 6298) to derive
+    a timeout for each agent. Once an agent has failed failure_threshold
+    times in a row it is skipped, and only probed again after a backoff that
+    doubles with every failed probe.
+    """
+
+    def __init__(self, min_timeout, failure_threshold, backoff,
+                 max_agents=10000):
+        """ Create a tracker
+
+        Args:
+            min_timeout (float): lowest timeout handed out, in seconds
+            failure_threshold (int): consecutive failures before an agent is
+                skipped, 0 never skips agents
+            backoff (float): seconds an agent is first skipped for
+            max_agents (int): agents remembered, the least recently used
+                is forgotten first
+        """
+        self._min_timeout = min_timeout
+        self._failure_threshold = failure_threshold
+        self._backoff = backoff
+        self._max_agents = max_agents
+        self._agents = OrderedDict()
+        self._lock = Lock()
+
+    def _stats(self, agent):
+        stats = self._agents.get(agent)
+        if stats is None:
+            stats = self._agents[agent] = AgentStats()
+            if len(self._agents) > self._max_agents:
+                self._agents.popitem(last=False)
+        else:
+            self._agents.move_to_end(agent)
+        return stats
+
+    def timeout(self, agent, default):
+        """ The timeout to use for an agent, never more than default """
+        stats = self._agents.get(agent)
+        if stats is None or stats.srtt is None:
+            return default
+        timeout = max(stats.srtt + 4 * stats.rttvar, self._min_timeout)
+        # Rounded so agents don't each end up with their own transport
+        return min(round(timeout, 1), default)
+
+    def allow(self, agent):
+        """ Whether a request to an agent should be made right now """
+        if not self._failure_threshold:
+            return True
+        with self._lock:
+            stats = self._agents.get(agent)
+            if stats is None or stats.failures < self._failure_threshold:
+                return True
+            now = monotonic()
+            if now < stats.retry_at:
+                return False
+            # Let this request through as a probe, hold back the others
+            # until it has an answer
+            stats.retry_at = now + self._backoff_time(stats)
+            return True
+
+    def is_open(self, agent):
+        """ Whether an agent is currently being skipped """
+        stats = self._agents.get(agent)
+        return bool(self._failure_threshold and stats and
+                    stats.failures >= self._failure_threshold)
+
+    def success(self, agent, rtt):
+        with self._lock:
+            stats = self._stats(agent)
+            stats.failures = 0
+            if stats.srtt is None:
+                stats.srtt = rtt
+                stats.rttvar = rtt / 2
+            else:
+                stats.rttvar = 0.75 * stats.rttvar + \
+                    0.25 * abs(stats.srtt - rtt)
+                stats.srtt = 0.875 * stats.srtt + 0.125 * rtt
+
+    def failure(self, agent):
+        with self._lock:
+            stats = self._stats(agent)
+            stats.failures += 1
+            if self._failure_threshold and \
+                    stats.failures >= self._failure_threshold:
+                stats.retry_at = monotonic() + self._backoff_time(stats)
+
+    def _backoff_time(self, stats):
+        doublings = min(stats.failures - self._failure_threshold,
+                        MAX_BACKOFF_DOUBLINGS)
+        return self._backoff * 2 ** max(doublings, 0)
+
+    def stats(self):
+        """ Returns a dictionary of the tracked agents """
+        return {
+            "{}:{}".format(*agent) if isinstance(agent, tuple) else
+            str(agent): {
+                "srtt": stats.srtt,
+                "rttvar": stats.rttvar,
+                "failures": stats.failures,
+                "open": self.is_open(agent)
+            } for agent, stats in list(self._agents.items())}
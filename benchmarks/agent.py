@@ -0,0 +1,261 @@
+""" A simulated SNMP agent to benchmark the blocks against
+
+It answers v1 and v2c GET, GETNEXT and GETBULK requests from a generated
+MIB: the system group, and an ifTable of as many rows as asked for, whose
+octet counters go up with time. Responses can be delayed, and requests
+dropped, to see how the blocks behave with a slow or lossy network.
+
+The agent runs on a thread of its own, and so shares the interpreter with
+whatever is benchmarked. To keep it out of the way, run it in another
+process:
+
+    python -m snmp.benchmarks.agent [--port 16161] [--rows 100]
+"""
+import argparse
+import heapq
+import random
+import socket
+from bisect import bisect_right
+from threading import Condition, Thread
+from time import monotonic
+
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto import api, rfc1905
+
+SYSTEM = (1, 3, 6, 1, 2, 1, 1)
+IF_NUMBER = (1, 3, 6, 1, 2, 1, 2, 1, 0)
+IF_ENTRY = (1, 3, 6, 1, 2, 1, 2, 2, 1)
+IF_DESCR = IF_ENTRY + (2,)
+IF_IN_OCTETS = IF_ENTRY + (10,)
+IF_OUT_OCTETS = IF_ENTRY + (16,)
+SYS_UP_TIME = SYSTEM + (3, 0)
+SYS_NAME = SYSTEM + (5, 0)
+
+# Most var binds in a GETBULK response, keeps responses in a datagram
+MAX_BULK_VAR_BINDS = 1000
+# v1 error status of requests for OIDs the agent doesn't have
+NO_SUCH_NAME = 2
+
+
+class SimulatedAgent(object):
+
+    """ Answers SNMP requests on a UDP port from a generated MIB """
+
+    def __init__(self, host='127.0.0.1', port=0, rows=100, latency=0,
+                 loss=0, community='public', seed=None):
+        """ Create an agent
+
+        Args:
+            host (str): the address to listen on
+            port (int): the port to listen on, 0 for any free port
+            rows (int): rows of the ifTable
+            latency (float): seconds every response is delayed by
+            loss (float): share of requests dropped, from 0 to 1
+            community (str): the community requests must have
+            seed (int): seed of the random drops
+        """
+        self.rows = rows
+        self._latency = latency
+        self._loss = loss
+        self._community = community
+        self._random = random.Random(seed)
+        self._started = monotonic()
+        self._names, self._values = self._build_mib(rows)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self._socket.settimeout(0.2)
+        self.address = self._socket.getsockname()
+        self._delayed = []
+        self._delayed_ready = Condition()
+        self._running = False
+        self._threads = []
+        self.requests = 0
+        self.dropped = 0
+
+    def _build_mib(self, rows):
+        v2c = api.protoModules[api.protoVersion2c]
+        mib = {
+            SYSTEM + (1, 0): v2c.OctetString('Simulated agent'),
+            SYSTEM + (2, 0): v2c.ObjectIdentifier((1, 3, 6, 1, 4, 1, 20408)),
+            SYS_UP_TIME: lambda now: v2c.TimeTicks(int(now * 100)),
+            SYS_NAME: v2c.OctetString('simulated'),
+            IF_NUMBER: v2c.Integer(rows),
+        }
+        for index in range(1, rows + 1):
+            mib[IF_ENTRY + (1, index)] = v2c.Integer(index)
+            mib[IF_DESCR + (index,)] = v2c.OctetString(
+                'GigabitEthernet0/{}'.format(index))
+            mib[IF_ENTRY + (3, index)] = v2c.Integer(6)
+            mib[IF_ENTRY + (5, index)] = v2c.Gauge32(1000000000)
+            mib[IF_ENTRY + (8, index)] = v2c.Integer(1)
+            mib[IF_IN_OCTETS + (index,)] = self._counter(v2c, index * 1000)
+            mib[IF_OUT_OCTETS + (index,)] = self._counter(v2c, index * 700)
+        names = sorted(mib)
+        return names, [mib[name] for name in names]
+
+    @staticmethod
+    def _counter(v2c, rate):
+        return lambda now: v2c.Counter32(int(now * rate) % 2 ** 32)
+
+    def start(self):
+        self._running = True
+        self._threads = [Thread(target=self._serve, daemon=True)]
+        if self._latency > 0:
+            self._threads.append(Thread(target=self._send_delayed,
+                                        daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._running = False
+        with self._delayed_ready:
+            self._delayed_ready.notify()
+        for thread in self._threads:
+            thread.join()
+        self._socket.close()
+
+    def stats(self):
+        return {"requests": self.requests, "dropped": self.dropped}
+
+    def _serve(self):
+        while self._running:
+            try:
+                request, address = self._socket.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.requests += 1
+            if self._loss and self._random.random() < self._loss:
+                self.dropped += 1
+                continue
+            try:
+                response = self.respond(request)
+            except Exception:
+                # Not something the agent understands
+                continue
+            if response is None:
+                continue
+            if self._latency > 0:
+                with self._delayed_ready:
+                    heapq.heappush(self._delayed, (
+                        monotonic() + self._latency, self.requests,
+                        response, address))
+                    self._delayed_ready.notify()
+            else:
+                self._socket.sendto(response, address)
+
+    def _send_delayed(self):
+        while self._running:
+            with self._delayed_ready:
+                if not self._delayed:
+                    self._delayed_ready.wait()
+                    continue
+                due = self._delayed[0][0] - monotonic()
+                if due > 0:
+                    self._delayed_ready.wait(due)
+                    continue
+                _, _, response, address = heapq.heappop(self._delayed)
+            try:
+                self._socket.sendto(response, address)
+            except OSError:
+                break
+
+    def respond(self, request):
+        """ The response to a request message, None if there is none """
+        msg_ver = int(api.decodeMessageVersion(request))
+        p_mod = api.protoModules[msg_ver]
+        req_msg, _ = decoder.decode(request, asn1Spec=p_mod.Message())
+        if str(p_mod.apiMessage.getCommunity(req_msg)) != self._community:
+            return None
+        req_pdu = p_mod.apiMessage.getPDU(req_msg)
+        rsp_msg = p_mod.apiMessage.getResponse(req_msg)
+        rsp_pdu = p_mod.apiMessage.getPDU(rsp_msg)
+        now = monotonic() - self._started
+
+        if req_pdu.isSameTypeWith(p_mod.GetRequestPDU()):
+            var_binds = [self._get(p_mod, tuple(oid), now)
+                         for oid, _ in p_mod.apiPDU.getVarBinds(req_pdu)]
+        elif req_pdu.isSameTypeWith(p_mod.GetNextRequestPDU()):
+            var_binds = [self._next(p_mod, tuple(oid), now)
+                         for oid, _ in p_mod.apiPDU.getVarBinds(req_pdu)]
+        elif msg_ver == api.protoVersion2c and \
+                req_pdu.isSameTypeWith(p_mod.GetBulkRequestPDU()):
+            var_binds = self._bulk(p_mod, req_pdu, now)
+        else:
+            return None
+
+        missing = [index for index, (_, value) in enumerate(var_binds)
+                   if value is None]
+        if missing and msg_ver == api.protoVersion1:
+            p_mod.apiPDU.setErrorStatus(rsp_pdu, NO_SUCH_NAME)
+            p_mod.apiPDU.setErrorIndex(rsp_pdu, missing[0] + 1)
+            var_binds = p_mod.apiPDU.getVarBinds(req_pdu)
+        p_mod.apiPDU.setVarBinds(rsp_pdu, var_binds)
+        return encoder.encode(rsp_msg)
+
+    def _value(self, position, now):
+        value = self._values[position]
+        return value(now) if callable(value) else value
+
+    def _get(self, p_mod, oid, now):
+        position = bisect_right(self._names, oid) - 1
+        if position >= 0 and self._names[position] == oid:
+            return oid, self._value(position, now)
+        if p_mod is api.protoModules[api.protoVersion1]:
+            return oid, None
+        return oid, rfc1905.noSuchInstance
+
+    def _next(self, p_mod, oid, now):
+        position = bisect_right(self._names, oid)
+        if position < len(self._names):
+            return self._names[position], self._value(position, now)
+        if p_mod is api.protoModules[api.protoVersion1]:
+            return oid, None
+        return oid, rfc1905.endOfMibView
+
+    def _bulk(self, p_mod, req_pdu, now):
+        names = [tuple(oid) for oid, _ in
+                 p_mod.apiBulkPDU.getVarBinds(req_pdu)]
+        non_repeaters = min(
+            int(p_mod.apiBulkPDU.getNonRepeaters(req_pdu)), len(names))
+        repeaters = names[non_repeaters:]
+        var_binds = [self._next(p_mod, oid, now)
+                     for oid in names[:non_repeaters]]
+        repetitions = int(p_mod.apiBulkPDU.getMaxRepetitions(req_pdu))
+        if repeaters:
+            repetitions = min(repetitions, max(
+                (MAX_BULK_VAR_BINDS - len(var_binds)) // len(repeaters), 1))
+        else:
+            repetitions = 0
+        for _ in range(repetitions):
+            row = [self._next(p_mod, oid, now) for oid in repeaters]
+            var_binds.extend(row)
+            repeaters = [name for name, _ in row]
+        return var_binds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=16161)
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0,
+                        help='milliseconds responses are delayed by')
+    parser.add_argument('--loss', type=float, default=0,
+                        help='percentage of requests dropped')
+    args = parser.parse_args()
+    agent = SimulatedAgent(args.host, args.port, args.rows,
+                           args.latency / 1000, args.loss / 100)
+    agent.start()
+    print("Agent listening on {}:{} with {} rows".format(
+        agent.address[0], agent.address[1], args.rows))
+    try:
+        while True:
+            agent._threads[0].join(1)
+    except KeyboardInterrupt:
+        agent.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+""" Benchmarks SNMPGet, SNMPWalk and SNMPTrap against a simulated agent
+
+Run from the directory holding this block's package, e.g.
+
+    python -m snmp.benchmarks.blocks [--rows 100] [--latency 5] [--loss 1]
+
+SNMPGet and SNMPWalk poll an ifTable of --rows rows on a simulated agent,
+SNMPTrap receives traps from a trap blaster. Each benchmark reports requests,
+walked rows or traps per second, the p50 and p99 latency, and the peak
+memory of the process. A poll's latency is that of a process_signals call
+with --batch signals, a trap's is the time from sending it to its signal.
+
+The agent runs in this process unless --agent points to one started with
+`python -m snmp.benchmarks.agent`, which keeps it from competing with the
+blocks for the interpreter.
+"""
+import argparse
+import resource
+from threading import Lock
+from time import monotonic, sleep
+
+from nio.signal.base import Signal
+from nio.testing.block_test_case import NIOBlockTestCase
+
+from ..snmp_get_block import SNMPGet
+from ..snmp_trap_block import SNMPTrap
+from ..snmp_walk_block import SNMPWalk
+from .agent import IF_DESCR, IF_IN_OCTETS, IF_OUT_OCTETS, SYS_UP_TIME, \
+    SimulatedAgent
+from .trap_blaster import TrapBlaster
+
+# Seconds without a new trap signal before the trap benchmark gives up
+TRAP_IDLE_TIMEOUT = 2
+
+
+class BenchmarkCase(NIOBlockTestCase):
+
+    """ Runs blocks the way the tests do, counting their signals instead of
+    keeping them
+    """
+
+    def __init__(self):
+        super().__init__('runTest')
+        self.on_signals = None
+        self.notified = 0
+
+    def runTest(self):
+        pass
+
+    def _internal_signals_notified(self, block, signals, output_id):
+        self.notified += len(signals)
+        if self.on_signals:
+            self.on_signals(signals)
+
+
+def percentile(values, share):
+    """ The value below which share of the values are, nearest rank """
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def peak_rss():
+    """ Peak resident memory of the process in MB """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def report(name, rate, unit, latencies, memory_before, extra=''):
+    print("{:5} {:10.0f} {:10}  p50 {:8.2f} ms  p99 {:8.2f} ms  "
+          "peak RSS {:6.1f} MB (+{:.1f}){}".format(
+              name, rate, unit,
+              percentile(latencies, 0.5) * 1000,
+              percentile(latencies, 0.99) * 1000,
+              peak_rss(), peak_rss() - memory_before, extra))
+
+
+def oid(parts):
+    return '.'.join(map(str, parts))
+
+
+def poll(block, polls, batch):
+    """ Process polls of batch signals, returns the seconds taken and the
+    latency of each poll
+    """
+    latencies = []
+    started = monotonic()
+    for _ in range(polls):
+        poll_started = monotonic()
+        block.process_signals([Signal() for _ in range(batch)])
+        latencies.append(monotonic() - poll_started)
+    return monotonic() - started, latencies
+
+
+def poll_properties(args, agent_address):
+    return {
+        "agent_host": agent_address[0],
+        "agent_port": agent_address[1],
+        "timeout": {"seconds": args.timeout},
+        "retries": args.retries,
+        "asynchronous": args.asynchronous,
+        "max_concurrency": args.concurrency,
+        "log_level": "WARNING"
+    }
+
+
+def benchmark_get(case, args, agent_address):
+    block = SNMPGet()
+    properties = poll_properties(args, agent_address)
+    properties["oids"] = [{"oid": oid(SYS_UP_TIME)}] + [
+        {"oid": oid(IF_IN_OCTETS + (index,))}
+        for index in range(1, args.get_oids)]
+    memory_before = peak_rss()
+    case.configure_block(block, properties)
+    block.start()
+    case.notified = 0
+    polls = max(args.requests // args.batch, 1)
+    elapsed, latencies = poll(block, polls, args.batch)
+    block.stop()
+    report("get", polls * args.batch / elapsed, "requests/s", latencies,
+           memory_before, "  {}/{} answered".format(
+               case.notified, polls * args.batch))
+
+
+def benchmark_walk(case, args, agent_address):
+    block = SNMPWalk()
+    properties = poll_properties(args, agent_address)
+    properties["oids"] = [{"oid": oid(column)} for column in
+                          (IF_DESCR, IF_IN_OCTETS, IF_OUT_OCTETS)]
+    properties["bulk_walk"] = args.bulk
+    properties["table_output"] = "rows"
+    memory_before = peak_rss()
+    case.configure_block(block, properties)
+    block.start()
+    case.notified = 0
+    polls = max(args.walks // args.batch, 1)
+    elapsed, latencies = poll(block, polls, args.batch)
+    block.stop()
+    report("walk", polls * args.batch * args.rows / elapsed, "rows/s",
+           latencies, memory_before, "  {} walks of {} rows".format(
+               polls * args.batch, args.rows))
+
+
+def benchmark_trap(case, args):
+    block = SNMPTrap()
+    received = [None] * args.traps
+    lock = Lock()
+
+    def on_signals(signals):
+        now = monotonic()
+        with lock:
+            for signal in signals:
+                sequence = TrapBlaster.sequence(signal.to_dict())
+                if sequence is not None and 0 <= sequence < args.traps:
+                    received[sequence] = now
+
+    memory_before = peak_rss()
+    case.configure_block(block, {
+        "ip_address": "127.0.0.1",
+        "port": args.trap_port,
+        "fast_decode": args.fast_decode,
+        "decode_workers": args.decode_workers,
+        "listeners": args.listeners,
+        "receive_buffer_size": args.receive_buffer,
+        "log_level": "WARNING"
+    })
+    case.on_signals = on_signals
+    case.notified = 0
+    block.start()
+    blaster = TrapBlaster(("127.0.0.1", args.trap_port))
+    sent = blaster.blast(args.traps, args.trap_rate)
+    blaster.close()
+    # Wait for the block to catch up, or to stop making progress
+    notified = -1
+    while case.notified != notified and case.notified < args.traps:
+        notified = case.notified
+        sleep(TRAP_IDLE_TIMEOUT)
+    block.stop()
+    case.on_signals = None
+
+    latencies = [at - sent[sequence]
+                 for sequence, at in enumerate(received) if at is not None]
+    last = max((at for at in received if at is not None), default=None)
+    rate = len(latencies) / (last - sent[0]) if latencies else 0
+    report("trap", rate, "traps/s", latencies, memory_before,
+           "  {}/{} received".format(len(latencies), args.traps))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--benchmarks', default='get,walk,trap',
+                        help='comma separated, of get, walk and trap')
+    parser.add_argument('--agent', help='host:port of an agent to poll '
+                        'instead of starting one')
+    parser.add_argument('--rows', type=int, default=100,
+                        help='rows of the ifTable')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='milliseconds responses are delayed by')
+    parser.add_argument('--loss', type=float, default=0,
+                        help='percentage of requests dropped')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--get-oids', type=int, default=4,
+                        help='OIDs in each get request')
+    parser.add_argument('--walks', type=int, default=50)
+    parser.add_argument('--bulk', action='store_true',
+                        help='walk with GETBULK')
+    parser.add_argument('--batch', type=int, default=1,
+                        help='signals processed per poll')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--asynchronous', action='store_true')
+    parser.add_argument('--timeout', type=float, default=1,
+                        help='seconds before a request is retried')
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--traps', type=int, default=20000)
+    parser.add_argument('--trap-rate', type=float, default=0,
+                        help='traps per second, 0 to send them all at once')
+    parser.add_argument('--trap-port', type=int, default=16262)
+    parser.add_argument('--fast-decode', action='store_true')
+    parser.add_argument('--decode-workers', type=int, default=0)
+    parser.add_argument('--listeners', type=int, default=1)
+    parser.add_argument('--receive-buffer', type=int, default=0,
+                        help='bytes of socket receive buffer, 0 for the '
+                        'system default')
+    args = parser.parse_args()
+    benchmarks = args.benchmarks.split(',')
+
+    agent = None
+    if args.agent:
+        host, port = args.agent.rsplit(':', 1)
+        agent_address = (host, int(port))
+    elif 'get' in benchmarks or 'walk' in benchmarks:
+        agent = SimulatedAgent(rows=args.rows, latency=args.latency / 1000,
+                               loss=args.loss / 100, seed=0)
+        agent.start()
+        agent_address = agent.address
+
+    case = BenchmarkCase()
+    case.setUp()
+    try:
+        if 'get' in benchmarks:
+            benchmark_get(case, args, agent_address)
+        if 'walk' in benchmarks:
+            benchmark_walk(case, args, agent_address)
+        if 'trap' in benchmarks:
+            benchmark_trap(case, args)
+    finally:
+        case.tearDown()
+        if agent:
+            agent.stop()
+            print("agent: {requests} requests, {dropped} dropped".format(
+                **agent.stats()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+""" Sends numbered SNMP traps to a trap receiver, as fast as it can or at a
+given rate
+
+Every trap carries its sequence number in a var bind, so whoever receives the
+traps can tell which ones were lost and how long each one took.
+
+    python -m snmp.benchmarks.trap_blaster [--port 16262] [--count N]
+"""
+import argparse
+import socket
+from time import monotonic, sleep
+
+from pyasn1.codec.ber import encoder
+from pysnmp.proto import api
+
+# The var bind carrying the sequence number of a trap
+SEQUENCE_OID = '1.3.6.1.4.1.20408.4.1.1.1.0'
+# Added to sequence numbers, so they are always encoded in 4 bytes
+SEQUENCE_BASE = 0x40000000
+LINK_DOWN = (1, 3, 6, 1, 6, 3, 1, 1, 5, 3)
+
+
+class TrapBlaster(object):
+
+    """ Sends v2c traps, patching the sequence number into an encoded one """
+
+    def __init__(self, address, var_binds=5, community='public'):
+        """ Create a blaster
+
+        Args:
+            address (tuple): the (host, port) traps are sent to
+            var_binds (int): var binds of each trap, besides the sysUpTime,
+                snmpTrapOID and sequence number
+            community (str): the community of the traps
+        """
+        self._address = address
+        self._template = self._encode(var_binds, community)
+        placeholder = b'\x02\x04' + SEQUENCE_BASE.to_bytes(4, 'big')
+        self._offset = self._template.index(placeholder) + 2
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sent = []
+
+    @staticmethod
+    def _encode(var_binds, community):
+        v2c = api.protoModules[api.protoVersion2c]
+        pdu = v2c.TrapPDU()
+        v2c.apiTrapPDU.setDefaults(pdu)
+        v2c.apiTrapPDU.setVarBinds(pdu, [
+            ((1, 3, 6, 1, 2, 1, 1, 3, 0), v2c.TimeTicks(12345)),
+            ((1, 3, 6, 1, 6, 3, 1, 1, 4, 1, 0),
+             v2c.ObjectIdentifier(LINK_DOWN)),
+            (tuple(int(arc) for arc in SEQUENCE_OID.split('.')),
+             v2c.Integer(SEQUENCE_BASE))] + [
+            ((1, 3, 6, 1, 2, 1, 2, 2, 1, 2, index),
+             v2c.OctetString('GigabitEthernet0/{}'.format(index)))
+            for index in range(1, var_binds + 1)])
+        msg = v2c.Message()
+        v2c.apiMessage.setDefaults(msg)
+        v2c.apiMessage.setCommunity(msg, community)
+        v2c.apiMessage.setPDU(msg, pdu)
+        return encoder.encode(msg)
+
+    def trap(self, sequence):
+        """ The encoded trap with a sequence number """
+        trap = bytearray(self._template)
+        trap[self._offset:self._offset + 4] = \
+            (SEQUENCE_BASE + sequence).to_bytes(4, 'big')
+        return bytes(trap)
+
+    def blast(self, count, rate=0):
+        """ Send count traps, at rate traps per second or as fast as possible
+
+        Returns:
+            list: the time each trap was sent at, by sequence number
+        """
+        self.sent = [0] * count
+        started = monotonic()
+        for sequence in range(count):
+            if rate:
+                delay = started + sequence / rate - monotonic()
+                if delay > 0:
+                    sleep(delay)
+            trap = self.trap(sequence)
+            self.sent[sequence] = monotonic()
+            self._socket.sendto(trap, self._address)
+        return self.sent
+
+    def close(self):
+        self._socket.close()
+
+    @staticmethod
+    def sequence(signal_data):
+        """ The sequence number of a trap's signal, None if it has none """
+        var_bind = signal_data.get('var-binds', {}).get(SEQUENCE_OID)
+        if var_bind is None:
+            return None
+        value = var_bind['value']['simple']['integer-value']
+        return int(value) - SEQUENCE_BASE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=16262)
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--rate', type=float, default=0,
+                        help='traps per second, 0 to send them all at once')
+    parser.add_argument('--var-binds', type=int, default=5)
+    args = parser.parse_args()
+    blaster = TrapBlaster((args.host, args.port), args.var_binds)
+    sent = blaster.blast(args.count, args.rate)
+    blaster.close()
+    if sent:
+        print("Sent {} traps in {:.3f}s".format(
+            len(sent), sent[-1] - sent[0]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+""" Compares the pyasn1 and the fast trap decoders of SNMPTrap
+
+Run from the directory holding this block's package, e.g.
+
+    python -m snmp.benchmarks.trap_decoding [captures] [--repeat N]
+
+captures is a file of recorded datagrams, one hex encoded datagram per line
+(e.g. exported from a packet capture). Without it a mix of v1 and v2c traps
+is generated.
+"""
+import argparse
+import binascii
+import logging
+from timeit import default_timer
+
+from pyasn1.codec.ber import encoder
+from pysnmp.proto import api
+
+from ..snmp_trap_block import SNMPTrap
+
+DOMAIN = (1, 3, 6, 1, 6, 1, 1)
+ADDRESS = ('127.0.0.1', 162)
+
+
+def generated_captures():
+    """ A v2c linkDown trap, a v2c trap with counters and a v1 trap """
+    captures = []
+    v2c = api.protoModules[api.protoVersion2c]
+    for var_binds in (
+            [((1, 3, 6, 1, 2, 1, 1, 3, 0), v2c.TimeTicks(12345)),
+             ((1, 3, 6, 1, 6, 3, 1, 1, 4, 1, 0),
+              v2c.ObjectIdentifier((1, 3, 6, 1, 6, 3, 1, 1, 5, 3))),
+             ((1, 3, 6, 1, 2, 1, 2, 2, 1, 1, 7), v2c.Integer(7)),
+             ((1, 3, 6, 1, 2, 1, 2, 2, 1, 2, 7),
+              v2c.OctetString('GigabitEthernet0/7'))],
+            [((1, 3, 6, 1, 2, 1, 1, 3, 0), v2c.TimeTicks(12345))] +
+            [((1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 6, index),
+              v2c.Counter64(2 ** 40 + index)) for index in range(20)]):
+        pdu = v2c.TrapPDU()
+        v2c.apiTrapPDU.setDefaults(pdu)
+        v2c.apiTrapPDU.setVarBinds(pdu, var_binds)
+        captures.append(_message(v2c, pdu))
+
+    v1 = api.protoModules[api.protoVersion1]
+    pdu = v1.TrapPDU()
+    v1.apiTrapPDU.setDefaults(pdu)
+    v1.apiTrapPDU.setEnterprise(pdu, (1, 3, 6, 1, 4, 1, 9))
+    v1.apiTrapPDU.setAgentAddr(pdu, '10.0.0.1')
+    v1.apiTrapPDU.setGenericTrap(pdu, 2)
+    v1.apiTrapPDU.setVarBinds(pdu, [
+        ((1, 3, 6, 1, 2, 1, 2, 2, 1, 1, 7), v1.Integer(7))])
+    captures.append(_message(v1, pdu))
+    return captures
+
+
+def _message(p_mod, pdu):
+    msg = p_mod.Message()
+    p_mod.apiMessage.setDefaults(msg)
+    p_mod.apiMessage.setCommunity(msg, 'public')
+    p_mod.apiMessage.setPDU(msg, pdu)
+    return encoder.encode(msg)
+
+
+def recorded_captures(path):
+    with open(path) as captures:
+        return [binascii.unhexlify(line.strip())
+                for line in captures if line.strip()]
+
+
+def run(decode, captures, repeat):
+    """ Returns traps decoded per second """
+    started = default_timer()
+    for _ in range(repeat):
+        for capture in captures:
+            decode(DOMAIN, ADDRESS, capture)
+    return repeat * len(captures) / (default_timer() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('captures', nargs='?')
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    captures = recorded_captures(args.captures) if args.captures \
+        else generated_captures()
+    block = SNMPTrap()
+    block.logger = logging.getLogger('trap_decoding')
+    block.logger.disabled = True
+
+    fast = block._decode_fast(DOMAIN, ADDRESS, captures[0])
+    if fast is None:
+        print("First capture isn't supported by the fast decoder, "
+              "it will fall back to pyasn1")
+    elif [s.to_dict() for s in fast] != \
+            [s.to_dict() for s in block._decode(DOMAIN, ADDRESS,
+                                                captures[0])]:
+        print("Decoders disagree on the first capture")
+
+    pyasn1_rate = run(block._decode, captures, args.repeat)
+    fast_rate = run(block._decode_fast, captures, args.repeat)
+    print("{} captures, {} times".format(len(captures), args.repeat))
+    print("pyasn1: {:10.0f} traps/s".format(pyasn1_rate))
+    print("fast:   {:10.0f} traps/s ({:.1f}x)".format(
+        fast_rate, fast_rate / pyasn1_rate))
+
+
+if __name__ == '__main__':
+    main()
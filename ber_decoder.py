@@ -0,0 +1,308 @@
+""" A lightweight BER decoder for SNMP notification messages
+
+pyasn1 builds an object for every element of a message, which is most of the
+time spent on a trap. v1 and v2c Trap and InformRequest messages only use a
+handful of types, so they are read here straight into plain tuples instead.
+Anything else, or anything out of the ordinary, makes decode_messages return
+None so the message can be handed to pyasn1.
+"""
+from collections import namedtuple
+
+SEQUENCE = 0x30
+INTEGER = 0x02
+OCTET_STRING = 0x04
+NULL = 0x05
+OBJECT_IDENTIFIER = 0x06
+
+V1_TRAP = 0xa4
+V2_RESPONSE = 0xa2
+V2_INFORM = 0xa6
+V2_TRAP = 0xa7
+
+INT32_RANGE = (-2 ** 31, 2 ** 31 - 1)
+UINT32_RANGE = (0, 2 ** 32 - 1)
+UINT64_RANGE = (0, 2 ** 64 - 1)
+# Error status and error index of a v2c PDU
+ERROR_RANGE = (0, 2 ** 31 - 1)
+
+IP_ADDRESS = 0x40
+TIME_TICKS = 0x43
+IP_ADDRESS_SIZE = (4, 4)
+
+# For each value tag, where the value sits in the var bind's ASN.1 CHOICE,
+# how it is decoded and the values (or sizes for strings) pyasn1 accepts
+V1_VALUES = {
+    0x02: (("simple", "number"), INTEGER, None),
+    0x04: (("simple", "string"), OCTET_STRING, None),
+    0x06: (("simple", "object"), OBJECT_IDENTIFIER, None),
+    0x05: (("simple", "empty"), NULL, None),
+    0x40: (("application-wide", "address", "internet"),
+           OCTET_STRING, IP_ADDRESS_SIZE),
+    0x41: (("application-wide", "counter"), INTEGER, UINT32_RANGE),
+    0x42: (("application-wide", "gauge"), INTEGER, UINT32_RANGE),
+    0x43: (("application-wide", "ticks"), INTEGER, UINT32_RANGE),
+    0x44: (("application-wide", "arbitrary"), OCTET_STRING, None),
+}
+V2_VALUES = {
+    0x02: (("value", "simple", "integer-value"), INTEGER, INT32_RANGE),
+    0x04: (("value", "simple", "string-value"), OCTET_STRING, (0, 65535)),
+    0x06: (("value", "simple", "objectID-value"), OBJECT_IDENTIFIER, None),
+    0x40: (("value", "application-wide", "ipAddress-value"),
+           OCTET_STRING, IP_ADDRESS_SIZE),
+    0x41: (("value", "application-wide", "counter-value"),
+           INTEGER, UINT32_RANGE),
+    0x42: (("value", "application-wide", "gauge32-value"),
+           INTEGER, UINT32_RANGE),
+    0x43: (("value", "application-wide", "timeticks-value"),
+           INTEGER, UINT32_RANGE),
+    0x44: (("value", "application-wide", "arbitrary-value"),
+           OCTET_STRING, None),
+    0x46: (("value", "application-wide", "big-counter-value"),
+           INTEGER, UINT64_RANGE),
+    0x05: (("unSpecified",), NULL, None),
+    0x80: (("noSuchObject",), NULL, None),
+    0x81: (("noSuchInstance",), NULL, None),
+    0x82: (("endOfMibView",), NULL, None),
+}
+
+# version: 0 for v1, 1 for v2c
+# pdu_type: the PDU's tag, one of V1_TRAP, V2_INFORM or V2_TRAP
+# header: (enterprise, agent address, generic trap, specific trap,
+#   time stamp) for v1, (request id, error status, error index) for v2c
+# var_binds: (oid, path, value) where path is where the value sits in the
+#   var bind's CHOICE, e.g. ("value", "simple", "integer-value")
+Message = namedtuple(
+    'Message', ['version', 'community', 'pdu_type', 'header', 'var_binds'])
+
+
+class BERDecodeError(Exception):
+    pass
+
+
+def _read(data, pos, end, tag=None):
+    """ Read the tag and length of the element at pos
+
+    Returns:
+        tuple: (tag, start of the contents, end of the contents)
+    """
+    if pos + 2 > end:
+        raise BERDecodeError("Truncated element")
+    found = data[pos]
+    if tag is not None and found != tag:
+        raise BERDecodeError("Unexpected tag {:#x}".format(found))
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        size = length & 0x7f
+        # Indefinite and absurdly long lengths are left to pyasn1
+        if not size or size > 4 or pos + size > end:
+            raise BERDecodeError("Unsupported length")
+        length = int.from_bytes(data[pos:pos + size], 'big')
+        pos += size
+    if pos + length > end:
+        raise BERDecodeError("Truncated contents")
+    return found, pos, pos + length
+
+
+def _integer(data, start, stop, limits=None):
+    if start == stop:
+        raise BERDecodeError("Empty integer")
+    value = int.from_bytes(data[start:stop], 'big', signed=True)
+    if limits and not limits[0] <= value <= limits[1]:
+        raise BERDecodeError("Integer out of range")
+    return value
+
+
+def _object_identifier(data, start, stop):
+    if start == stop:
+        raise BERDecodeError("Empty object identifier")
+    arcs = []
+    arc = 0
+    leading = True
+    for byte in data[start:stop]:
+        if leading and byte == 0x80:
+            raise BERDecodeError("Invalid leading byte in sub-identifier")
+        arc = (arc << 7) | (byte & 0x7f)
+        leading = not byte & 0x80
+        if leading:
+            arcs.append(arc)
+            arc = 0
+    if not leading:
+        raise BERDecodeError("Truncated sub-identifier")
+    first = arcs[0]
+    if first < 40:
+        return (0, first) + tuple(arcs[1:])
+    elif first < 80:
+        return (1, first - 40) + tuple(arcs[1:])
+    return (2, first - 80) + tuple(arcs[1:])
+
+
+def _value(data, start, stop, kind, limits):
+    if kind == INTEGER:
+        return _integer(data, start, stop, limits)
+    elif kind == OCTET_STRING:
+        if limits and not limits[0] <= stop - start <= limits[1]:
+            raise BERDecodeError("String size out of range")
+        return bytes(data[start:stop])
+    elif kind == OBJECT_IDENTIFIER:
+        return _object_identifier(data, start, stop)
+    if start != stop:
+        raise BERDecodeError("Non empty null")
+    return b''
+
+
+def _var_binds(data, start, stop, values):
+    var_binds = []
+    pos = start
+    while pos < stop:
+        _, bind_start, bind_stop = _read(data, pos, stop, SEQUENCE)
+        _, oid_start, oid_stop = _read(
+            data, bind_start, bind_stop, OBJECT_IDENTIFIER)
+        tag, value_start, value_stop = _read(data, oid_stop, bind_stop)
+        if value_stop != bind_stop or tag not in values:
+            raise BERDecodeError("Unsupported var bind")
+        path, kind, limits = values[tag]
+        var_binds.append((
+            _object_identifier(data, oid_start, oid_stop), path,
+            _value(data, value_start, value_stop, kind, limits)))
+        pos = bind_stop
+    return var_binds
+
+
+def _message(data, pos, end):
+    _, start, stop = _read(data, pos, end, SEQUENCE)
+    _, version_start, version_stop = _read(data, start, stop, INTEGER)
+    version = _integer(data, version_start, version_stop)
+    _, community_start, community_stop = _read(
+        data, version_stop, stop, OCTET_STRING)
+    pdu_type, pdu_start, pdu_stop = _read(data, community_stop, stop)
+    if pdu_stop != stop:
+        raise BERDecodeError("Trailing data in message")
+
+    fields = []
+    pos = pdu_start
+    if version == 0 and pdu_type == V1_TRAP:
+        _, oid_start, pos = _read(data, pos, pdu_stop, OBJECT_IDENTIFIER)
+        fields.append(_object_identifier(data, oid_start, pos))
+        _, address_start, pos = _read(data, pos, pdu_stop, IP_ADDRESS)
+        fields.append(_value(
+            data, address_start, pos, OCTET_STRING, IP_ADDRESS_SIZE))
+        for tag, limits in ((INTEGER, None), (INTEGER, None),
+                            (TIME_TICKS, UINT32_RANGE)):
+            _, int_start, pos = _read(data, pos, pdu_stop, tag)
+            fields.append(_integer(data, int_start, pos, limits))
+        values = V1_VALUES
+    elif version == 1 and pdu_type in (V2_INFORM, V2_TRAP):
+        for limits in (INT32_RANGE, ERROR_RANGE, ERROR_RANGE):
+            _, int_start, pos = _read(data, pos, pdu_stop, INTEGER)
+            fields.append(_integer(data, int_start, pos, limits))
+        values = V2_VALUES
+    else:
+        raise BERDecodeError("Unsupported message")
+
+    _, binds_start, binds_stop = _read(data, pos, pdu_stop, SEQUENCE)
+    if binds_stop != pdu_stop:
+        raise BERDecodeError("Trailing data in PDU")
+    return Message(
+        version, bytes(data[community_start:community_stop]), pdu_type,
+        tuple(fields), _var_binds(data, binds_start, binds_stop, values)
+    ), stop
+
+
+def decode_messages(whole_msg):
+    """ Decode every message of a datagram
+
+    Args:
+        whole_msg (bytes): the datagram as received
+
+    Returns:
+        list: a Message for each message in the datagram, or None if any
+            of them needs the full decoder
+    """
+    messages = []
+    pos = 0
+    try:
+        data = memoryview(whole_msg)
+        while pos < len(data):
+            message, pos = _message(data, pos, len(data))
+            messages.append(message)
+    except (BERDecodeError, IndexError, TypeError):
+        return None
+    return messages
+
+
+def message_version(whole_msg):
+    """ The version of the first message of a datagram, or None if it
+    doesn't start with a message
+    """
+    try:
+        data = memoryview(whole_msg)
+        _, start, stop = _read(data, 0, len(data), SEQUENCE)
+        _, version_start, version_stop = _read(data, start, stop, INTEGER)
+        return _integer(data, version_start, version_stop)
+    except (BERDecodeError, IndexError, TypeError):
+        return None
+
+
+def usm_engine_id(whole_msg):
+    """ The authoritative engine ID of a v3 USM message, or None
+
+    For a trap it is the engine ID of the agent that sent it, for an inform
+    the engine ID of the receiver.
+    """
+    try:
+        data = memoryview(whole_msg)
+        _, start, stop = _read(data, 0, len(data), SEQUENCE)
+        _, version_start, version_stop = _read(data, start, stop, INTEGER)
+        if _integer(data, version_start, version_stop) != 3:
+            return None
+        _, _, header_stop = _read(data, version_stop, stop, SEQUENCE)
+        _, params_start, params_stop = _read(
+            data, header_stop, stop, OCTET_STRING)
+        _, usm_start, usm_stop = _read(
+            data, params_start, params_stop, SEQUENCE)
+        _, id_start, id_stop = _read(data, usm_start, usm_stop, OCTET_STRING)
+        return bytes(data[id_start:id_stop])
+    except (BERDecodeError, IndexError, TypeError):
+        return None
+
+
+def inform_responses(whole_msg):
+    """ The Responses acknowledging the v2c InformRequests of a datagram
+
+    A Response carries the request ID and var binds of the InformRequest,
+    with an error status and index of 0, which an InformRequest has too.
+    Each Response is then the InformRequest with its PDU tag changed,
+    without decoding any var bind.
+
+    Returns:
+        list: a Response for each InformRequest of the datagram, or None if
+            any message needs the full decoder
+    """
+    responses = []
+    pos = 0
+    try:
+        data = memoryview(whole_msg)
+        while pos < len(data):
+            _, start, stop = _read(data, pos, len(data), SEQUENCE)
+            _, version_start, version_stop = _read(data, start, stop, INTEGER)
+            version = _integer(data, version_start, version_stop)
+            _, _, community_stop = _read(
+                data, version_stop, stop, OCTET_STRING)
+            pdu_type, pdu_start, pdu_stop = _read(data, community_stop, stop)
+            if pdu_stop != stop:
+                raise BERDecodeError("Trailing data in message")
+            if version == 1 and pdu_type == V2_INFORM:
+                _, _, field_stop = _read(data, pdu_start, pdu_stop, INTEGER)
+                for _ in range(2):
+                    _, field_start, field_stop = _read(
+                        data, field_stop, pdu_stop, INTEGER)
+                    if _integer(data, field_start, field_stop):
+                        raise BERDecodeError("Error set in InformRequest")
+                responses.append(
+                    bytes(data[pos:community_stop]) + bytes((V2_RESPONSE,)) +
+                    bytes(data[community_stop + 1:stop]))
+            pos = stop
+    except (BERDecodeError, IndexError, TypeError):
+        return None
+    return responses
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+class ChangeFilter(object):
+
+    """ Tells which polled values changed since they were last reported
+
+    A hash of the last reported value of each OID of each agent is kept, and
+    values that hash the same are held back, until refresh seconds have gone
+    by since the value was last reported. Only max_size values are kept, the
+    least recently polled are forgotten and so reported again.
+    """
+
+    def __init__(self, refresh, max_size=100000):
+        """ Create a filter
+
+        Args:
+            refresh (float): seconds after which a value is reported even
+                if it didn't change, 0 to only ever report changes
+            max_size (int): most values kept track of
+        """
+        self._refresh = refresh
+        self._max_size = max_size
+        self._values = OrderedDict()
+        self._lock = Lock()
+        self.suppressed = 0
+
+    def changed(self, agent, oid, value, now=None):
+        """ Whether a polled value should be reported
+
+        Args:
+            agent (tuple): the agent the value was read from
+            oid (tuple): the value's OID
+            value: the value read
+            now (float): when it was read, defaults to now
+
+        Returns:
+            bool: True if the value changed or is due a refresh
+        """
+        if now is None:
+            now = monotonic()
+        key = (agent, oid)
+        # The type is part of the hash, a Null hashes the same as a 0
+        digest = hash((type(value), value))
+        with self._lock:
+            last = self._values.get(key)
+            if last is not None and last[0] == digest and \
+                    (not self._refresh or now - last[1] < self._refresh):
+                self._values.move_to_end(key)
+                self.suppressed += 1
+                return False
+            self._values[key] = (digest, now)
+            self._values.move_to_end(key)
+            while len(self._values) > self._max_size:
+                self._values.popitem(last=False)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def stats(self):
+        """ Returns a dictionary of the filter's counters """
+        return {
+            "size": len(self._values),
+            "suppressed": self.suppressed
+        }
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from pysnmp.proto import rfc1902
+
+COUNTER32_MODULUS = 2 ** 32
+
+
+class CounterTracker(object):
+
+    """ Turns counter samples into deltas and per second rates
+
+    The last sample of each counter of each agent is kept to compare the
+    next one with. A Counter32 that went down wrapped around, a Counter64
+    can't realistically wrap so going down means its agent restarted. When
+    the agent's sysUpTime is polled along with its counters it tells restarts
+    apart from wraps, and is used as the time between samples. Only max_size
+    samples are kept, the least recently updated are forgotten.
+    """
+
+    def __init__(self, max_size=100000):
+        """ Create a tracker
+
+        Args:
+            max_size (int): most counters kept track of
+        """
+        self._max_size = max_size
+        self._samples = OrderedDict()
+        self._lock = Lock()
+        self.wraps = 0
+        self.resets = 0
+
+    @staticmethod
+    def is_counter(value):
+        return isinstance(value, (rfc1902.Counter32, rfc1902.Counter64))
+
+    def update(self, agent, oid, value, uptime=None, now=None):
+        """ Record a counter sample
+
+        Args:
+            agent (tuple): the agent the counter was read from
+            oid (tuple): the counter's OID
+            value (Counter32 or Counter64): the counter's value
+            uptime (int): the agent's sysUpTime in hundredths of a second
+                when the counter was read, if known
+            now (float): when the counter was read, defaults to now
+
+        Returns:
+            tuple: (delta, rate per second), both None when there is no
+                previous sample to compare with
+        """
+        if now is None:
+            now = monotonic()
+        key = (agent, oid)
+        sample = (int(value), uptime, now)
+        with self._lock:
+            previous = self._samples.get(key)
+            self._samples[key] = sample
+            self._samples.move_to_end(key)
+            while len(self._samples) > self._max_size:
+                self._samples.popitem(last=False)
+            if previous is None:
+                return None, None
+            last_value, last_uptime, last_now = previous
+            restarted = uptime is not None and last_uptime is not None and \
+                uptime < last_uptime
+            delta = sample[0] - last_value
+            if delta < 0 and not restarted and \
+                    isinstance(value, rfc1902.Counter32):
+                delta += COUNTER32_MODULUS
+                self.wraps += 1
+            elif delta < 0 or restarted:
+                self.resets += 1
+                return None, None
+        if uptime is not None and last_uptime is not None:
+            elapsed = (uptime - last_uptime) / 100
+        else:
+            elapsed = now - last_now
+        return delta, delta / elapsed if elapsed > 0 else None
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def stats(self):
+        """ Returns a dictionary of the tracker's counters """
+        return {
+            "size": len(self._samples),
+            "wraps": self.wraps,
+            "resets": self.resets
+        }
@@ -0,0 +1,208 @@
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from threading import Lock
+from time import monotonic
+
+from pysnmp.proto import errind
+
+# Upper bounds of the histogram buckets in seconds, from 0.1ms to about 52s
+BUCKETS = tuple(0.0001 * 2 ** i for i in range(20))
+
+
+class Histogram(object):
+
+    """ Counts values in exponential buckets, so percentiles are known to
+    within a factor of two without keeping the values
+    """
+
+    __slots__ = ["counts", "count", "total", "min", "max"]
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, share):
+        """ The upper bound of the bucket holding the share of values below
+        it, never more than the largest value
+        """
+        if not self.count:
+            return None
+        rank = share * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                break
+        if index >= len(BUCKETS):
+            return self.max
+        return max(min(BUCKETS[index], self.max), self.min)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99)
+        }
+
+
+class AgentMetrics(object):
+
+    __slots__ = ["requests", "timeouts", "errors", "statuses", "var_binds",
+                 "rtt"]
+
+    def __init__(self):
+        self.requests = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.statuses = defaultdict(int)
+        self.var_binds = 0
+        self.rtt = Histogram()
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "error_statuses": dict(self.statuses),
+            "var_binds": self.var_binds,
+            "rtt": self.rtt.to_dict()
+        }
+
+
+class Metrics(object):
+
+    """ Counters and latency histograms of a block, and of each agent it
+    makes requests to
+
+    Every update takes a single lock for a few additions, so the hot paths
+    can afford to record each request and trap. Latencies are in seconds.
+    """
+
+    def __init__(self, max_agents=10000):
+        """ Create the metrics
+
+        Args:
+            max_agents (int): agents kept track of, the least recently used
+                is forgotten first
+        """
+        self._max_agents = max_agents
+        self._lock = Lock()
+        self._counters = defaultdict(int)
+        self._histograms = defaultdict(Histogram)
+        self._agents = OrderedDict()
+        self.in_flight = 0
+        self.started = monotonic()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def observe(self, name, value):
+        with self._lock:
+            self._histograms[name].observe(value)
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def round_trip(self, agent, response, rtt):
+        """ Record a request PDU sent to an agent and how it was answered
+
+        Args:
+            agent (tuple): the (host, port) of the agent
+            response (tuple): the error indication, error status, error
+                index and var binds (or var bind table) of the response
+            rtt (float): seconds until the response, left out of the round
+                trip times if the request timed out
+        """
+        error_indication, error_status = response[0], response[1]
+        var_binds = 0
+        if not error_indication and not error_status:
+            var_binds = sum(len(row) if isinstance(row, list) else 1
+                            for row in response[3])
+        with self._lock:
+            stats = self._agents.get(agent)
+            if stats is None:
+                stats = self._agents[agent] = AgentMetrics()
+                if len(self._agents) > self._max_agents:
+                    self._agents.popitem(last=False)
+            else:
+                self._agents.move_to_end(agent)
+            stats.requests += 1
+            stats.var_binds += var_binds
+            self._counters["pdus_sent"] += 1
+            self._counters["var_binds"] += var_binds
+            if isinstance(error_indication, errind.RequestTimedOut):
+                stats.timeouts += 1
+                self._counters["timeouts"] += 1
+                return
+            if error_indication:
+                stats.errors += 1
+                self._counters["errors"] += 1
+            elif error_status:
+                # Named, e.g. "tooBig", if the status has named values
+                status = error_status.prettyPrint().strip("'") \
+                    if hasattr(error_status, "prettyPrint") \
+                    else str(error_status)
+                stats.statuses[status] += 1
+                self._counters["error_statuses"] += 1
+            stats.rtt.observe(rtt)
+            self._histograms["rtt"].observe(rtt)
+
+    def snapshot(self):
+        """ Returns a dictionary of every metric """
+        with self._lock:
+            return {
+                "uptime": monotonic() - self.started,
+                "in_flight": self.in_flight,
+                "counters": dict(self._counters),
+                "histograms": {name: histogram.to_dict() for name, histogram
+                               in self._histograms.items()},
+                "agents": {
+                    "{}:{}".format(*agent) if isinstance(agent, tuple) else
+                    str(agent): stats.to_dict()
+                    for agent, stats in self._agents.items()}
+            }
+
+
+class TimedSemaphore(object):
+
+    """ An asyncio semaphore recording how long it was waited on, None
+    never waits
+    """
+
+    def __init__(self, semaphore, metrics, name="lock_wait"):
+        self._semaphore = semaphore
+        self._metrics = metrics
+        self._name = name
+
+    async def __aenter__(self):
+        if self._semaphore is None:
+            return
+        started = monotonic()
+        await self._semaphore.acquire()
+        self._metrics.observe(self._name, monotonic() - started)
+
+    async def __aexit__(self, *args):
+        if self._semaphore is not None:
+            self._semaphore.release()
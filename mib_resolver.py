@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from threading import Lock
+from pysnmp.proto import rfc1902, rfc1905
+from pysnmp.smi.rfc1902 import ObjectIdentity
+
+# Values that are never cast to the syntax of their MIB object
+EXCEPTION_VALUES = (rfc1905.UnSpecified, rfc1905.NoSuchObject,
+                    rfc1905.NoSuchInstance, rfc1905.EndOfMibView)
+# Modules an engine loads once it sends its first request, so pysnmp always
+# knew their names when it resolved responses
+ENGINE_MODULES = ('SNMPv2-TM', 'PYSNMP-SOURCE-MIB')
+
+
+class MibResolver(object):
+
+    """ Turns var binds into MIB names and values, remembering the names
+
+    Resolving a var bind through the MIB view walks the MIB tree and casts
+    the value to the syntax of its MIB object. Polling asks for the same OIDs
+    over and over, so the name and syntax found for each OID are kept, and
+    only the value cast is done again. The least recently used OIDs are
+    forgotten once there are more than max_size.
+    """
+
+    def __init__(self, mib_view, max_size=100000):
+        """ Create a resolver
+
+        Args:
+            mib_view (MibViewController): used to resolve unknown OIDs
+            max_size (int): most OIDs remembered, 0 disables caching
+        """
+        self._mib_view = mib_view
+        self._max_size = max_size
+        self._names = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.load_modules(*ENGINE_MODULES)
+
+    def load_modules(self, *modules):
+        """ Load MIB modules up front instead of on first use """
+        with self._lock:
+            self._mib_view.mibBuilder.loadModules(*modules)
+
+    def warm(self, oid):
+        """ Resolve an OID ahead of its first response """
+        self._lookup(tuple(oid))
+
+    def oid(self, identity):
+        """ The OID of an ObjectIdentity, resolved through the MIB view """
+        with self._lock:
+            return identity.resolveWithMib(self._mib_view).getOid()
+
+    def name(self, oid):
+        """ The MIB name of an OID, as pysnmp prints it """
+        return self._lookup(tuple(oid))[0]
+
+    def resolve(self, name, value):
+        """ The MIB name and value of a var bind, as pysnmp prints them
+
+        Args:
+            name (ObjectName): the var bind's OID
+            value: the var bind's value
+
+        Returns:
+            tuple: (name, value) strings
+        """
+        pretty_name, syntax = self._lookup(tuple(name))
+        if syntax is None or isinstance(value, EXCEPTION_VALUES):
+            return pretty_name, value.prettyPrint()
+        try:
+            value = syntax.clone(value)
+        except:
+            # pysnmp leaves values that don't fit the MIB as they are
+            pass
+        if rfc1902.ObjectIdentifier().isSuperTypeOf(
+                value, matchConstraints=False):
+            # OID values are named too
+            return pretty_name, self._lookup(tuple(value))[0]
+        return pretty_name, value.prettyPrint()
+
+    def _lookup(self, oid):
+        with self._lock:
+            entry = self._names.get(oid)
+            if entry is not None:
+                self._names.move_to_end(oid)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            entry = self._resolve(oid)
+            if self._max_size > 0:
+                self._names[oid] = entry
+                while len(self._names) > self._max_size:
+                    self._names.popitem(last=False)
+        return entry
+
+    def _resolve(self, oid):
+        """ Resolve an OID the way pysnmp resolves a response var bind
+
+        Returns:
+            tuple: the OID's name, and the syntax values are cast to, None
+                for MIB nodes that aren't OBJECT-TYPEs
+        """
+        identity = ObjectIdentity(oid).resolveWithMib(self._mib_view)
+        scalar, column = self._mib_view.mibBuilder.importSymbols(
+            'SNMPv2-SMI', 'MibScalar', 'MibTableColumn')
+        node = identity.getMibNode()
+        if isinstance(node, (scalar, column)):
+            return identity.prettyPrint(), node.getSyntax()
+        return identity.prettyPrint(), None
+
+    def clear(self):
+        with self._lock:
+            self._names.clear()
+
+    def stats(self):
+        """ Returns a dictionary of the resolver's counters """
+        return {
+            "size": len(self._names),
+            "hits": self.hits,
+            "misses": self.misses
+        }
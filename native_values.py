@@ -0,0 +1,69 @@
+""" Conversion of SNMP values into plain Python values
+
+prettyPrint formats every value as a string that whoever reads the signal
+has to parse again. The values here are the ones Python already holds inside
+each pyasn1 object, so converting them is cheap.
+"""
+from ipaddress import IPv4Address
+from pyasn1.type import univ
+from pysnmp.proto import rfc1902
+
+
+# Whitespace that doesn't make a string binary
+WHITESPACE = str.maketrans("", "", "\t\r\n")
+
+
+def _text_or_bytes(value):
+    """ Strings are given as text if they are printable UTF-8, bytes if not
+    """
+    octets = value.asOctets()
+    try:
+        text = octets.decode()
+    except UnicodeDecodeError:
+        return octets
+    return text if text.translate(WHITESPACE).isprintable() else octets
+
+
+def _none(value):
+    return None
+
+
+def _ip_address(value):
+    return IPv4Address(value.asOctets())
+
+
+def _pretty(value):
+    return value.prettyPrint()
+
+
+# Checked in order, so subtypes come before the types they extend
+CONVERTERS = (
+    (univ.Null, _none),
+    (rfc1902.IpAddress, _ip_address),
+    (univ.Integer, int),
+    (univ.ObjectIdentifier, tuple),
+    (univ.OctetString, _text_or_bytes),
+)
+
+# The converter found for each type
+_converters = {}
+
+
+def native_value(value):
+    """ The Python value of an SNMP value
+
+    Integers, counters, gauges and time ticks are int, OIDs a tuple of ints,
+    IP addresses an IPv4Address and strings text, or bytes if they aren't
+    printable. Nulls, and the noSuchObject, noSuchInstance and endOfMibView
+    exceptions, are None.
+    """
+    value_type = type(value)
+    converter = _converters.get(value_type)
+    if converter is None:
+        converter = _pretty
+        for base, found in CONVERTERS:
+            if isinstance(value, base):
+                converter = found
+                break
+        _converters[value_type] = converter
+    return converter(value)
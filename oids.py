@@ -0,0 +1,119 @@
+""" Conversions and comparisons of OIDs
+
+OIDs are handled as tuples of ints, the way pyasn1 keeps them, and turned
+into the dotted strings of signals only when a signal is built. The same OIDs
+come back in trap after trap and poll after poll, so both conversions are
+memoized, and a repeated OID costs a single dictionary lookup. Each memo
+holds at most MAX_CACHED OIDs, and starts over once it is full.
+"""
+MAX_CACHED = 100000
+
+_strings = {}
+_tuples = {}
+
+
+def join(parts):
+    """ Dotted string of any sequence, without memoizing it
+
+    For things that look like OIDs but rarely repeat, like transport
+    addresses.
+    """
+    return ".".join(map(str, parts))
+
+
+def to_str(oid):
+    """ The dotted string of an OID tuple, e.g. "1.3.6.1.2.1.1.3.0" """
+    try:
+        return _strings[oid]
+    except KeyError:
+        pass
+    except TypeError:
+        # Not hashable, so not cached
+        return join(oid)
+    string = join(oid)
+    if len(_strings) >= MAX_CACHED:
+        _strings.clear()
+    _strings[oid] = string
+    return string
+
+
+def to_tuple(oid):
+    """ The tuple of a dotted OID string, a leading dot is allowed
+
+    Raises:
+        ValueError: if the string isn't a dotted OID
+    """
+    try:
+        return _tuples[oid]
+    except KeyError:
+        pass
+    parts = oid[1:] if oid.startswith(".") else oid
+    value = tuple(int(arc) for arc in parts.split(".")) if parts else ()
+    if any(arc < 0 for arc in value):
+        raise ValueError("Negative sub-identifier in {}".format(oid))
+    if len(_tuples) >= MAX_CACHED:
+        _tuples.clear()
+    _tuples[oid] = value
+    return value
+
+
+def as_tuple(oid):
+    """ The tuple of an OID given as a tuple, a dotted string or a pyasn1
+    ObjectIdentifier
+    """
+    if type(oid) is tuple:
+        return oid
+    if isinstance(oid, str):
+        return to_tuple(oid)
+    return oid.asTuple()
+
+
+def is_oid(value):
+    """ Whether a value is an OID tuple, a tuple of ints """
+    if not isinstance(value, tuple):
+        return False
+    for arc in value:
+        if not isinstance(arc, int):
+            return False
+    return True
+
+
+def is_prefix(prefix, oid):
+    """ Whether oid is prefix or inside of its subtree """
+    return oid[:len(prefix)] == prefix
+
+
+def index(root, oid):
+    """ The index of oid below root, e.g. the row of a table cell
+
+    Returns:
+        tuple: the sub-identifiers after root, None if oid isn't in the
+            subtree of root
+    """
+    if oid[:len(root)] != root:
+        return None
+    return oid[len(root):]
+
+
+def compare(oid, other):
+    """ Compare two OIDs lexicographically, the order agents walk them in
+
+    Returns:
+        int: -1 if oid comes first, 1 if other does, 0 if they are equal
+    """
+    oid = as_tuple(oid)
+    other = as_tuple(other)
+    return (oid > other) - (oid < other)
+
+
+def clear():
+    _strings.clear()
+    _tuples.clear()
+
+
+def stats():
+    """ Returns a dictionary of the memo sizes """
+    return {
+        "strings": len(_strings),
+        "tuples": len(_tuples)
+    }
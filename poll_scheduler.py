@@ -0,0 +1,110 @@
+from random import uniform
+from threading import Event
+from time import monotonic
+from nio.util.threading import spawn
+
+
+class PollScheduler(object):
+
+    """ Polls a list of targets once per interval, spread out evenly
+
+    Each target gets its own slot in the interval, moved around by a random
+    jitter, so agents aren't all polled in the same instant. Polls are held
+    back further to respect a global and a per target requests per second
+    cap. How late polls start compared to their slot is kept as the
+    schedule's slip.
+    """
+
+    def __init__(self, targets, interval, poll, jitter=0.1, max_rate=0,
+                 max_target_rate=0, logger=None):
+        """ Create a scheduler
+
+        Args:
+            targets (list): hashable targets handed to poll
+            interval (float): seconds between two polls of a target
+            poll (callable): called with a target when it is its turn
+            jitter (float): fraction of a slot a poll can be moved by
+            max_rate (float): most polls per second, 0 for no limit
+            max_target_rate (float): most polls per second of one target,
+                0 for no limit
+            logger: where to warn about the schedule falling behind
+        """
+        self._targets = list(targets)
+        self._interval = interval
+        self._poll = poll
+        self._jitter = jitter
+        self._min_spacing = 1 / max_rate if max_rate else 0
+        self._min_target_spacing = \
+            1 / max_target_rate if max_target_rate else 0
+        self._logger = logger
+        self._stop_event = Event()
+        self._thread = None
+        self._next_poll = 0
+        self._next_target_poll = {}
+        self.cycles = 0
+        self.polls = 0
+        self.overruns = 0
+        self.last_slip = 0
+        self.max_slip = 0
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = spawn(self._run)
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        cycle_start = monotonic()
+        while not self._stop_event.is_set():
+            self._run_cycle(cycle_start)
+            cycle_start += self._interval
+            now = monotonic()
+            if now > cycle_start:
+                # Polls took longer than the interval, start the next cycle
+                # right away instead of trying to catch up
+                self.overruns += 1
+                if self._logger:
+                    self._logger.warning(
+                        "Poll cycle took {:.3f}s longer than the interval"
+                        .format(now - cycle_start))
+                cycle_start = now
+            self._stop_event.wait(cycle_start - now)
+
+    def _run_cycle(self, cycle_start):
+        slot = self._interval / max(len(self._targets), 1)
+        for index, target in enumerate(self._targets):
+            planned = cycle_start + slot * index + \
+                uniform(0, slot * self._jitter)
+            due = max(planned, self._next_poll,
+                      self._next_target_poll.get(target, 0))
+            if self._stop_event.wait(max(due - monotonic(), 0)):
+                return
+            started = monotonic()
+            self._next_poll = started + self._min_spacing
+            self._next_target_poll[target] = \
+                started + self._min_target_spacing
+            self.last_slip = started - planned
+            self.max_slip = max(self.max_slip, self.last_slip)
+            self.polls += 1
+            try:
+                self._poll(target)
+            except:
+                if self._logger:
+                    self._logger.exception(
+                        "Unable to poll {}".format(target))
+        self.cycles += 1
+
+    def stats(self):
+        """ Returns a dictionary of the schedule's counters """
+        return {
+            "targets": len(self._targets),
+            "cycles": self.cycles,
+            "polls": self.polls,
+            "overruns": self.overruns,
+            "last_slip": self.last_slip,
+            "max_slip": self.max_slip
+        }
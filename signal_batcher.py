@@ -0,0 +1,97 @@
+from threading import Condition
+from time import monotonic
+from nio.util.threading import spawn
+
+
+class SignalBatcher(object):
+
+    """ Collects signals and hands them on in batches
+
+    A batch is flushed once it holds max_size signals, or once its first
+    signal has been waiting for max_latency seconds, whichever comes first.
+    """
+
+    def __init__(self, flush, max_size, max_latency):
+        """ Create a batcher
+
+        Args:
+            flush (callable): called with each list of batched signals
+            max_size (int): signals in a batch before it is flushed
+            max_latency (float): seconds a signal waits before its batch is
+                flushed anyway
+        """
+        self._flush = flush
+        self._max_size = max_size
+        self._max_latency = max_latency
+        self._batch = []
+        self._batch_started = None
+        self._condition = Condition()
+        self._running = False
+        self._thread = None
+        self.batches = 0
+        self.signals = 0
+
+    def start(self):
+        self._running = True
+        self._thread = spawn(self._run)
+
+    def stop(self):
+        """ Stop the batcher, flushing whatever is left """
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        with self._condition:
+            batch = self._take()
+        self._emit(batch)
+
+    def add(self, signals):
+        with self._condition:
+            if not self._batch:
+                self._batch_started = monotonic()
+                self._condition.notify()
+            self._batch.extend(signals)
+            if len(self._batch) < self._max_size:
+                return
+            batch = self._take()
+        # Flushed outside of the lock so a slow flush doesn't hold up others
+        self._emit(batch)
+
+    def _take(self):
+        """ Take the current batch, must be called holding the lock """
+        batch, self._batch = self._batch, []
+        if batch:
+            self.batches += 1
+            self.signals += len(batch)
+        return batch
+
+    def _emit(self, batch):
+        if batch:
+            self._flush(batch)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running:
+                    if self._batch:
+                        wait = self._batch_started + self._max_latency - \
+                            monotonic()
+                        if wait <= 0:
+                            break
+                    else:
+                        wait = None
+                    self._condition.wait(wait)
+                if not self._running:
+                    return
+                batch = self._take()
+            self._emit(batch)
+
+    def stats(self):
+        """ Returns a dictionary of the batcher's counters """
+        return {
+            "batches": self.batches,
+            "signals": self.signals,
+            "pending": len(self._batch)
+        }
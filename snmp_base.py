@@ -1,26 +1,128 @@
+import asyncio
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from enum import Enum
+from itertools import groupby
+from operator import attrgetter
+from threading import local
+from time import monotonic
+from nio.command import command
 from nio.util.discovery import not_discoverable
+from nio.util.threading import spawn
+from pysnmp.entity import config
 from pysnmp.entity.rfc3413.oneliner import cmdgen
+from pysnmp.hlapi import asyncio as snmp_asyncio
+from pysnmp.hlapi.varbinds import CommandGeneratorVarBinds
 from nio.block.base import Block
 from nio.signal.base import Signal
 from nio.properties import TimeDeltaProperty, BoolProperty, \
-    ListProperty, IntProperty, Property, PropertyHolder
+    ListProperty, IntProperty, Property, PropertyHolder, SelectProperty, \
+    StringProperty, FloatProperty, ObjectProperty
 from nio.block.mixins.limit_lock.limit_lock import LimitLock
+from . import oids
+from .agent_tracker import AgentTracker
+from .metrics import Metrics, TimedSemaphore
+from .mib_resolver import MibResolver
+from .native_values import native_value
+from .poll_scheduler import PollScheduler
+from .transport_cache import TransportCache
+from .usm_keys import UsmKeyCache
 
 
 class OIDProperty(PropertyHolder):
     oid = Property(title='OID', default='{{ $oid }}')
 
 
+class MibModule(PropertyHolder):
+    module = StringProperty(title='Module', default='')
+
+
+class AuthProtocol(Enum):
+    none = 0
+    md5 = 1
+    sha = 2
+    sha224 = 3
+    sha256 = 4
+    sha384 = 5
+    sha512 = 6
+
+
+class PrivProtocol(Enum):
+    none = 0
+    des = 1
+    des3 = 2
+    aes128 = 3
+    aes192 = 4
+    aes256 = 5
+
+
+AUTH_PROTOCOLS = {
+    AuthProtocol.none: config.usmNoAuthProtocol,
+    AuthProtocol.md5: config.usmHMACMD5AuthProtocol,
+    AuthProtocol.sha: config.usmHMACSHAAuthProtocol,
+    AuthProtocol.sha224: config.usmHMAC128SHA224AuthProtocol,
+    AuthProtocol.sha256: config.usmHMAC192SHA256AuthProtocol,
+    AuthProtocol.sha384: config.usmHMAC256SHA384AuthProtocol,
+    AuthProtocol.sha512: config.usmHMAC384SHA512AuthProtocol
+}
+PRIV_PROTOCOLS = {
+    PrivProtocol.none: config.usmNoPrivProtocol,
+    PrivProtocol.des: config.usmDESPrivProtocol,
+    PrivProtocol.des3: config.usm3DESEDEPrivProtocol,
+    PrivProtocol.aes128: config.usmAesCfb128Protocol,
+    PrivProtocol.aes192: config.usmAesCfb192Protocol,
+    PrivProtocol.aes256: config.usmAesCfb256Protocol
+}
+
+
+class UsmUser(PropertyHolder):
+    user = StringProperty(title='User', default='')
+    auth_protocol = SelectProperty(
+        AuthProtocol, title='Authentication Protocol',
+        default=AuthProtocol.none)
+    auth_key = StringProperty(title='Authentication Key', default='')
+    priv_protocol = SelectProperty(
+        PrivProtocol, title='Privacy Protocol', default=PrivProtocol.none)
+    priv_key = StringProperty(title='Privacy Key', default='')
+
+
+class PollTarget(PropertyHolder):
+    host = StringProperty(title='Host', default='127.0.0.1')
+    port = IntProperty(title='Port', default=161)
+
+
+# Error status of a response that wouldn't fit in a single message
+TOO_BIG = 1
+
+
+class ResultOrder(Enum):
+    completion = 0
+    input = 1
+
+
+class ValueFormat(Enum):
+    string = 0
+    native = 1
+
+
+# A single SNMP request built from an incoming signal
+SNMPRequest = namedtuple(
+    'SNMPRequest', ['index', 'agent', 'transport', 'oids', 'signal'])
+
+
 class SNMPStatusException(Exception):
 
     def __init__(self, status, index):
         super().__init__("SNMP Status: {}, Index: {}".format(status, index))
+        self.status = status
+        self.index = index
 
 
 class SNMPException(Exception):
     pass
 
 
+@command("metrics")
 @not_discoverable
 class SNMPBase(LimitLock, Block):
 
@@ -40,33 +142,326 @@ class SNMPBase(LimitLock, Block):
     lookup_names = BoolProperty(title="Look up OID names", default=False)
     lookup_values = BoolProperty(title="Look up OID values", default=False)
     oids = ListProperty(OIDProperty, title="List of OID", default=[])
+    max_concurrency = IntProperty(
+        title="Max Concurrent Requests", default=1)
+    asynchronous = BoolProperty(
+        title="Asynchronous Requests", default=False)
+    max_outstanding_requests = IntProperty(
+        title="Max Outstanding Asynchronous Requests", default=1000)
+    transport_cache_size = IntProperty(
+        title="Transport Cache Size", default=1000)
+    transport_cache_ttl = TimeDeltaProperty(
+        title="Transport Cache TTL", default={"minutes": 5})
+    result_order = SelectProperty(
+        ResultOrder, title="Result Order", default=ResultOrder.completion)
+    adaptive_timeout = BoolProperty(title="Adaptive Timeout", default=False)
+    min_timeout = TimeDeltaProperty(
+        title="Minimum Adaptive Timeout", default={"milliseconds": 100})
+    failure_threshold = IntProperty(
+        title="Failures Before Skipping Agent", default=0)
+    failure_backoff = TimeDeltaProperty(
+        title="Skipped Agent Backoff", default={"seconds": 30})
+    mib_modules = ListProperty(MibModule, title="MIB Modules", default=[])
+    mib_cache_size = IntProperty(title="MIB Name Cache Size", default=100000)
+    value_format = SelectProperty(
+        ValueFormat, title="Value Format", default=ValueFormat.string)
+    usm = ObjectProperty(UsmUser, title="SNMPv3 User", default=UsmUser())
+    poll_targets = ListProperty(PollTarget, title="Poll Targets", default=[])
+    poll_interval = TimeDeltaProperty(
+        title="Poll Interval", default={"seconds": 0})
+    poll_jitter = FloatProperty(title="Poll Jitter", default=0.1)
+    max_requests_per_second = FloatProperty(
+        title="Max Polls Per Second", default=0)
+    max_agent_requests_per_second = FloatProperty(
+        title="Max Polls Per Second Per Agent", default=0)
 
     def __init__(self):
         super().__init__()
         self._cmdGen = cmdgen.CommandGenerator()
         self._data = None
         self._job = None
+        self._executor = None
+        self._poll_executor = None
+        self._polling = set()
+        self._worker = local()
+        self._loop = None
+        self._loop_thread = None
+        self._snmp_engine = None
+        self._request_slots = None
+        self._transports = None
+        self._agents = None
+        self._scheduler = None
+        self._oids = []
+        self._oid_identities = {}
+        self._mib_resolver = None
+        self._metrics = Metrics()
 
     def configure(self, context):
         """ Configure SNMP by creating data and transport for future
          GET requests
         """
         super().configure(context)
+        self._metrics = Metrics()
         self._data = self._create_data()
+        self._transports = TransportCache(
+            self.transport_cache_size(),
+            self.transport_cache_ttl().total_seconds())
+        self._agents = AgentTracker(
+            self.min_timeout().total_seconds(),
+            self.failure_threshold(),
+            self.failure_backoff().total_seconds())
+        mib_view = CommandGeneratorVarBinds().getMibViewController(
+            self._cmdGen.snmpEngine)
+        self._mib_resolver = MibResolver(mib_view, self.mib_cache_size())
+        modules = [module.module() for module in self.mib_modules()]
+        if modules:
+            try:
+                self._mib_resolver.load_modules(*modules)
+            except:
+                self.logger.exception(
+                    "Unable to load MIB modules {}".format(modules))
+        self._compile_oids(mib_view)
+
+    def _compile_oids(self, mib_view):
+        """ Evaluate the OIDs that aren't expressions once, up front
+
+        Static OIDs are kept as strings in self._oids, expressions as their
+        OIDProperty so they are evaluated against each signal. Static OIDs are
+        also resolved into ObjectIdentity objects that every request reuses,
+        instead of pysnmp parsing the same strings over and over.
+        """
+        self._oids = []
+        self._oid_identities = {}
+        for oid in self.oids():
+            value = oid.oid.value
+            if isinstance(value, str) and "{{" in value and "}}" in value:
+                self._oids.append(oid)
+                continue
+            try:
+                value = oid.oid()
+                identity = snmp_asyncio.ObjectIdentity(
+                    value).resolveWithMib(mib_view)
+                self._mib_resolver.warm(identity.getOid())
+                self._oid_identities[value] = identity
+            except:
+                # Left to fail, and be logged, the same way dynamic OIDs do
+                self._oids.append(oid)
+                continue
+            self._oids.append(value)
+
+    def start(self):
+        super().start()
+        if self.asynchronous():
+            # All requests share one engine, and therefore one socket,
+            # running on an event loop owned by this block
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = spawn(self._loop.run_forever)
+            asyncio.run_coroutine_threadsafe(
+                self._start_engine(), self._loop).result()
+        elif self.max_concurrency() > 1:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency(),
+                initializer=self._init_worker)
+        if self.poll_interval().total_seconds() and self.poll_targets():
+            if not self._loop and not self._executor:
+                # Polls are made off the scheduler's thread so that a slow
+                # agent doesn't hold up the polls scheduled after it
+                self._polling = set()
+                self._poll_executor = ThreadPoolExecutor(
+                    max_workers=1, initializer=self._init_worker)
+            self._scheduler = PollScheduler(
+                [(target.host(), target.port())
+                 for target in self.poll_targets()],
+                self.poll_interval().total_seconds(),
+                self._poll,
+                jitter=self.poll_jitter(),
+                max_rate=self.max_requests_per_second(),
+                max_target_rate=self.max_agent_requests_per_second(),
+                logger=self.logger)
+            self._scheduler.start()
+
+    def stop(self):
+        if self._scheduler:
+            self._scheduler.stop()
+            self._scheduler = None
+        if self._poll_executor:
+            self._poll_executor.shutdown(wait=False)
+            self._poll_executor = None
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._stop_engine)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop = None
+            self._loop_thread = None
+        super().stop()
+
+    def metrics(self):
+        """ Returns the block's request metrics, along with the stats of
+        what it keeps track of
+        """
+        metrics = self._metrics.snapshot()
+        if self._transports is not None:
+            metrics.update(self._component_stats())
+        return metrics
+
+    def _component_stats(self):
+        stats = {
+            "transport_cache": self._transports.stats(),
+            "agent_tracker": self._agents.stats(),
+            "mib_resolver": self._mib_resolver.stats(),
+            "oids": oids.stats()
+        }
+        if self._scheduler:
+            stats["poll_scheduler"] = self._scheduler.stats()
+        if isinstance(self._data, UsmKeyCache):
+            stats["usm_keys"] = self._data.stats()
+        return stats
+
+    async def _start_engine(self):
+        """ Create the engine from the event loop it will run on """
+        self._snmp_engine = snmp_asyncio.SnmpEngine()
+        limit = self.max_outstanding_requests()
+        self._request_slots = TimedSemaphore(
+            asyncio.Semaphore(limit) if limit > 0 else None, self._metrics)
+
+    def _stop_engine(self):
+        if self._snmp_engine.transportDispatcher:
+            self._snmp_engine.transportDispatcher.closeDispatcher()
+        self._snmp_engine = None
+        self._loop.stop()
 
     def process_signals(self, signals, input_id='default'):
-        for signal in signals:
+        requests = [request for request in (
+            self._process_signal(signal, index)
+            for index, signal in enumerate(signals)) if request]
+        request_groups = [agent_requests for agent_requests in
+                          self._group_requests(requests)
+                          if self._allow(agent_requests[0])]
+        if not request_groups:
+            return
+
+        results = []
+
+        def on_result(request, var_binds):
+            if self.result_order() is ResultOrder.input:
+                results.append((request, var_binds))
+            else:
+                self._handle_result(request, var_binds)
+
+        wait(self._execute(request_groups, on_result))
+        for request, var_binds in sorted(results, key=lambda r: r[0].index):
+            self._handle_result(request, var_binds)
+
+    def _group_requests(self, requests):
+        """ Split requests into lists, each going to a single agent
+
+        Every request to an agent shares a list when requests are made
+        concurrently, so the agent is served by a single worker. Requests
+        made one at a time keep the order they came in, only neighbouring
+        requests to an agent share a list.
+        """
+        if not self._group_by_agent():
+            return [list(agent_requests) for _, agent_requests in
+                    groupby(requests, key=attrgetter("agent"))]
+        request_groups = OrderedDict()
+        for request in requests:
+            request_groups.setdefault(request.agent, []).append(request)
+        return list(request_groups.values())
+
+    def _group_by_agent(self):
+        """ Whether every request to an agent is executed together """
+        return self._loop is not None or self._executor is not None
+
+    def _poll(self, agent):
+        """ Poll an agent when the scheduler says it is its turn """
+        host, port = agent
+        request = self._process_signal(
+            Signal({"agent_host": host, "agent_port": port}), agent=agent)
+        if not request or not self._allow(request):
+            return
+        if not self._poll_executor:
+            # Don't wait on the result, the scheduler has more polls to make
+            self._execute([[request]], self._handle_result)
+        elif agent in self._polling:
+            self.logger.debug(
+                "Skipping poll of {}, its last poll is still running".format(
+                    agent))
+            self._metrics.increment("polls_skipped")
+        else:
+            self._polling.add(agent)
+            self._poll_executor.submit(
+                self._execute_poll, monotonic(), request)
+
+    def _execute_poll(self, queued, request):
+        """ Execute a poll's request on the poll worker """
+        try:
+            self._execute_queued(queued, [request], self._handle_result)
+        except:
+            # Exceptions are already logged inside of the request
+            pass
+        finally:
+            self._polling.discard(request.agent)
+
+    def _allow(self, request):
+        """ Whether requests to the agent of a request should be made """
+        if self._agents.allow(request.transport.transportAddr):
+            return True
+        self.logger.debug(
+            "Skipping requests to unresponsive agent {}".format(
+                request.agent))
+        return False
+
+    def _execute(self, request_groups, on_result):
+        """ Execute lists of requests, each list going to a single agent
+
+        Returns:
+            list: futures of the requests running in the background
+        """
+        if self._loop:
+            return [asyncio.run_coroutine_threadsafe(
+                self._execute_agent_requests_async(agent_requests, on_result),
+                self._loop) for agent_requests in request_groups]
+        elif self._executor:
+            # Each agent is served by a single worker so that one slow agent
+            # only holds up its own requests
+            return [self._executor.submit(
+                self._execute_queued, monotonic(), agent_requests, on_result)
+                for agent_requests in request_groups]
+        for agent_requests in request_groups:
             try:
                 self.execute_with_lock(
-                    self._process_signal, 20, signal=signal)
+                    self._execute_queued, 20,
+                    monotonic(), agent_requests, on_result)
             except:
-                # Exceptions are already logged inside _process_signal
+                # Exceptions are already logged inside of the request
                 # Nothing special needs to happen here
                 pass
+        return []
 
-    def _process_signal(self, signal):
+    def _execute_queued(self, queued, requests, on_result):
+        """ Execute requests that have waited for a worker or the lock since
+        queued
+        """
+        self._metrics.observe("lock_wait", monotonic() - queued)
+        self._execute_agent_requests(requests, on_result)
+
+    def _process_signal(self, signal, index=0, agent=None):
+        """ Build the SNMP request for a signal, None if it can't be made
+
+        Args:
+            signal (Signal): the signal to evaluate OIDs and agent with
+            index (int): position of the signal in its list
+            agent (tuple): (host, port) to use instead of the agent
+                properties
+        """
         valid_oids = []
-        for oid in self.oids():
+        for oid in self._oids:
+            if isinstance(oid, str):
+                valid_oids.append(oid)
+                continue
             try:
                 next_oid = oid.oid(signal)
                 valid_oids.append(next_oid)
@@ -75,42 +470,124 @@ class SNMPBase(LimitLock, Block):
                     "Could not determine OID from {}".format(oid))
         transport = None
         try:
-            host = self.agent_host(signal)
-            port = int(self.agent_port(signal))
-            transport = cmdgen.UdpTransportTarget(
-                (host, port),
-                timeout=self.timeout().total_seconds(),
-                retries=self.retries())
+            host, port = agent or (self.agent_host(signal),
+                                   int(self.agent_port(signal)))
+            transport = self._create_transport(host, port)
         except:
             self.logger.exception(
                 "Could not determine transport for signal: {}".format(signal))
             return
         starting_signal = None if self.exclude_existing() else signal
         if transport and valid_oids:
-            self.execute_request(transport, valid_oids, starting_signal)
+            return SNMPRequest(
+                index, (host, port), transport, valid_oids, starting_signal)
+
+    def _execute_agent_requests(self, requests, on_result):
+        """ Execute every request for a single agent, one at a time
+
+        Args:
+            requests (list): SNMPRequest tuples sharing the same agent
+            on_result (callable): called with each request and its var binds
+        """
+        for request in requests:
+            var_binds = self._request(request.transport, request.oids)
+            if var_binds is not None:
+                on_result(request, var_binds)
+
+    async def _execute_agent_requests_async(self, requests, on_result):
+        """ Coroutine version of _execute_agent_requests """
+        for request in requests:
+            var_binds = await self._request_async(
+                request.transport, request.oids)
+            if var_binds is not None:
+                on_result(request, var_binds)
+
+    def _create_transport(self, host, port):
+        """ Get a transport target for an agent, reusing a cached one when
+        possible since building one resolves the host name
+        """
+        if self.asynchronous():
+            target_class = snmp_asyncio.UdpTransportTarget
+        else:
+            target_class = cmdgen.UdpTransportTarget
+        timeout = self.timeout().total_seconds()
+        retries = self.retries()
+        transport = self._transports.get(
+            (host, port, timeout, retries),
+            lambda: target_class(
+                (host, port), timeout=timeout, retries=retries))
+        if self.adaptive_timeout():
+            address = transport.transportAddr
+            agent_timeout = self._agents.timeout(address, timeout)
+            if agent_timeout != timeout:
+                # Build from the resolved address, no need to resolve again
+                transport = self._transports.get(
+                    address + (agent_timeout, retries),
+                    lambda: target_class(
+                        address, timeout=agent_timeout, retries=retries))
+        return transport
+
+    def _handle_result(self, request, var_binds):
+        try:
+            self._handle_data(var_binds, request.signal or Signal())
+        except:
+            self.logger.exception(
+                "Unable to handle response from {}".format(request.transport))
 
     def execute_request(self, transport, oids, starting_signal=None):
         """ Executes SNMP GET request
         """
+        result = self._request(transport, oids)
+        if result is not None:
+            self._handle_result(
+                SNMPRequest(0, None, transport, oids, starting_signal),
+                result)
+
+    def _request(self, transport, oids):
+        """ Make a request, returning its var binds or None on failure """
         try:
             self.logger.debug("Make snmp request: {}".format(transport))
             result = self._make_snmp_request(transport, oids)
             self.logger.debug("Handle snmp response: {}".format(result))
-            if starting_signal:
-                self._handle_data(result, starting_signal)
-            else:
-                self._handle_data(result, Signal())
-        except SNMPStatusException:
+            return result
+        except Exception as e:
+            self._log_request_error(e, transport)
+
+    async def _request_async(self, transport, oids):
+        """ Coroutine version of _request, bounded by
+        max_outstanding_requests
+        """
+        async with self._request_slots:
+            try:
+                self.logger.debug("Make snmp request: {}".format(transport))
+                result = await self._make_snmp_request_async(
+                    transport, oids)
+                self.logger.debug("Handle snmp response: {}".format(result))
+                return result
+            except Exception as e:
+                self._log_request_error(e, transport)
+
+    def _log_request_error(self, error, transport):
+        if isinstance(error, SNMPStatusException):
             # TODO: Make this output on status ouptut
             self.logger.exception(
                 "Error status returned for transport: {}".format(transport))
-        except SNMPException:
+        elif isinstance(error, SNMPException):
             self.logger.exception(
                 "Error returned {}".format(transport))
-        except:
+        else:
             self.logger.exception(
                 "Unexpected exception in SNMP {}".format(transport))
 
+    def _init_worker(self):
+        """ Give each worker thread its own generator, they aren't thread safe
+        """
+        self._worker.cmd_gen = cmdgen.CommandGenerator()
+
+    def _command_generator(self):
+        """ The command generator to use from the current thread """
+        return getattr(self._worker, 'cmd_gen', self._cmdGen)
+
     def _create_data(self):
         """ Method to be override in inherited classes
           Returns the data required by cmdGen for executing SNMP GET
@@ -118,10 +595,71 @@ class SNMPBase(LimitLock, Block):
         """
         raise NotImplementedError()
 
+    def _create_usm_keys(self):
+        """ SNMP v3 data, a UsmKeyCache handing out UsmUserData per agent """
+        usm = self.usm()
+        return UsmKeyCache(
+            usm.user(), AUTH_PROTOCOLS[usm.auth_protocol()], usm.auth_key(),
+            PRIV_PROTOCOLS[usm.priv_protocol()], usm.priv_key(),
+            self.transport_cache_size())
+
+    def _auth_data(self, snmp_engine, transport):
+        """ The authentication data to make a request to an agent with
+
+        With SNMP v3, the engine ID an engine discovered for an agent is kept,
+        so every engine is then given keys already localized for the agent.
+        """
+        if not isinstance(self._data, UsmKeyCache):
+            return self._data
+        address = transport.transportAddr
+        engine_id = snmp_engine.messageProcessingSubsystems[
+            3].getPeerEngineInfo(transport.transportDomain, address)[0]
+        if engine_id:
+            self._data.learn(address, engine_id)
+        return self._data.user_data(address)
+
     def _make_snmp_request(self, transport, oids):
         """ Execute the request and handle errors or responses """
-        error_indication, error_status, error_index, var_binds = \
-            self._execute_snmp_request(transport, oids)
+        started = monotonic()
+        self._metrics.request_started()
+        try:
+            response = self._execute_snmp_request(transport, oids)
+        finally:
+            self._metrics.request_finished()
+        self._track_request(transport, response, started)
+        return self._check_response(response)
+
+    async def _make_snmp_request_async(self, transport, oids):
+        """ Coroutine version of _make_snmp_request """
+        started = monotonic()
+        self._metrics.request_started()
+        try:
+            response = await self._execute_snmp_request_async(
+                transport, oids)
+        finally:
+            self._metrics.request_finished()
+        self._track_request(transport, response, started)
+        return self._check_response(response)
+
+    def _track_request(self, transport, response, started):
+        """ Record how a request to an agent went. Blocks whose requests
+        take more than one round trip override this to track each of them
+        """
+        self._track_round_trip(transport, response, started)
+
+    def _track_round_trip(self, transport, response, started):
+        """ Record an agent's round trip time, or that it didn't answer """
+        rtt = monotonic() - started
+        self._metrics.round_trip(transport.transportAddr, response, rtt)
+        if response[0]:
+            self._agents.failure(transport.transportAddr)
+        else:
+            self._agents.success(transport.transportAddr, rtt)
+
+    @staticmethod
+    def _check_response(response):
+        """ Return the var binds of a response, raising if it is an error """
+        error_indication, error_status, error_index, var_binds = response
         # Check for errors
         if error_indication:
             raise SNMPException(error_indication)
@@ -133,13 +671,32 @@ class SNMPBase(LimitLock, Block):
         """ Override this in the child block to make the proper request """
         raise NotImplementedError()
 
+    async def _execute_snmp_request_async(self, transport, oids):
+        """ Override this in the child block to make the proper request
+        using the block's asyncio SNMP engine
+        """
+        raise NotImplementedError()
+
+    def _object_identities(self, oids):
+        """ The OIDs as ObjectIdentity objects, reusing the static ones """
+        return [self._oid_identities.get(oid) or
+                snmp_asyncio.ObjectIdentity(oid) for oid in oids]
+
+    def _object_types(self, oids):
+        return [snmp_asyncio.ObjectType(identity)
+                for identity in self._object_identities(oids)]
+
     def _handle_data(self, var_binds, starting_signal):
         """ Override this in the child block to make the proper request """
         raise NotImplementedError()
 
+    def _resolve(self, var_bind):
+        """ The name and value a var bind is given in output signals """
+        if self.value_format() is ValueFormat.native:
+            return self._mib_resolver.name(var_bind[0]), \
+                native_value(var_bind[1])
+        return self._mib_resolver.resolve(*var_bind)
+
     def _enrich_signal(self, signal, result_tuple):
         """ Enrich a signal with an SNMP result tuple """
-        setattr(
-            signal,
-            result_tuple[0].prettyPrint(),
-            result_tuple[1].prettyPrint())
+        setattr(signal, *self._resolve(result_tuple))
@@ -1,40 +1,270 @@
+from collections import OrderedDict
 from enum import Enum
 from pysnmp.entity.rfc3413.oneliner import cmdgen
+from pysnmp.hlapi import asyncio as snmp_asyncio
+from pysnmp.proto.rfc1902 import TimeTicks
+from nio.signal.base import Signal
 from nio.util.discovery import discoverable
-from nio.properties import SelectProperty, StringProperty
+from nio.properties import SelectProperty, StringProperty, BoolProperty, \
+    IntProperty, TimeDeltaProperty
 from nio.properties.version import VersionProperty
-from .snmp_base import SNMPBase
+from .change_filter import ChangeFilter
+from .counter_tracker import CounterTracker
+from .snmp_base import SNMPBase, SNMPStatusException, TOO_BIG
+
+# sysUpTime.0, which tells when an agent restarted
+SYS_UP_TIME = (1, 3, 6, 1, 2, 1, 1, 3, 0)
 
 
 class SNMPType(Enum):
     SMIv1 = 0
     SMIv2 = 1
+    SMIv3 = 3
 
 
 @discoverable
 class SNMPGet(SNMPBase):
 
-    """ SNMP block supporting SNMP v1 and v2
+    """ SNMP block getting OIDs from agents with SNMP v1, v2 or v3
 
     """
     community = StringProperty(title="Community", default='public')
     snmp_version = SelectProperty(SNMPType, title="SNMP version",
                                   default=SNMPType.SMIv2)
+    batch_requests = BoolProperty(title="Batch Requests", default=False)
+    max_oids_per_request = IntProperty(
+        title="Max OIDs Per Request", default=40)
+    counter_rates = BoolProperty(
+        title="Counter Deltas And Rates", default=False)
+    counter_table_size = IntProperty(
+        title="Counter Table Size", default=100000)
+    changes_only = BoolProperty(title="Only Report Changes", default=False)
+    full_refresh_interval = TimeDeltaProperty(
+        title="Full Refresh Interval", default={"minutes": 10})
+    change_table_size = IntProperty(
+        title="Change Table Size", default=100000)
     version = VersionProperty('0.4.0')
 
+    def __init__(self):
+        super().__init__()
+        self._batch_sizes = {}
+        self._counters = None
+        self._changes = None
+
+    def configure(self, context):
+        super().configure(context)
+        self._batch_sizes = {}
+        if self.counter_rates():
+            self._counters = CounterTracker(self.counter_table_size())
+        if self.changes_only():
+            self._changes = ChangeFilter(
+                self.full_refresh_interval().total_seconds(),
+                self.change_table_size())
+
+    def _component_stats(self):
+        stats = super()._component_stats()
+        if self._counters is not None:
+            stats["counter_tracker"] = self._counters.stats()
+        if self._changes is not None:
+            stats["change_filter"] = self._changes.stats()
+        return stats
+
     def _create_data(self):
-        """ SNMP v1 and v2 use CommunityData
+        """ SNMP v1 and v2 use CommunityData, v3 a USM user
         """
+        if self.snmp_version() is SNMPType.SMIv3:
+            return self._create_usm_keys()
         return cmdgen.CommunityData(
             self.community(), mpModel=self.snmp_version().value)
 
+    def _group_by_agent(self):
+        # A batch holds every request of a list to an agent
+        return self.batch_requests() or super()._group_by_agent()
+
+    def _execute_agent_requests(self, requests, on_result):
+        """ When batching, GET the OIDs of every request to an agent in as
+        few requests as possible
+        """
+        if not self.batch_requests():
+            return super()._execute_agent_requests(requests, on_result)
+        results = {}
+        for oids in self._batches(requests):
+            results.update(zip(oids, self._get_batch(
+                requests[0].agent, requests[0].transport, oids)))
+        self._split_batch(requests, results, on_result)
+
+    async def _execute_agent_requests_async(self, requests, on_result):
+        if not self.batch_requests():
+            return await super()._execute_agent_requests_async(
+                requests, on_result)
+        results = {}
+        for oids in self._batches(requests):
+            results.update(zip(oids, await self._get_batch_async(
+                requests[0].agent, requests[0].transport, oids)))
+        self._split_batch(requests, results, on_result)
+
+    def _batches(self, requests):
+        """ Split the OIDs of the requests into lists no longer than the
+        agent is known to accept, each OID only being asked for once
+        """
+        oids = list(OrderedDict.fromkeys(
+            oid for request in requests for oid in request.oids))
+        size = self._batch_sizes.get(
+            requests[0].agent, max(self.max_oids_per_request(), 1))
+        return [oids[i:i + size] for i in range(0, len(oids), size)]
+
+    def _get_batch(self, agent, transport, oids):
+        """ GET a batch of OIDs, splitting it in half when the response is
+        too big for the agent, and leaving out an OID the agent has an error
+        with, so it doesn't fail the whole batch
+
+        Returns:
+            list: a var bind for each OID, None for those that failed
+        """
+        if not oids:
+            return []
+        try:
+            return self._make_snmp_request(transport, oids)
+        except SNMPStatusException as e:
+            if int(e.status) == TOO_BIG and len(oids) > 1:
+                half = self._shrink_batch(agent, oids)
+                return self._get_batch(agent, transport, oids[:half]) + \
+                    self._get_batch(agent, transport, oids[half:])
+            if len(oids) > 1:
+                bad = self._failed_oid(e, oids)
+                if bad is None:
+                    # No telling which OID failed, GET each on its own
+                    return [var_bind for oid in oids for var_bind in
+                            self._get_batch(agent, transport, [oid])]
+                self._log_request_error(e, transport)
+                rest = self._get_batch(
+                    agent, transport, oids[:bad] + oids[bad + 1:])
+                return rest[:bad] + [None] + rest[bad:]
+            self._log_request_error(e, transport)
+        except Exception as e:
+            self._log_request_error(e, transport)
+        return [None] * len(oids)
+
+    async def _get_batch_async(self, agent, transport, oids):
+        """ Coroutine version of _get_batch """
+        if not oids:
+            return []
+        try:
+            async with self._request_slots:
+                return await self._make_snmp_request_async(transport, oids)
+        except SNMPStatusException as e:
+            if int(e.status) == TOO_BIG and len(oids) > 1:
+                half = self._shrink_batch(agent, oids)
+                return \
+                    await self._get_batch_async(
+                        agent, transport, oids[:half]) + \
+                    await self._get_batch_async(agent, transport, oids[half:])
+            if len(oids) > 1:
+                bad = self._failed_oid(e, oids)
+                if bad is None:
+                    var_binds = []
+                    for oid in oids:
+                        var_binds.extend(await self._get_batch_async(
+                            agent, transport, [oid]))
+                    return var_binds
+                self._log_request_error(e, transport)
+                rest = await self._get_batch_async(
+                    agent, transport, oids[:bad] + oids[bad + 1:])
+                return rest[:bad] + [None] + rest[bad:]
+            self._log_request_error(e, transport)
+        except Exception as e:
+            self._log_request_error(e, transport)
+        return [None] * len(oids)
+
+    @staticmethod
+    def _failed_oid(error, oids):
+        """ The position of the OID an error status is about, None if the
+        agent didn't say
+        """
+        try:
+            bad = int(error.index) - 1
+        except (TypeError, ValueError):
+            return None
+        return bad if 0 <= bad < len(oids) else None
+
+    def _shrink_batch(self, agent, oids):
+        """ Remember that an agent can't handle this many OIDs at once """
+        half = len(oids) // 2
+        self._batch_sizes[agent] = min(
+            half, self._batch_sizes.get(agent, half))
+        self.logger.debug(
+            "Response too big, {} OIDs per request to {}".format(half, agent))
+        return half
+
+    @staticmethod
+    def _split_batch(requests, results, on_result):
+        """ Hand each request the var binds of its own OIDs
+
+        Args:
+            results (dict): the var bind of each OID, None if it failed
+        """
+        for request in requests:
+            request_var_binds = [results.get(oid) for oid in request.oids]
+            if all(var_bind is not None for var_bind in request_var_binds):
+                on_result(request, request_var_binds)
+
     def _execute_snmp_request(self, transport, oids):
-        return self._cmdGen.getCmd(
-            self._data,
+        cmd_gen = self._command_generator()
+        return cmd_gen.getCmd(
+            self._auth_data(cmd_gen.snmpEngine, transport),
             transport,
-            *oids,
+            *self._object_identities(oids),
             lookupNames=self.lookup_names(),
-            lookupValues=self.lookup_values())
+            lookupValues=self.lookup_values(),
+            lookupMib=False)
+
+    async def _execute_snmp_request_async(self, transport, oids):
+        return await snmp_asyncio.getCmd(
+            self._snmp_engine,
+            self._auth_data(self._snmp_engine, transport),
+            transport,
+            snmp_asyncio.ContextData(),
+            *self._object_types(oids), lookupMib=False)
+
+    def _handle_result(self, request, var_binds):
+        if self._counters is None and self._changes is None:
+            return super()._handle_result(request, var_binds)
+        signal = request.signal or Signal()
+        changed = [True] * len(var_binds)
+        try:
+            if self._changes is not None:
+                changed = [self._changes.changed(
+                    request.agent, tuple(name), value)
+                    for name, value in var_binds]
+            if self._counters is not None:
+                self._add_counter_rates(
+                    signal, request.agent, var_binds, changed)
+        except:
+            self.logger.exception(
+                "Unable to compare values with the last poll of {}".format(
+                    request.agent))
+        reported = [var_bind for var_bind, report in zip(var_binds, changed)
+                    if report]
+        if reported:
+            super()._handle_result(request._replace(signal=signal), reported)
+
+    def _add_counter_rates(self, signal, agent, var_binds, reported):
+        """ Add the delta and per second rate of each reported counter since
+        the agent was last polled, as <name>_delta and <name>_rate
+        """
+        uptime = None
+        for name, value in var_binds:
+            if tuple(name) == SYS_UP_TIME and isinstance(value, TimeTicks):
+                uptime = int(value)
+        for (name, value), report in zip(var_binds, reported):
+            if not CounterTracker.is_counter(value):
+                continue
+            delta, rate = self._counters.update(
+                agent, tuple(name), value, uptime)
+            if report:
+                pretty_name = self._mib_resolver.name(name)
+                setattr(signal, pretty_name + "_delta", delta)
+                setattr(signal, pretty_name + "_rate", rate)
 
     def _handle_data(self, var_binds, starting_signal):
         """ Notify signals in the "default" output """
@@ -1,57 +1,249 @@
 from pysnmp.carrier.asynsock.dispatch import AsynsockDispatcher
 from pysnmp.carrier.asynsock.dgram import udp, udp6
-from pyasn1.codec.ber import decoder
+from pyasn1.codec.ber import decoder, encoder
+from pyasn1.type.univ import ObjectIdentifier
 from pysnmp.proto import api
+import socket
 
 from nio.block.terminals import output
 from nio.block.base import Block
+from nio.command import command
 from nio.signal.base import Signal
-from nio.properties import IntProperty, StringProperty, VersionProperty
+from nio.modules.scheduler import Job
+from nio.properties import IntProperty, StringProperty, VersionProperty, \
+    TimeDeltaProperty, BoolProperty, ListProperty, PropertyHolder, \
+    SelectProperty
+from enum import Enum
 from threading import Thread
+from time import monotonic
 
-from . import oid_parser
+from . import oids
+from . import ber_decoder
+from .metrics import Metrics
+from .signal_batcher import SignalBatcher
+from .snmp_base import UsmUser, AUTH_PROTOCOLS, PRIV_PROTOCOLS
+from .trap_dedup import TrapDeduplicator
+from .trap_router import TrapRouter, Route, v1_trap_oid, \
+    SNMP_TRAP_OID as SNMP_TRAP_OID_TUPLE
+from .trap_workers import TrapWorkerPool
+from .usm_keys import UsmKeyCache
+from .usm_receiver import UsmReceiver
 
+# Names of the v1 generic traps, as pyasn1 pretty prints them
+GENERIC_TRAPS = ("'coldStart'", "'warmStart'", "'linkDown'", "'linkUp'",
+                 "'authenticationFailure'", "'egpNeighborLoss'",
+                 "'enterpriseSpecific'")
+# snmpTrapOID.0, the var bind naming a v2c notification
+SNMP_TRAP_OID = "1.3.6.1.6.3.1.1.4.1.0"
 
+
+class DedupVarBind(PropertyHolder):
+    oid = StringProperty(title='OID', default='')
+
+
+class RouteMatch(Enum):
+    trap_oid = 0
+    enterprise = 1
+    var_bind = 2
+    source = 3
+
+
+class RouteAction(Enum):
+    notify = 0
+    drop = 1
+
+
+class TrapRoute(PropertyHolder):
+    name = StringProperty(title='Name', default='')
+    match = SelectProperty(
+        RouteMatch, title='Match', default=RouteMatch.trap_oid)
+    prefix = StringProperty(title='OID Subtree', default='')
+    action = SelectProperty(
+        RouteAction, title='Action', default=RouteAction.notify)
+
+
+@command("metrics")
+@output("stats")
 @output("trap")
 class SNMPTrap(Block):
 
     ip_address = StringProperty(title='IP Address', default='127.0.0.1')
     port = IntProperty(title='Port', default=162)
+    decode_workers = IntProperty(title='Decode Workers', default=0)
+    queue_size = IntProperty(title='Trap Queue Size', default=10000)
+    batch_size = IntProperty(title='Max Batch Size', default=0)
+    batch_latency = TimeDeltaProperty(
+        title='Max Batch Latency', default={"milliseconds": 100})
+    listeners = IntProperty(title='Listener Sockets', default=1)
+    receive_buffer_size = IntProperty(
+        title='Socket Receive Buffer Size', default=0)
+    fast_decode = BoolProperty(title='Fast Decode', default=False)
+    dedup_window = TimeDeltaProperty(
+        title='Duplicate Trap Window', default={"seconds": 0})
+    dedup_var_binds = ListProperty(
+        DedupVarBind, title='Duplicate Trap Var-Binds', default=[])
+    dedup_max_keys = IntProperty(
+        title='Max Duplicate Trap Windows', default=10000)
+    acknowledge_informs = BoolProperty(
+        title='Acknowledge Informs', default=True)
+    usm_users = ListProperty(UsmUser, title='SNMPv3 Users', default=[])
+    usm_max_engines = IntProperty(
+        title='Max SNMPv3 Engine IDs', default=10000)
+    routes = ListProperty(TrapRoute, title='Trap Routes', default=[])
+    metrics_interval = TimeDeltaProperty(
+        title='Metrics Interval', default={"seconds": 0})
+    unrouted_action = SelectProperty(
+        RouteAction, title='Unrouted Traps', default=RouteAction.notify)
     version = VersionProperty("0.4.0")
 
     def __init__(self):
         super().__init__()
-        self._transport_dispatcher = None
-        self._dispatcher_thread = None
+        self._transport_dispatchers = []
+        self._dispatcher_threads = []
+        self._workers = None
+        self._batcher = None
+        self._dedup = None
+        self._dedup_job = None
+        self._dedup_oids = []
+        self._usm_receivers = []
+        self._usm_key_caches = []
+        self._router = None
+        self._metrics = Metrics()
+        self._metrics_job = None
 
     def configure(self, context):
         super().configure(context)
-        self._transport_dispatcher = AsynsockDispatcher()
-        # register trap-receiver callback
-        self._transport_dispatcher.registerRecvCbFun(self._on_trap)
+        self._metrics = Metrics()
+        self._dedup_oids = [var_bind.oid()
+                            for var_bind in self.dedup_var_binds()]
+        self._router = self._create_router()
+        listeners = max(self.listeners(), 1)
+        if listeners > 1 and not hasattr(socket, "SO_REUSEPORT"):
+            self.logger.warning(
+                "SO_REUSEPORT is not supported here, using a single listener")
+            listeners = 1
+        # Each listener gets its own dispatcher, and so its own thread,
+        # the kernel spreads incoming traps over their sockets
+        self._transport_dispatchers = []
+        for _ in range(listeners):
+            transport_dispatcher = AsynsockDispatcher()
+            # register trap-receiver callback
+            transport_dispatcher.registerRecvCbFun(self._on_trap)
+            self._transport_dispatchers.append(transport_dispatcher)
+        self._usm_receivers = self._create_usm_receivers()
         self._register_transports()
 
+    def _create_router(self):
+        """ Compile the routes, None if every trap is simply notified """
+        if not self.routes() and \
+                self.unrouted_action() is RouteAction.notify:
+            return None
+        rules = []
+        for route in self.routes():
+            try:
+                prefix = oids.to_tuple(route.prefix())
+            except ValueError:
+                raise ValueError("Invalid prefix {!r} of route {!r}".format(
+                    route.prefix(), route.name()))
+            rules.append((route.match().name, prefix, Route(
+                route.name() or None, route.action() is RouteAction.drop)))
+        return TrapRouter(rules, Route(
+            None, self.unrouted_action() is RouteAction.drop))
+
+    def _create_usm_receivers(self):
+        """ An SNMPv3 receiver for each dispatcher, if there are users """
+        if not self.usm_users():
+            return []
+        self._usm_key_caches = key_caches = [
+            UsmKeyCache(
+                usm.user(), AUTH_PROTOCOLS[usm.auth_protocol()],
+                usm.auth_key(), PRIV_PROTOCOLS[usm.priv_protocol()],
+                usm.priv_key(), self.usm_max_engines())
+            for usm in self.usm_users()]
+        receivers = []
+        engine_id = None
+        for transport_dispatcher in self._transport_dispatchers:
+            # Listeners share an engine ID, so informs can go to any of them
+            receiver = UsmReceiver(
+                transport_dispatcher, key_caches, self._on_v3_notification,
+                engine_id, self.usm_max_engines())
+            engine_id = receiver.engine_id
+            receivers.append(receiver)
+        return receivers
+
     def _register_transports(self):
-        # UDP/IPv4
-        self._transport_dispatcher.registerTransport(
-            udp.domainName, udp.UdpSocketTransport().openServerMode(
-                (self.ip_address(), self.port())))
-        # UDP/IPv6
-        self._transport_dispatcher.registerTransport(
-            udp6.domainName, udp6.Udp6SocketTransport().openServerMode(
-                ('::1', self.port())))
+        for transport_dispatcher in self._transport_dispatchers:
+            # UDP/IPv4
+            transport_dispatcher.registerTransport(
+                udp.domainName, self._open_server(
+                    udp.UdpSocketTransport(),
+                    (self.ip_address(), self.port())))
+            # UDP/IPv6
+            transport_dispatcher.registerTransport(
+                udp6.domainName, self._open_server(
+                    udp6.Udp6SocketTransport(), ('::1', self.port())))
+
+    def _open_server(self, transport, address):
+        """ Bind a transport's socket, set up to be shared if needed """
+        sock = transport.socket
+        if len(self._transport_dispatchers) > 1:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if self.receive_buffer_size() > 0:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                            self.receive_buffer_size())
+        return transport.openServerMode(address)
 
     def start(self):
         super().start()
-        self._dispatcher_thread = \
-            TrapDispatcherThread(self._transport_dispatcher, self.logger)
-        self._dispatcher_thread.start()
+        if self.dedup_window().total_seconds() > 0:
+            self._dedup = TrapDeduplicator(
+                self.dedup_window().total_seconds(), self.dedup_max_keys())
+            self._dedup_job = Job(
+                self._expire_duplicates, self.dedup_window(), True)
+        if self.batch_size() > 1:
+            self._batcher = SignalBatcher(
+                self._notify_traps, self.batch_size(),
+                self.batch_latency().total_seconds())
+            self._batcher.start()
+        if self.decode_workers() > 0:
+            self._workers = TrapWorkerPool(
+                self._process_trap, self.decode_workers(),
+                self.queue_size(), self.logger)
+            self._workers.start()
+        if self.metrics_interval().total_seconds() > 0:
+            self._metrics_job = Job(
+                self._notify_metrics, self.metrics_interval(), True)
+        self._dispatcher_threads = [
+            TrapDispatcherThread(transport_dispatcher, self.logger)
+            for transport_dispatcher in self._transport_dispatchers]
+        for dispatcher_thread in self._dispatcher_threads:
+            dispatcher_thread.start()
 
     def stop(self):
-        if self._dispatcher_thread:
-            self._dispatcher_thread.stop()
-            self._dispatcher_thread.join()
-            self._dispatcher_thread = None
+        for dispatcher_thread in self._dispatcher_threads:
+            dispatcher_thread.stop()
+        for dispatcher_thread in self._dispatcher_threads:
+            dispatcher_thread.join()
+        self._dispatcher_threads = []
+        if self._metrics_job:
+            self._metrics_job.cancel()
+            self._metrics_job = None
+        for receiver in self._usm_receivers:
+            receiver.close()
+        self._usm_receivers = []
+        if self._workers:
+            self._workers.stop()
+            self._workers = None
+        if self._dedup_job:
+            self._dedup_job.cancel()
+            self._dedup_job = None
+        if self._dedup:
+            # Let the last repeats of open windows through
+            self._emit(self._dedup.expire(force=True))
+            self._dedup = None
+        if self._batcher:
+            self._batcher.stop()
+            self._batcher = None
 
         super().stop()
 
@@ -60,6 +252,256 @@ class SNMPTrap(Block):
         """ This method is called from pysnmp whenever a trap is received
         """
         self.logger.debug('Trap received')
+        self._metrics.increment("received")
+        if self.acknowledge_informs():
+            # Before anything else, so the agent doesn't send it again
+            self._acknowledge_informs(transport_dispatcher, transport_domain,
+                                      transport_address, whole_msg)
+        if self._workers:
+            # Leave decoding to the workers so the socket is read again
+            # as soon as possible
+            if not self._workers.submit((transport_domain, transport_address,
+                                         whole_msg, monotonic())):
+                self.logger.debug('Trap queue is full, dropping trap')
+            return
+        self._process_trap(transport_domain, transport_address, whole_msg)
+
+    def _acknowledge_informs(self, transport_dispatcher, transport_domain,
+                             transport_address, whole_msg):
+        """ Send a Response to each InformRequest of a message """
+        responses = ber_decoder.inform_responses(whole_msg)
+        if responses is None:
+            try:
+                responses = self._build_inform_responses(whole_msg)
+            except:
+                # Decoding the message will report what is wrong with it
+                return
+        for response in responses:
+            transport_dispatcher.sendMessage(
+                response, transport_domain, transport_address)
+        if responses:
+            self._metrics.increment("informs_acknowledged", len(responses))
+
+    @staticmethod
+    def _build_inform_responses(whole_msg):
+        """ Build the Responses to the InformRequests of a message with
+        pyasn1, for those the BER decoder doesn't handle
+        """
+        responses = []
+        while whole_msg:
+            msg_ver = int(api.decodeMessageVersion(whole_msg))
+            if msg_ver != api.protoVersion2c:
+                break
+            p_mod = api.protoModules[msg_ver]
+            req_msg, whole_msg = decoder.decode(
+                whole_msg, asn1Spec=p_mod.Message(),)
+            req_pdu = p_mod.apiMessage.getPDU(req_msg)
+            if req_pdu.isSameTypeWith(p_mod.InformRequestPDU()):
+                rsp_msg = p_mod.apiMessage.getResponse(req_msg)
+                p_mod.apiPDU.setVarBinds(
+                    p_mod.apiMessage.getPDU(rsp_msg),
+                    p_mod.apiPDU.getVarBinds(req_pdu))
+                responses.append(encoder.encode(rsp_msg))
+        return responses
+
+    def _on_v3_notification(self, transport_domain, transport_address, pdu):
+        """ Called by the SNMPv3 receivers with each authenticated
+        notification, informs are already acknowledged
+        """
+        self._metrics.increment("v3_notifications")
+        p_mod = api.protoModules[api.protoVersion2c]
+        var_binds = p_mod.apiPDU.getVarBindList(pdu)
+        route = None
+        if self._router:
+            route = self._route_pdu(
+                transport_address, api.protoVersion2c, p_mod, pdu, var_binds)
+            if route.drop:
+                return
+        self.logger.info('Notification message from %s:%s: ' % (
+            transport_domain, transport_address))
+        signal = Signal({
+            "transport_domain": oids.to_str(transport_domain),
+            "transport_address": oids.join(transport_address),
+            "var-binds": self._get_var_binds_data(var_binds)
+        })
+        if route and route.name:
+            signal.route = route.name
+        self._deliver(transport_address, [signal])
+
+    def _process_trap(self, transport_domain, transport_address, whole_msg,
+                      queued=None):
+        """ Decode a trap message and notify its signals
+
+        queued is when the trap was queued for the workers, if it was
+        """
+        started = monotonic()
+        if queued is not None:
+            self._metrics.observe("queue_wait", started - queued)
+        signals = None
+        try:
+            if self.fast_decode():
+                signals = self._decode_fast(
+                    transport_domain, transport_address, whole_msg)
+            if signals is None:
+                signals = self._decode(
+                    transport_domain, transport_address, whole_msg)
+        except:
+            self._metrics.increment("decode_errors")
+            raise
+        self._metrics.observe("decode", monotonic() - started)
+        self._deliver(transport_address, signals)
+
+    def _deliver(self, transport_address, signals):
+        """ Notify the signals of a message that aren't repeats """
+        if self._dedup:
+            signals = [checked for signal in signals
+                       for checked in self._dedup.check(
+                           self._dedup_key(transport_address, signal),
+                           signal)]
+        self._emit(signals)
+
+    def _emit(self, signals):
+        if len(signals):
+            if self._batcher:
+                self._batcher.add(signals)
+            else:
+                self._notify_traps(signals)
+
+    def _expire_duplicates(self):
+        dedup = self._dedup
+        if dedup:
+            self._emit(dedup.expire())
+
+    def _dedup_key(self, transport_address, signal):
+        """ What makes two traps repeats of each other
+
+        The agent, the notification (snmpTrapOID.0 for v2c, the enterprise
+        and trap numbers for v1) and the values of dedup_var_binds.
+        """
+        var_binds = getattr(signal, "var-binds", None) or {}
+        notification = var_binds.get(SNMP_TRAP_OID) or (
+            getattr(signal, "enterprise", None),
+            getattr(signal, "generic trap", None),
+            getattr(signal, "specific trap", None))
+        return (transport_address[0], repr(notification)) + tuple(
+            repr(var_binds.get(oid)) for oid in self._dedup_oids)
+
+    def _notify_traps(self, signals):
+        self._metrics.increment("notified", len(signals))
+        self.notify_signals(signals, "trap")
+
+    def metrics(self):
+        """ Returns the block's trap metrics, along with the stats of what
+        it keeps track of
+        """
+        metrics = self._metrics.snapshot()
+        # Only requests to agents are in flight
+        del metrics["in_flight"], metrics["agents"]
+        metrics["oids"] = oids.stats()
+        for name, component in (("trap_workers", self._workers),
+                                ("signal_batcher", self._batcher),
+                                ("trap_dedup", self._dedup),
+                                ("trap_router", self._router)):
+            if component is not None:
+                metrics[name] = component.stats()
+        if self._usm_receivers:
+            metrics["usm_receivers"] = [
+                receiver.stats() for receiver in self._usm_receivers]
+            metrics["usm_keys"] = [
+                key_cache.stats() for key_cache in self._usm_key_caches]
+        return metrics
+
+    def _notify_metrics(self):
+        self.notify_signals([Signal(self.metrics())], "stats")
+
+    def _decode_fast(self, transport_domain, transport_address, whole_msg):
+        """ Build the signals of a trap message without pyasn1
+
+        Returns:
+            list: the signals, or None if the message needs the full decoder
+        """
+        messages = ber_decoder.decode_messages(whole_msg)
+        if messages is None:
+            return None
+        signals = []
+        for message in messages:
+            route = None
+            if self._router:
+                route = self._route_message(transport_address, message)
+                if route.drop:
+                    continue
+            self.logger.info('Notification message from %s:%s: ' % (
+                transport_domain, transport_address))
+            signal_data = {
+                "transport_domain": oids.to_str(transport_domain),
+                "transport_address": oids.join(transport_address)
+            }
+            if message.version == 0:
+                enterprise, address, generic, specific, uptime = \
+                    message.header
+                signal_data["enterprise"] = oids.to_str(enterprise)
+                signal_data["agent address"] = oids.join(address)
+                signal_data["generic trap"] = \
+                    GENERIC_TRAPS[generic] \
+                    if 0 <= generic < len(GENERIC_TRAPS) else str(generic)
+                signal_data["specific trap"] = str(specific)
+                signal_data["uptime"] = str(uptime)
+            signal_data["var-binds"] = {
+                oids.to_str(oid): self._get_fast_var_bind_data(
+                    path, value)
+                for oid, path, value in message.var_binds}
+            if route and route.name:
+                signal_data["route"] = route.name
+            signals.append(Signal(signal_data))
+        return signals
+
+    def _route_message(self, transport_address, message):
+        """ The route of a message of the fast decoder """
+        enterprise = trap_oid = None
+        if message.version == 0:
+            enterprise, _, generic, specific, _ = message.header
+            trap_oid = v1_trap_oid(enterprise, generic, specific)
+        else:
+            for oid, _, value in message.var_binds:
+                if oid == SNMP_TRAP_OID_TUPLE and isinstance(value, tuple):
+                    trap_oid = value
+                    break
+        return self._router.route(
+            transport_address[0], trap_oid, enterprise,
+            [oid for oid, _, _ in message.var_binds])
+
+    def _route_pdu(self, transport_address, msg_ver, p_mod, pdu, var_binds):
+        """ The route of a PDU decoded with pyasn1 """
+        enterprise = trap_oid = None
+        var_bind_oids = []
+        if var_binds is not None:
+            var_bind_oids = [item[0].asTuple() for item in var_binds]
+            if msg_ver == api.protoVersion1:
+                enterprise = p_mod.apiTrapPDU.getEnterprise(pdu).asTuple()
+                trap_oid = v1_trap_oid(
+                    enterprise, int(p_mod.apiTrapPDU.getGenericTrap(pdu)),
+                    int(p_mod.apiTrapPDU.getSpecificTrap(pdu)))
+            else:
+                for oid, item in zip(var_bind_oids, var_binds):
+                    if oid == SNMP_TRAP_OID_TUPLE:
+                        value = item[1].getComponent(True)
+                        if isinstance(value, ObjectIdentifier):
+                            trap_oid = value.asTuple()
+                        break
+        return self._router.route(
+            transport_address[0], trap_oid, enterprise, var_bind_oids)
+
+    @staticmethod
+    def _get_fast_var_bind_data(path, value):
+        """ Nest a fast decoded value the way _get_var_bind_data does """
+        if isinstance(value, tuple):
+            value = oids.to_str(value)
+        for name in reversed(path):
+            value = {name: value}
+        return value
+
+    def _decode(self, transport_domain, transport_address, whole_msg):
+        """ Build the signals of a trap message with pyasn1 """
         signals = []
         while whole_msg:
             signal_data = {}
@@ -68,42 +510,56 @@ class SNMPTrap(Block):
                 p_mod = api.protoModules[msg_ver]
             else:
                 self.logger.warning('Unsupported SNMP version %s' % msg_ver)
-                return
+                return []
             req_msg, whole_msg = decoder.decode(
                 whole_msg, asn1Spec=p_mod.Message(),)
 
+            req_pdu = p_mod.apiMessage.getPDU(req_msg)
+            is_trap = req_pdu.isSameTypeWith(p_mod.TrapPDU())
+            var_binds = None
+            if is_trap and msg_ver == api.protoVersion1:
+                var_binds = p_mod.apiTrapPDU.getVarBindList(req_pdu)
+            elif is_trap or msg_ver == api.protoVersion2c and \
+                    req_pdu.isSameTypeWith(p_mod.InformRequestPDU()):
+                var_binds = p_mod.apiPDU.getVarBindList(req_pdu)
+            route = None
+            if self._router:
+                route = self._route_pdu(
+                    transport_address, msg_ver, p_mod, req_pdu, var_binds)
+                if route.drop:
+                    continue
+
             self.logger.info('Notification message from %s:%s: ' % (
                 transport_domain, transport_address))
-            signal_data["transport_domain"] = \
-                str(oid_parser(transport_domain))
-            signal_data["transport_address"] = \
-                str(oid_parser(transport_address))
+            signal_data["transport_domain"] = oids.to_str(transport_domain)
+            signal_data["transport_address"] = oids.join(transport_address)
 
-            req_pdu = p_mod.apiMessage.getPDU(req_msg)
-            if req_pdu.isSameTypeWith(p_mod.TrapPDU()):
-                if msg_ver == api.protoVersion1:
-                    signal_data["enterprise"] = \
-                        p_mod.apiTrapPDU.getEnterprise(req_pdu).prettyPrint()
-                    signal_data["agent address"] = \
-                        p_mod.apiTrapPDU.getAgentAddr(req_pdu).prettyPrint()
-                    signal_data["generic trap"] = \
-                        p_mod.apiTrapPDU.getGenericTrap(req_pdu).prettyPrint()
-                    signal_data["specific trap"] = \
-                        p_mod.apiTrapPDU.getSpecificTrap(req_pdu).prettyPrint()
-                    signal_data["uptime"] = \
-                        p_mod.apiTrapPDU.getTimeStamp(req_pdu).prettyPrint()
-                    var_binds = p_mod.apiTrapPDU.getVarBindList(req_pdu)
-                else:
-                    var_binds = p_mod.apiPDU.getVarBindList(req_pdu)
-                signal_data["var-binds"] = {}
-                for item in var_binds:
-                    oid = item[0]
-                    val = item[1]
-                    signal_data["var-binds"][str(oid_parser(oid._value))] = \
-                        self._get_var_bind_data(val)
+            if is_trap and msg_ver == api.protoVersion1:
+                signal_data["enterprise"] = \
+                    p_mod.apiTrapPDU.getEnterprise(req_pdu).prettyPrint()
+                signal_data["agent address"] = \
+                    p_mod.apiTrapPDU.getAgentAddr(req_pdu).prettyPrint()
+                signal_data["generic trap"] = \
+                    p_mod.apiTrapPDU.getGenericTrap(req_pdu).prettyPrint()
+                signal_data["specific trap"] = \
+                    p_mod.apiTrapPDU.getSpecificTrap(req_pdu).prettyPrint()
+                signal_data["uptime"] = \
+                    p_mod.apiTrapPDU.getTimeStamp(req_pdu).prettyPrint()
+            if var_binds is not None:
+                signal_data["var-binds"] = self._get_var_binds_data(var_binds)
+            if route and route.name:
+                signal_data["route"] = route.name
             signals.append(Signal(signal_data))
-        if len(signals):
-            self.notify_signals(signals, "trap")
+        return signals
+
+    def _get_var_binds_data(self, var_binds):
+        """ The var-binds of a signal, from a PDU's var bind list """
+        data = {}
+        for item in var_binds:
+            oid = item[0]
+            val = item[1]
+            data[oids.to_str(oid._value)] = self._get_var_bind_data(val)
+        return data
 
     def _get_var_bind_data(self, val):
         """ Processes data associated to a given var bind oid
@@ -122,13 +578,15 @@ class SNMPTrap(Block):
                     if component_type is not None:
                         data[component_type.getNameByPosition(idx)] = \
                             self._get_var_bind_data(val._componentValues[idx])
+        elif isinstance(val, ObjectIdentifier):
+            return oids.to_str(val._value)
         elif hasattr(val, "_value"):
-            if oid_parser.validate(val._value):
-                return str(oid_parser(val._value))
+            if oids.is_oid(val._value):
+                return oids.to_str(val._value)
             return val._value
         else:
-            if oid_parser.validate(val):
-                return str(oid_parser(val))
+            if oids.is_oid(val):
+                return oids.to_str(val)
             return str(val)
         return data
 
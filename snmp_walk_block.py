@@ -1,40 +1,372 @@
+from collections import OrderedDict
 from enum import Enum
+from threading import Lock
+from time import monotonic
 from pysnmp.entity.rfc3413.oneliner import cmdgen
+from pysnmp.hlapi import asyncio as snmp_asyncio
+from pysnmp.hlapi import asyncore as snmp_asyncore
+from pysnmp.hlapi.varbinds import CommandGeneratorVarBinds
 from nio.util.discovery import discoverable
-from nio.properties import SelectProperty, StringProperty
+from nio.properties import SelectProperty, StringProperty, BoolProperty, \
+    IntProperty, TimeDeltaProperty
 from nio.properties.version import VersionProperty
-from .snmp_base import SNMPBase
+from nio.signal.base import Signal
+from . import oids
+from .snmp_base import SNMPBase, TOO_BIG
+from .walker import Walker, var_bind_oid
+
+# Most column OIDs of dynamic OIDs whose roots are kept for table_output
+MAX_COLUMN_ROOTS = 10000
 
 
 class SNMPType(Enum):
     SMIv1 = 0
     SMIv2 = 1
+    SMIv3 = 3
+
+
+class TableOutput(Enum):
+    none = 0
+    rows = 1
+    columns = 2
 
 
 @discoverable
 class SNMPWalk(SNMPBase):
 
-    """ SNMP block supporting SNMP v1 and v2
+    """ SNMP block walking agents with SNMP v1, v2 or v3
 
     """
     community = StringProperty(title="Community", default='public')
     snmp_version = SelectProperty(SNMPType, title="SNMP version",
                                   default=SNMPType.SMIv2)
+    bulk_walk = BoolProperty(title="Walk With GETBULK", default=False)
+    non_repeaters = IntProperty(title="Non Repeaters", default=0)
+    max_repetitions = IntProperty(title="Max Repetitions", default=25)
+    rows_per_signal = IntProperty(title="Rows Per Signal", default=0)
+    max_rows = IntProperty(title="Max Rows", default=0)
+    max_duration = TimeDeltaProperty(
+        title="Max Walk Duration", default={"seconds": 0})
+    table_output = SelectProperty(
+        TableOutput, title="Table Output", default=TableOutput.none)
     version = VersionProperty('0.4.0')
 
+    def __init__(self):
+        super().__init__()
+        self._max_repetitions = {}
+        self._static_roots = {}
+        self._column_roots = OrderedDict()
+        self._roots_lock = Lock()
+
+    def configure(self, context):
+        super().configure(context)
+        self._max_repetitions = {}
+        # Static OIDs were resolved when they were compiled
+        self._static_roots = {
+            oid: identity.getOid().asTuple()
+            for oid, identity in self._oid_identities.items()}
+        self._column_roots = OrderedDict()
+        if self.bulk_walk() and self.snmp_version() is SNMPType.SMIv1:
+            self.logger.warning(
+                "GETBULK is not supported by SNMP v1, walking with GETNEXT")
+
     def _create_data(self):
-        """ SNMP v1 and v2 use CommunityData
+        """ SNMP v1 and v2 use CommunityData, v3 a USM user
         """
+        if self.snmp_version() is SNMPType.SMIv3:
+            return self._create_usm_keys()
         return cmdgen.CommunityData(
             self.community(), mpModel=self.snmp_version().value)
 
+    def _execute_agent_requests(self, requests, on_result):
+        """ When streaming, notify the rows of each walk as they arrive """
+        if not self.rows_per_signal():
+            return super()._execute_agent_requests(requests, on_result)
+        for request in requests:
+            on_rows, flush = self._stream_rows(request, on_result)
+            self._metrics.request_started()
+            try:
+                self._check_response(
+                    self._walk(request.transport, request.oids, on_rows))
+                flush()
+            except Exception as e:
+                self._log_request_error(e, request.transport)
+            finally:
+                self._metrics.request_finished()
+
     def _execute_snmp_request(self, transport, oids):
-        return self._cmdGen.nextCmd(
-            self._data,
-            transport,
-            *oids,
-            lookupNames=self.lookup_names(),
-            lookupValues=self.lookup_values())
+        if not self._use_walker():
+            cmd_gen = self._command_generator()
+            return cmd_gen.nextCmd(
+                self._auth_data(cmd_gen.snmpEngine, transport),
+                transport,
+                *self._object_identities(oids),
+                lookupNames=self.lookup_names(),
+                lookupValues=self.lookup_values(),
+                lookupMib=False)
+        var_bind_table = []
+        response = self._walk(transport, oids, var_bind_table.extend)
+        if response[0] or response[1]:
+            return response
+        return None, 0, 0, var_bind_table
+
+    def _walk(self, transport, oids, on_rows):
+        """ Walk the OIDs, handing rows to on_rows as they arrive
+
+        Returns:
+            tuple: the response of the request that failed, or an empty
+                response once the walk is done
+        """
+        snmp_engine = self._command_generator().snmpEngine
+        walker = self._create_walker(snmp_engine, oids)
+        while not walker.done:
+            error_indication, error_status, error_index, table = response = \
+                self._walk_step(snmp_engine, transport, walker)
+            if self._retry_smaller(transport, error_status):
+                continue
+            if error_indication or error_status:
+                return response
+            if not self._feed(walker, table, on_rows):
+                break
+        return None, 0, 0, []
+
+    def _walk_step(self, snmp_engine, transport, walker):
+        """ Make a single GETNEXT or GETBULK round trip of a walk """
+        response = []
+        started = monotonic()
+
+        def on_response(snmp_engine, send_request_handle, error_indication,
+                        error_status, error_index, var_bind_table, cb_ctx):
+            response.extend(
+                (error_indication, error_status, error_index, var_bind_table))
+            # Returning nothing stops pysnmp from walking on its own
+
+        if self._use_bulk():
+            snmp_asyncore.bulkCmd(
+                snmp_engine, self._auth_data(snmp_engine, transport),
+                transport, snmp_asyncore.ContextData(),
+                walker.non_repeaters, self._repetitions(transport, walker),
+                *walker.var_binds, cbFun=on_response, lookupMib=False)
+        else:
+            snmp_asyncore.nextCmd(
+                snmp_engine, self._auth_data(snmp_engine, transport),
+                transport, snmp_asyncore.ContextData(),
+                *walker.var_binds, cbFun=on_response, lookupMib=False)
+        snmp_engine.transportDispatcher.runDispatcher()
+        self._track_round_trip(transport, response, started)
+        return response
+
+    async def _execute_agent_requests_async(self, requests, on_result):
+        """ Coroutine version of _execute_agent_requests """
+        if not self.rows_per_signal():
+            return await super()._execute_agent_requests_async(
+                requests, on_result)
+        for request in requests:
+            on_rows, flush = self._stream_rows(request, on_result)
+            async with self._request_slots:
+                self._metrics.request_started()
+                try:
+                    self._check_response(await self._walk_async(
+                        request.transport, request.oids, on_rows))
+                    flush()
+                except Exception as e:
+                    self._log_request_error(e, request.transport)
+                finally:
+                    self._metrics.request_finished()
+
+    async def _execute_snmp_request_async(self, transport, oids):
+        var_bind_table = []
+        response = await self._walk_async(
+            transport, oids, var_bind_table.extend)
+        if response[0] or response[1]:
+            return response
+        return None, 0, 0, var_bind_table
+
+    async def _walk_async(self, transport, oids, on_rows):
+        """ Coroutine version of _walk """
+        walker = self._create_walker(self._snmp_engine, oids)
+        while not walker.done:
+            started = monotonic()
+            if self._use_bulk():
+                response = await snmp_asyncio.bulkCmd(
+                    self._snmp_engine,
+                    self._auth_data(self._snmp_engine, transport),
+                    transport, snmp_asyncio.ContextData(),
+                    walker.non_repeaters, self._repetitions(transport, walker),
+                    *walker.var_binds, lookupMib=False)
+            else:
+                response = await snmp_asyncio.nextCmd(
+                    self._snmp_engine,
+                    self._auth_data(self._snmp_engine, transport),
+                    transport, snmp_asyncio.ContextData(),
+                    *walker.var_binds, lookupMib=False)
+            self._track_round_trip(transport, response, started)
+            error_indication, error_status, error_index, table = response
+            if self._retry_smaller(transport, error_status):
+                continue
+            if error_indication or error_status:
+                return response
+            if not self._feed(walker, table, on_rows):
+                break
+        return None, 0, 0, []
+
+    def _feed(self, walker, table, on_rows):
+        """ Hand the rows of a response to on_rows
+
+        Returns:
+            bool: False once the walk has reached max_rows or max_duration
+        """
+        rows = walker.feed(table)
+        if self.max_rows() and walker.rows >= self.max_rows():
+            on_rows(rows[:len(rows) - (walker.rows - self.max_rows())])
+            self.logger.debug("Walk stopped after {} rows".format(
+                self.max_rows()))
+            return False
+        on_rows(rows)
+        if self.max_duration().total_seconds() and \
+                monotonic() - walker.started > \
+                self.max_duration().total_seconds():
+            self.logger.warning("Walk stopped after {} rows, it took longer "
+                                "than {}".format(walker.rows,
+                                                 self.max_duration()))
+            return False
+        return True
+
+    def _stream_rows(self, request, on_result):
+        """ Split the rows of a walk into signals of rows_per_signal rows
+
+        Returns:
+            tuple: a function taking in new rows, and a function notifying
+                the rows that are left once the walk is done
+        """
+        pending = []
+
+        def notify(rows):
+            signal = Signal(request.signal.to_dict()) if request.signal \
+                else Signal()
+            on_result(request._replace(signal=signal), rows)
+
+        def on_rows(rows):
+            pending.extend(rows)
+            while len(pending) >= self.rows_per_signal():
+                notify(pending[:self.rows_per_signal()])
+                del pending[:self.rows_per_signal()]
+
+        def flush():
+            if pending:
+                notify(pending)
+
+        return on_rows, flush
+
+    def _track_request(self, transport, response, started):
+        """ Walks track each of their round trips instead, but for those
+        pysnmp walks on its own, which only count as a single request
+        """
+        if not self._use_walker() and not self.asynchronous():
+            self._metrics.round_trip(
+                transport.transportAddr, response, monotonic() - started)
+
+    def _create_walker(self, snmp_engine, oids):
+        var_binds = CommandGeneratorVarBinds().makeVarBinds(
+            snmp_engine, self._object_types(oids))
+        return Walker([name for name, _ in var_binds],
+                      self.non_repeaters() if self._use_bulk() else 0)
+
+    def _use_bulk(self):
+        return self.bulk_walk() and self.snmp_version() is not SNMPType.SMIv1
+
+    def _use_walker(self):
+        return self._use_bulk() or self.rows_per_signal() or \
+            self.max_rows() or self.max_duration().total_seconds() or \
+            self.table_output() is not TableOutput.none or \
+            self.adaptive_timeout() or self.failure_threshold()
+
+    def _repetitions(self, transport, walker=None):
+        """ Rows to ask an agent for, never more than max_rows needs """
+        repetitions = self._max_repetitions.get(
+            transport.transportAddr, max(self.max_repetitions(), 1))
+        if walker and self.max_rows():
+            repetitions = max(min(
+                repetitions, self.max_rows() - walker.rows), 1)
+        return repetitions
+
+    def _retry_smaller(self, transport, error_status):
+        """ Halve the repetitions asked of an agent whose response was too
+        big, returns True if the request should be tried again
+        """
+        if not self._use_bulk() or not error_status or \
+                int(error_status) != TOO_BIG:
+            return False
+        repetitions = self._repetitions(transport)
+        if repetitions <= 1:
+            return False
+        self._max_repetitions[transport.transportAddr] = repetitions // 2
+        self.logger.debug("Response too big, {} repetitions for {}".format(
+            repetitions // 2, transport))
+        return True
+
+    def _handle_result(self, request, var_binds):
+        if self.table_output() is TableOutput.none:
+            return super()._handle_result(request, var_binds)
+        try:
+            self.notify_signals(self._table_signals(request, var_binds))
+        except:
+            self.logger.exception(
+                "Unable to handle response from {}".format(request.transport))
+
+    def _column_root(self, column):
+        """ The OID tuple of a column, dynamic ones are resolved once and
+        the least recently used forgotten past MAX_COLUMN_ROOTS
+        """
+        root = self._static_roots.get(column)
+        if root is not None:
+            return root
+        with self._roots_lock:
+            root = self._column_roots.get(column)
+            if root is not None:
+                self._column_roots.move_to_end(column)
+                return root
+        # The resolver serializes access to the shared MIB view
+        root = self._mib_resolver.oid(
+            snmp_asyncio.ObjectIdentity(column)).asTuple()
+        with self._roots_lock:
+            self._column_roots[column] = root
+            while len(self._column_roots) > MAX_COLUMN_ROOTS:
+                self._column_roots.popitem(last=False)
+        return root
+
+    def _table_signals(self, request, var_binds):
+        """ Group the walked var binds by row index, each of the request's
+        OIDs being a column of the table
+        """
+        roots = [self._column_root(column) for column in request.oids]
+        table = OrderedDict()
+        for row in var_binds:
+            for var_bind in row:
+                name = oids.as_tuple(var_bind_oid(var_bind))
+                for column, root in zip(request.oids, roots):
+                    index = oids.index(root, name)
+                    if index is not None:
+                        table.setdefault(oids.to_str(index), {})[column] = \
+                            self._resolve(var_bind)[1]
+                        break
+
+        existing = request.signal.to_dict() if request.signal else {}
+        if self.table_output() is TableOutput.columns:
+            signal = Signal(existing)
+            signal.index = list(table)
+            for column in request.oids:
+                setattr(signal, column,
+                        [cells.get(column) for cells in table.values()])
+            return [signal]
+        signals = []
+        for index, cells in table.items():
+            signal = Signal(existing)
+            signal.index = index
+            for column, value in cells.items():
+                setattr(signal, column, value)
+            signals.append(signal)
+        return signals
 
     def _handle_data(self, var_binds, starting_signal):
         """ Notify signals in the "default" output """
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..agent_tracker import AgentTracker
+
+
+class TestAgentTracker(NIOBlockTestCase):
+
+    def test_timeout(self):
+        """ Timeouts follow the round trip times of an agent """
+        tracker = AgentTracker(0.1, 0, 30)
+        self.assertEqual(tracker.timeout("agent", 1), 1)
+        tracker.success("agent", 0.05)
+        # 0.05 + 4 * 0.025
+        self.assertEqual(tracker.timeout("agent", 1), 0.2)
+        for _ in range(20):
+            tracker.success("agent", 0.01)
+        # Never under the minimum timeout
+        self.assertEqual(tracker.timeout("agent", 1), 0.1)
+        for _ in range(20):
+            tracker.success("agent", 3)
+        # Never over the default timeout
+        self.assertEqual(tracker.timeout("agent", 1), 1)
+        self.assertEqual(tracker.timeout("other agent", 1), 1)
+
+    @patch(AgentTracker.__module__ + '.monotonic')
+    def test_circuit_breaker(self, monotonic):
+        """ Agents failing too often are skipped until a probe succeeds """
+        monotonic.return_value = 0
+        tracker = AgentTracker(0.1, 3, 10)
+        tracker.failure("agent")
+        tracker.failure("agent")
+        self.assertTrue(tracker.allow("agent"))
+        tracker.failure("agent")
+        self.assertFalse(tracker.allow("agent"))
+        self.assertTrue(tracker.is_open("agent"))
+        self.assertTrue(tracker.allow("other agent"))
+        # Probe once the backoff is over, but only once
+        monotonic.return_value = 10
+        self.assertTrue(tracker.allow("agent"))
+        self.assertFalse(tracker.allow("agent"))
+        # A failed probe doubles the backoff
+        tracker.failure("agent")
+        monotonic.return_value = 29
+        self.assertFalse(tracker.allow("agent"))
+        monotonic.return_value = 30
+        self.assertTrue(tracker.allow("agent"))
+        tracker.success("agent", 0.1)
+        self.assertTrue(tracker.allow("agent"))
+        self.assertFalse(tracker.is_open("agent"))
+
+    def test_disabled_circuit_breaker(self):
+        tracker = AgentTracker(0.1, 0, 10)
+        for _ in range(10):
+            tracker.failure("agent")
+        self.assertTrue(tracker.allow("agent"))
+
+    def test_bounded_agents(self):
+        """ The least recently used agents are forgotten """
+        tracker = AgentTracker(0.1, 0, 10, max_agents=2)
+        tracker.success(("1.1.1.1", 161), 0.5)
+        tracker.success(("1.1.1.2", 161), 0.5)
+        tracker.success(("1.1.1.3", 161), 0.5)
+        self.assertEqual(sorted(tracker.stats()),
+                         ["1.1.1.2:161", "1.1.1.3:161"])
@@ -0,0 +1,179 @@
+from pyasn1.codec.ber import decoder, encoder
+from pyasn1.error import PyAsn1Error
+from pysnmp.proto import api
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..ber_decoder import decode_messages, inform_responses, \
+    message_version, usm_engine_id, V1_TRAP, V2_TRAP
+
+
+def encode(p_mod, pdu):
+    msg = p_mod.Message()
+    p_mod.apiMessage.setDefaults(msg)
+    p_mod.apiMessage.setCommunity(msg, 'public')
+    p_mod.apiMessage.setPDU(msg, pdu)
+    return encoder.encode(msg)
+
+
+def tlv(tag, contents):
+    return bytes((tag, len(contents))) + contents
+
+
+def encode_v3(engine_id, user=b'user'):
+    """ The header of a v3 USM message, with an empty scoped PDU """
+    header = tlv(0x30, tlv(0x02, b'\x01') + tlv(0x02, b'\x05\xdc') +
+                 tlv(0x04, b'\x00') + tlv(0x02, b'\x03'))
+    usm = tlv(0x30, tlv(0x04, engine_id) + tlv(0x02, b'\x00') +
+              tlv(0x02, b'\x00') + tlv(0x04, user) + tlv(0x04, b'') +
+              tlv(0x04, b''))
+    scoped_pdu = tlv(0x30, tlv(0x04, engine_id) + tlv(0x04, b'') +
+                     tlv(0xa7, b''))
+    return tlv(0x30, tlv(0x02, b'\x03') + header + tlv(0x04, usm) +
+               scoped_pdu)
+
+
+class TestBERDecoder(NIOBlockTestCase):
+
+    def test_v2c_trap(self):
+        """ v2c traps are decoded into plain values """
+        p_mod = api.protoModules[api.protoVersion2c]
+        pdu = p_mod.TrapPDU()
+        p_mod.apiTrapPDU.setDefaults(pdu)
+        p_mod.apiTrapPDU.setRequestID(pdu, 42)
+        p_mod.apiTrapPDU.setVarBinds(pdu, [
+            ((1, 3, 6, 1, 2, 1, 1, 3, 0), p_mod.TimeTicks(1234)),
+            ((1, 3, 6, 1, 2, 1, 2), p_mod.Integer(-5)),
+            ((1, 3, 6, 1, 2, 1, 3), p_mod.OctetString('name')),
+            ((1, 3, 6, 1, 2, 1, 4), p_mod.ObjectIdentifier((2, 100, 3))),
+            ((1, 3, 6, 1, 2, 1, 5), p_mod.IpAddress('10.0.0.1')),
+            ((1, 3, 6, 1, 2, 1, 6), p_mod.Counter64(2 ** 64 - 1)),
+            ((1, 3, 6, 1, 2, 1, 7), p_mod.Null(''))])
+        data = encode(p_mod, pdu)
+
+        messages = decode_messages(data + data)
+        self.assertEqual(len(messages), 2)
+        message = messages[0]
+        self.assertEqual(message.version, 1)
+        self.assertEqual(message.community, b'public')
+        self.assertEqual(message.pdu_type, V2_TRAP)
+        self.assertEqual(message.header, (42, 0, 0))
+        self.assertEqual(message.var_binds, [
+            ((1, 3, 6, 1, 2, 1, 1, 3, 0),
+             ("value", "application-wide", "timeticks-value"), 1234),
+            ((1, 3, 6, 1, 2, 1, 2), ("value", "simple", "integer-value"), -5),
+            ((1, 3, 6, 1, 2, 1, 3),
+             ("value", "simple", "string-value"), b'name'),
+            ((1, 3, 6, 1, 2, 1, 4),
+             ("value", "simple", "objectID-value"), (2, 100, 3)),
+            ((1, 3, 6, 1, 2, 1, 5),
+             ("value", "application-wide", "ipAddress-value"),
+             b'\x0a\x00\x00\x01'),
+            ((1, 3, 6, 1, 2, 1, 6),
+             ("value", "application-wide", "big-counter-value"),
+             2 ** 64 - 1),
+            ((1, 3, 6, 1, 2, 1, 7), ("unSpecified",), b'')])
+
+    def test_v1_trap(self):
+        """ v1 traps carry their header fields """
+        p_mod = api.protoModules[api.protoVersion1]
+        pdu = p_mod.TrapPDU()
+        p_mod.apiTrapPDU.setDefaults(pdu)
+        p_mod.apiTrapPDU.setEnterprise(pdu, (1, 3, 6, 1, 4, 1, 9))
+        p_mod.apiTrapPDU.setAgentAddr(pdu, '10.0.0.2')
+        p_mod.apiTrapPDU.setGenericTrap(pdu, 6)
+        p_mod.apiTrapPDU.setSpecificTrap(pdu, 17)
+        p_mod.apiTrapPDU.setTimeStamp(pdu, 99)
+        p_mod.apiTrapPDU.setVarBinds(pdu, [
+            ((1, 3, 6, 1, 2, 1, 1), p_mod.Gauge(3))])
+
+        message, = decode_messages(encode(p_mod, pdu))
+        self.assertEqual(message.version, 0)
+        self.assertEqual(message.pdu_type, V1_TRAP)
+        self.assertEqual(message.header, (
+            (1, 3, 6, 1, 4, 1, 9), b'\x0a\x00\x00\x02', 6, 17, 99))
+        self.assertEqual(message.var_binds, [
+            ((1, 3, 6, 1, 2, 1, 1), ("application-wide", "gauge"), 3)])
+
+    def test_unusual_messages(self):
+        """ Anything unusual is left to the full decoder """
+        p_mod = api.protoModules[api.protoVersion2c]
+        pdu = p_mod.GetRequestPDU()
+        p_mod.apiPDU.setDefaults(pdu)
+        self.assertIsNone(decode_messages(encode(p_mod, pdu)))
+
+        pdu = p_mod.TrapPDU()
+        p_mod.apiTrapPDU.setDefaults(pdu)
+        data = encode(p_mod, pdu)
+        self.assertIsNotNone(decode_messages(data))
+        # Truncated
+        self.assertIsNone(decode_messages(data[:-1]))
+        # Not BER at all
+        self.assertIsNone(decode_messages(b'trash'))
+        self.assertIsNone(decode_messages('trash'))
+        # Indefinite length
+        self.assertIsNone(decode_messages(b'\x30\x80' + data[2:] + b'\0\0'))
+        self.assertEqual(decode_messages(b''), [])
+
+    def test_negative_error_fields(self):
+        """ Negative error fields are never decoded where pyasn1 fails """
+        p_mod = api.protoModules[api.protoVersion2c]
+        pdu = p_mod.TrapPDU()
+        p_mod.apiTrapPDU.setDefaults(pdu)
+        p_mod.apiTrapPDU.setRequestID(pdu, 42)
+        data = encode(p_mod, pdu)
+        header = b'\x02\x01\x2a\x02\x01\x00\x02\x01\x00'
+        self.assertIn(header, data)
+        negative_status = data.replace(
+            header, b'\x02\x01\x2a\x02\x01\xff\x02\x01\x00')
+        negative_index = data.replace(
+            header, b'\x02\x01\x2a\x02\x01\x00\x02\x01\xff')
+        self.assertIsNone(decode_messages(negative_status))
+        self.assertIsNone(decode_messages(negative_index))
+        with self.assertRaises(PyAsn1Error):
+            decoder.decode(negative_index, asn1Spec=p_mod.Message())
+        # Whatever pyasn1 makes of the status is what the trap becomes
+        msg, _ = decoder.decode(negative_status, asn1Spec=p_mod.Message())
+        self.assertEqual(
+            int(p_mod.apiPDU.getErrorStatus(p_mod.apiMessage.getPDU(msg))),
+            -1)
+
+    def test_inform_responses(self):
+        """ Informs are answered with the Response pysnmp would build """
+        p_mod = api.protoModules[api.protoVersion2c]
+        pdu = p_mod.InformRequestPDU()
+        p_mod.apiPDU.setDefaults(pdu)
+        p_mod.apiPDU.setRequestID(pdu, 4242)
+        p_mod.apiPDU.setVarBinds(pdu, [
+            ((1, 3, 6, 1, 2, 1, 1, 3, 0), p_mod.TimeTicks(1234))])
+        msg = p_mod.Message()
+        p_mod.apiMessage.setDefaults(msg)
+        p_mod.apiMessage.setCommunity(msg, 'public')
+        p_mod.apiMessage.setPDU(msg, pdu)
+        response = p_mod.apiMessage.getResponse(msg)
+        p_mod.apiPDU.setVarBinds(p_mod.apiMessage.getPDU(response),
+                                 p_mod.apiPDU.getVarBinds(pdu))
+        data = encoder.encode(msg)
+
+        trap = p_mod.TrapPDU()
+        p_mod.apiTrapPDU.setDefaults(trap)
+        self.assertEqual(inform_responses(data + encode(p_mod, trap) + data),
+                         [encoder.encode(response)] * 2)
+        self.assertEqual(inform_responses(encode(p_mod, trap)), [])
+        self.assertIsNone(inform_responses(data[:-1]))
+        # An error status in an inform is left to pyasn1
+        p_mod.apiPDU.setErrorStatus(pdu, 5)
+        p_mod.apiMessage.setPDU(msg, pdu)
+        self.assertIsNone(inform_responses(encoder.encode(msg)))
+
+    def test_v3_header(self):
+        """ The version and engine ID are read from a message's header """
+        data = encode_v3(b'\x80\x00\x01\x02\x03')
+        self.assertEqual(message_version(data), 3)
+        self.assertEqual(usm_engine_id(data), b'\x80\x00\x01\x02\x03')
+        self.assertEqual(usm_engine_id(encode_v3(b'')), b'')
+        p_mod = api.protoModules[api.protoVersion2c]
+        pdu = p_mod.TrapPDU()
+        p_mod.apiTrapPDU.setDefaults(pdu)
+        self.assertEqual(message_version(encode(p_mod, pdu)), 1)
+        self.assertIsNone(usm_engine_id(encode(p_mod, pdu)))
+        self.assertIsNone(message_version(b'trash'))
+        self.assertIsNone(usm_engine_id(data[:-1]))
@@ -0,0 +1,40 @@
+from pyasn1.type.univ import Null
+from pysnmp.proto.rfc1902 import Integer, OctetString
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..change_filter import ChangeFilter
+
+AGENT = ("10.0.0.1", 161)
+OID = (1, 3, 6, 1, 2, 1, 2, 2, 1, 8, 1)
+
+
+class TestChangeFilter(NIOBlockTestCase):
+
+    def test_changes(self):
+        """ Only values that changed are reported """
+        changes = ChangeFilter(0)
+        self.assertTrue(changes.changed(AGENT, OID, Integer(1)))
+        self.assertFalse(changes.changed(AGENT, OID, Integer(1)))
+        self.assertTrue(changes.changed(AGENT, OID, Integer(2)))
+        self.assertTrue(changes.changed(AGENT, OID, Null("")))
+        self.assertTrue(changes.changed(AGENT, OID, Integer(0)))
+        # Agents are kept apart
+        self.assertTrue(changes.changed(("10.0.0.2", 161), OID, Integer(0)))
+        self.assertFalse(changes.changed(AGENT, OID, Integer(0)))
+        self.assertEqual(changes.stats(), {"size": 2, "suppressed": 2})
+
+    def test_refresh(self):
+        """ Values are reported again once refresh is over """
+        changes = ChangeFilter(60)
+        self.assertTrue(changes.changed(AGENT, OID, OctetString("a"), 0))
+        self.assertFalse(changes.changed(AGENT, OID, OctetString("a"), 59))
+        self.assertTrue(changes.changed(AGENT, OID, OctetString("a"), 60))
+        self.assertFalse(changes.changed(AGENT, OID, OctetString("a"), 61))
+
+    def test_bounded_size(self):
+        """ Forgotten values are reported again """
+        changes = ChangeFilter(0, 2)
+        for index in range(3):
+            changes.changed(AGENT, OID + (index,), Integer(0))
+        self.assertEqual(changes.stats()["size"], 2)
+        self.assertTrue(changes.changed(AGENT, OID + (0,), Integer(0)))
+        self.assertFalse(changes.changed(AGENT, OID + (2,), Integer(0)))
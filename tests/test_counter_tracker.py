@@ -0,0 +1,67 @@
+from pysnmp.proto.rfc1902 import Counter32, Counter64, Gauge32
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..counter_tracker import CounterTracker
+
+AGENT = ("10.0.0.1", 161)
+OID = (1, 3, 6, 1, 2, 1, 2, 2, 1, 10, 1)
+
+
+class TestCounterTracker(NIOBlockTestCase):
+
+    def test_delta_and_rate(self):
+        """ Deltas and rates are computed from the previous sample """
+        tracker = CounterTracker()
+        self.assertEqual(tracker.update(AGENT, OID, Counter32(100), now=10),
+                         (None, None))
+        self.assertEqual(tracker.update(AGENT, OID, Counter32(600), now=15),
+                         (500, 100))
+        # Other agents and OIDs are kept apart
+        self.assertEqual(
+            tracker.update(("10.0.0.2", 161), OID, Counter32(1), now=15),
+            (None, None))
+        self.assertTrue(CounterTracker.is_counter(Counter64(1)))
+        self.assertFalse(CounterTracker.is_counter(Gauge32(1)))
+
+    def test_uptime(self):
+        """ sysUpTime is the time between samples when known """
+        tracker = CounterTracker()
+        tracker.update(AGENT, OID, Counter64(0), uptime=1000, now=10)
+        self.assertEqual(tracker.update(
+            AGENT, OID, Counter64(2000), uptime=3000, now=10.5), (2000, 100))
+
+    def test_counter32_wrap(self):
+        """ A Counter32 going down wrapped around """
+        tracker = CounterTracker()
+        tracker.update(AGENT, OID, Counter32(2 ** 32 - 100), now=0)
+        self.assertEqual(tracker.update(AGENT, OID, Counter32(100), now=2),
+                         (200, 100))
+        self.assertEqual(tracker.stats()["wraps"], 1)
+
+    def test_resets(self):
+        """ Restarted agents and Counter64s going down give no delta """
+        tracker = CounterTracker()
+        tracker.update(AGENT, OID, Counter64(5000), now=0)
+        self.assertEqual(tracker.update(AGENT, OID, Counter64(10), now=1),
+                         (None, None))
+        self.assertEqual(tracker.update(AGENT, OID, Counter64(20), now=2),
+                         (10, 10))
+        # An agent restart is no wrap even for a Counter32
+        tracker.update(AGENT, OID + (1,), Counter32(500), uptime=9000)
+        self.assertEqual(
+            tracker.update(AGENT, OID + (1,), Counter32(20), uptime=100),
+            (None, None))
+        self.assertEqual(tracker.stats(),
+                         {"size": 2, "wraps": 0, "resets": 2})
+
+    def test_bounded_size(self):
+        """ Only max_size counters are kept """
+        tracker = CounterTracker(2)
+        for index in range(3):
+            tracker.update(AGENT, OID + (index,), Counter32(0), now=0)
+        self.assertEqual(tracker.stats()["size"], 2)
+        self.assertEqual(
+            tracker.update(AGENT, OID + (0,), Counter32(1), now=1),
+            (None, None))
+        self.assertEqual(
+            tracker.update(AGENT, OID + (2,), Counter32(1), now=1),
+            (1, 1))
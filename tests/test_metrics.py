@@ -0,0 +1,62 @@
+from pysnmp.proto import errind
+from pysnmp.proto.rfc1902 import Integer, ObjectName
+from pysnmp.proto.rfc1905 import errorStatus
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..metrics import Histogram, Metrics
+
+AGENT = ("10.0.0.1", 161)
+
+
+class TestMetrics(NIOBlockTestCase):
+
+    def test_histogram(self):
+        """ Percentiles are the bounds of the buckets they fall in """
+        histogram = Histogram()
+        self.assertIsNone(histogram.percentile(0.5))
+        for _ in range(98):
+            histogram.observe(0.001)
+        histogram.observe(0.05)
+        histogram.observe(100)
+        stats = histogram.to_dict()
+        self.assertEqual(stats["count"], 100)
+        self.assertEqual(stats["min"], 0.001)
+        self.assertEqual(stats["max"], 100)
+        # 0.001 is in the bucket up to 0.0016
+        self.assertAlmostEqual(stats["p50"], 0.0016)
+        self.assertAlmostEqual(stats["p99"], 0.0512)
+        # Past the last bucket, the largest value is all that is known
+        self.assertEqual(histogram.percentile(1), 100)
+
+    def test_round_trips(self):
+        """ Requests are counted per agent, by how they were answered """
+        metrics = Metrics()
+        var_binds = [(ObjectName("1.3.6.1.2.1.1.3.0"), Integer(1))]
+        metrics.round_trip(AGENT, (None, 0, 0, var_binds), 0.01)
+        metrics.round_trip(AGENT, (None, 0, 0, [var_binds, var_binds]), 0.02)
+        metrics.round_trip(AGENT, (errind.requestTimedOut, 0, 0, []), 1)
+        metrics.round_trip(
+            AGENT, (None, errorStatus.clone('tooBig'), 0, []), 0.01)
+        metrics.round_trip(("10.0.0.2", 161), (errind.wrongDigest, 0, 0, []),
+                           0.01)
+        metrics.request_started()
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["in_flight"], 1)
+        self.assertEqual(snapshot["counters"], {
+            "pdus_sent": 5, "var_binds": 3, "timeouts": 1, "errors": 1,
+            "error_statuses": 1})
+        agent = snapshot["agents"]["10.0.0.1:161"]
+        self.assertEqual(agent["requests"], 4)
+        self.assertEqual(agent["timeouts"], 1)
+        self.assertEqual(agent["error_statuses"], {"tooBig": 1})
+        self.assertEqual(agent["var_binds"], 3)
+        # Timeouts aren't round trip times
+        self.assertEqual(agent["rtt"]["count"], 3)
+        self.assertEqual(snapshot["histograms"]["rtt"]["count"], 4)
+
+    def test_bounded_agents(self):
+        """ Only the most recently used agents are kept """
+        metrics = Metrics(max_agents=2)
+        for host in ("10.0.0.1", "10.0.0.2", "10.0.0.1", "10.0.0.3"):
+            metrics.round_trip((host, 161), (None, 0, 0, []), 0.01)
+        self.assertEqual(sorted(metrics.snapshot()["agents"]),
+                         ["10.0.0.1:161", "10.0.0.3:161"])
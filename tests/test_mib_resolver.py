@@ -0,0 +1,78 @@
+from pysnmp.entity.engine import SnmpEngine
+from pysnmp.hlapi.varbinds import CommandGeneratorVarBinds
+from pysnmp.proto.rfc1902 import Integer, ObjectIdentifier, ObjectName, \
+    OctetString, TimeTicks
+from pysnmp.proto.rfc1905 import NoSuchInstance
+from pysnmp.smi.rfc1902 import ObjectIdentity, ObjectType
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..mib_resolver import MibResolver
+
+
+class TestMibResolver(NIOBlockTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.mib_view = CommandGeneratorVarBinds().getMibViewController(
+            SnmpEngine())
+
+    def _pysnmp(self, name, value):
+        var_bind = ObjectType(ObjectIdentity(name), value).resolveWithMib(
+            self.mib_view)
+        return var_bind[0].prettyPrint(), var_bind[1].prettyPrint()
+
+    def test_same_as_pysnmp(self):
+        """ Var binds are resolved the way pysnmp resolves them """
+        resolver = MibResolver(self.mib_view)
+        for name, value in [
+                ("1.3.6.1.2.1.1.1.0", OctetString("router")),
+                ("1.3.6.1.2.1.1.3.0", TimeTicks(1234)),
+                ("1.3.6.1.2.1.1.2.0", ObjectIdentifier("1.3.6.1.4.1.20408")),
+                ("1.3.6.1.2.1.1.9.1.2.1", ObjectIdentifier("1.3.6.1.6.3.1")),
+                ("1.3.6.1.2.1.1.7.0", Integer(72)),
+                ("1.3.6.1.2.1.1.1.0", Integer(1)),
+                ("1.3.6.1.2.1.1.5.0", NoSuchInstance("")),
+                ("1.3.6.1.4.1.99999.1", Integer(5))]:
+            self.assertEqual(resolver.resolve(ObjectName(name), value),
+                             self._pysnmp(name, value))
+
+    def test_cached_names(self):
+        """ The MIB tree is only searched once per OID """
+        resolver = MibResolver(self.mib_view)
+        resolver.warm((1, 3, 6, 1, 2, 1, 1, 3, 0))
+        for ticks in range(3):
+            self.assertEqual(
+                resolver.resolve(ObjectName("1.3.6.1.2.1.1.3.0"),
+                                 TimeTicks(ticks)),
+                ("SNMPv2-MIB::sysUpTime.0", str(ticks)))
+        self.assertEqual(resolver.stats(),
+                         {"size": 1, "hits": 3, "misses": 1})
+
+    def test_least_recently_used_eviction(self):
+        """ Only max_size OIDs are remembered """
+        resolver = MibResolver(self.mib_view, 2)
+        for oid in ["1.3.6.1.2.1.1.1.0", "1.3.6.1.2.1.1.3.0",
+                    "1.3.6.1.2.1.1.1.0", "1.3.6.1.2.1.1.5.0",
+                    "1.3.6.1.2.1.1.1.0"]:
+            resolver.resolve(ObjectName(oid), Integer(0))
+        self.assertEqual(resolver.stats(),
+                         {"size": 2, "hits": 2, "misses": 3})
+        resolver.clear()
+        self.assertEqual(resolver.stats()["size"], 0)
+
+    def test_no_cache(self):
+        """ A max_size of 0 resolves every var bind """
+        resolver = MibResolver(self.mib_view, 0)
+        resolver.resolve(ObjectName("1.3.6.1.2.1.1.1.0"), Integer(0))
+        resolver.resolve(ObjectName("1.3.6.1.2.1.1.1.0"), Integer(0))
+        self.assertEqual(resolver.stats(),
+                         {"size": 0, "hits": 0, "misses": 2})
+
+    def test_object_identity_oid(self):
+        """ ObjectIdentities are resolved to their OID """
+        resolver = MibResolver(self.mib_view)
+        self.assertEqual(
+            resolver.oid(ObjectIdentity("1.3.6.1.2.1.2.2.1.2")).asTuple(),
+            (1, 3, 6, 1, 2, 1, 2, 2, 1, 2))
+        self.assertEqual(
+            resolver.oid(ObjectIdentity("SNMPv2-MIB", "sysName", 0)),
+            (1, 3, 6, 1, 2, 1, 1, 5, 0))
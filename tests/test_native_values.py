@@ -0,0 +1,43 @@
+from ipaddress import IPv4Address
+from pysnmp.proto.rfc1902 import Counter32, Counter64, Gauge32, Integer, \
+    IpAddress, ObjectIdentifier, ObjectName, OctetString, TimeTicks, Bits
+from pysnmp.proto.rfc1905 import EndOfMibView, NoSuchInstance, \
+    NoSuchObject
+from pyasn1.type.univ import Null
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..native_values import native_value
+
+
+class TestNativeValues(NIOBlockTestCase):
+
+    def test_numbers(self):
+        """ Numeric types are ints """
+        for value in [Integer(-5), Counter32(4294967295), Gauge32(7),
+                      TimeTicks(1234), Counter64(227651521193)]:
+            self.assertIs(type(native_value(value)), int)
+            self.assertEqual(native_value(value), int(value))
+
+    def test_strings(self):
+        """ Printable strings are text, others are bytes """
+        self.assertEqual(native_value(OctetString("eth0")), "eth0")
+        self.assertEqual(native_value(OctetString("a\tb\r\n")), "a\tb\r\n")
+        self.assertEqual(native_value(OctetString("café".encode())),
+                         "café")
+        self.assertEqual(native_value(OctetString(b"\x00\x1b\x21")),
+                         b"\x00\x1b\x21")
+        self.assertEqual(native_value(OctetString(b"\xff\xfe")), b"\xff\xfe")
+        self.assertEqual(native_value(Bits(b"\x80")), b"\x80")
+
+    def test_addresses_and_oids(self):
+        """ IP addresses are IPv4Address, OIDs tuples of ints """
+        self.assertEqual(native_value(IpAddress("10.0.0.1")),
+                         IPv4Address("10.0.0.1"))
+        self.assertEqual(native_value(ObjectIdentifier("1.3.6.1.4.1")),
+                         (1, 3, 6, 1, 4, 1))
+        self.assertEqual(native_value(ObjectName("1.3.6.1")), (1, 3, 6, 1))
+
+    def test_empty_values(self):
+        """ Nulls and SNMP exceptions are None """
+        for value in [Null(""), NoSuchObject(""), NoSuchInstance(""),
+                      EndOfMibView("")]:
+            self.assertIsNone(native_value(value))
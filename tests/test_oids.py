@@ -0,0 +1,68 @@
+from pysnmp.proto.rfc1902 import ObjectName
+from nio.testing.block_test_case import NIOBlockTestCase
+from .. import oids
+
+
+class TestOids(NIOBlockTestCase):
+
+    def setUp(self):
+        super().setUp()
+        oids.clear()
+
+    def test_conversions(self):
+        """ OIDs are converted both ways, and the results memoized """
+        self.assertEqual(oids.to_str((1, 3, 6, 1, 2, 1)), "1.3.6.1.2.1")
+        self.assertEqual(oids.to_str((1, 3, 6, 1, 2, 1)), "1.3.6.1.2.1")
+        self.assertEqual(oids.to_tuple("1.3.6.1.2.1"), (1, 3, 6, 1, 2, 1))
+        self.assertEqual(oids.to_tuple(".1.3.6"), (1, 3, 6))
+        self.assertEqual(oids.to_tuple(""), ())
+        self.assertEqual(oids.stats(), {"strings": 1, "tuples": 3})
+        # Unhashable OIDs are converted all the same
+        self.assertEqual(oids.to_str([1, 3, 6]), "1.3.6")
+        self.assertEqual(oids.join(("127.0.0.1", 162)), "127.0.0.1.162")
+        with self.assertRaises(ValueError):
+            oids.to_tuple("1.3.six")
+        with self.assertRaises(ValueError):
+            oids.to_tuple("1.-3")
+
+    def test_bounded_memo(self):
+        """ A full memo starts over """
+        max_cached = oids.MAX_CACHED
+        oids.MAX_CACHED = 2
+        try:
+            for arc in range(3):
+                oids.to_str((1, arc))
+            self.assertEqual(oids.stats()["strings"], 1)
+        finally:
+            oids.MAX_CACHED = max_cached
+
+    def test_as_tuple(self):
+        oid = (1, 3, 6, 1)
+        self.assertIs(oids.as_tuple(oid), oid)
+        self.assertEqual(oids.as_tuple("1.3.6.1"), oid)
+        self.assertEqual(oids.as_tuple(ObjectName("1.3.6.1")), oid)
+
+    def test_is_oid(self):
+        self.assertTrue(oids.is_oid((1, 3, 6, 1)))
+        self.assertTrue(oids.is_oid(()))
+        self.assertFalse(oids.is_oid((1, 3, "6")))
+        self.assertFalse(oids.is_oid([1, 3, 6]))
+        self.assertFalse(oids.is_oid("1.3.6"))
+
+    def test_subtrees(self):
+        """ Prefixes, subtrees and indexes """
+        column = (1, 3, 6, 1, 2, 1, 2, 2, 1, 2)
+        self.assertTrue(oids.is_prefix(column, column))
+        self.assertTrue(oids.is_prefix(column, column + (7,)))
+        self.assertFalse(oids.is_prefix(column, column[:-1] + (3, 7)))
+        self.assertFalse(oids.is_prefix(column, column[:-1]))
+        self.assertEqual(oids.index(column, column + (7, 1)), (7, 1))
+        self.assertEqual(oids.index(column, column), ())
+        self.assertIsNone(oids.index(column, column[:-1] + (3, 7)))
+
+    def test_compare(self):
+        """ OIDs compare in walk order """
+        self.assertEqual(oids.compare((1, 3, 6), (1, 3, 6)), 0)
+        self.assertEqual(oids.compare((1, 3), (1, 3, 6)), -1)
+        self.assertEqual(oids.compare((1, 3, 10), (1, 3, 9, 1)), 1)
+        self.assertEqual(oids.compare("1.3.10", ObjectName("1.3.9.1")), 1)
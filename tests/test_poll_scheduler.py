@@ -0,0 +1,72 @@
+from threading import Event
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..poll_scheduler import PollScheduler
+
+
+class TestPollScheduler(NIOBlockTestCase):
+
+    def _poll_times(self, targets, interval, polls, **kwargs):
+        """ Run a scheduler until it polled a number of times """
+        times = []
+        done = Event()
+
+        def poll(target):
+            times.append((target, scheduler._next_poll))
+            if len(times) == polls:
+                done.set()
+
+        scheduler = PollScheduler(targets, interval, poll, jitter=0, **kwargs)
+        scheduler.start()
+        self.assertTrue(done.wait(2))
+        scheduler.stop()
+        return scheduler, times
+
+    def test_targets_are_spread_out(self):
+        """ Each target gets its own slot in the interval """
+        scheduler, times = self._poll_times(["a", "b", "c", "d"], 0.2, 8)
+        self.assertEqual([target for target, _ in times], list("abcdabcd"))
+        gaps = [b - a for (_, a), (_, b) in zip(times, times[1:])]
+        for gap in gaps:
+            self.assertAlmostEqual(gap, 0.05, delta=0.03)
+        self.assertGreaterEqual(scheduler.cycles, 1)
+        self.assertEqual(scheduler.stats()["targets"], 4)
+
+    def test_rate_limit(self):
+        """ Polls are held back to respect the requests per second cap """
+        scheduler, times = self._poll_times(
+            ["a", "b", "c", "d"], 0.04, 4, max_rate=20)
+        self.assertGreaterEqual(times[-1][1] - times[0][1], 0.14)
+        # Held back polls show up as slip
+        self.assertGreater(scheduler.max_slip, 0.05)
+
+    def test_target_rate_limit(self):
+        """ A single target isn't polled faster than its own cap """
+        scheduler, times = self._poll_times(
+            ["a"], 0.01, 3, max_target_rate=20)
+        self.assertGreaterEqual(times[-1][1] - times[0][1], 0.09)
+
+    def test_overrun(self):
+        """ Cycles longer than the interval are counted and not caught up """
+        done = Event()
+        scheduler = PollScheduler(
+            ["a"], 0.01, lambda target: done.wait(0.03), jitter=0)
+        scheduler.start()
+        done.wait(0.1)
+        scheduler.stop()
+        self.assertGreater(scheduler.overruns, 0)
+        self.assertLessEqual(scheduler.polls, 4)
+
+    def test_poll_errors_are_caught(self):
+        """ A failing poll doesn't stop the schedule """
+        polled = []
+
+        def poll(target):
+            polled.append(target)
+            if len(polled) < 3:
+                raise ValueError
+
+        scheduler = PollScheduler(["a"], 0.01, poll, jitter=0)
+        scheduler.start()
+        Event().wait(0.1)
+        scheduler.stop()
+        self.assertGreater(len(polled), 3)
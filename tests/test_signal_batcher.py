@@ -0,0 +1,40 @@
+from threading import Event
+from unittest.mock import MagicMock
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..signal_batcher import SignalBatcher
+
+
+class TestSignalBatcher(NIOBlockTestCase):
+
+    def test_flush_on_size(self):
+        """ A batch is flushed as soon as it is full """
+        flush = MagicMock()
+        batcher = SignalBatcher(flush, 3, 10)
+        batcher.start()
+        batcher.add([1, 2])
+        flush.assert_not_called()
+        batcher.add([3])
+        flush.assert_called_once_with([1, 2, 3])
+        batcher.add([4])
+        batcher.stop()
+        # What's left is flushed on stop
+        flush.assert_called_with([4])
+        self.assertEqual(batcher.batches, 2)
+        self.assertEqual(batcher.signals, 4)
+
+    def test_flush_on_latency(self):
+        """ A batch that doesn't fill up is flushed after the latency """
+        flushed = Event()
+        flush = MagicMock(side_effect=lambda batch: flushed.set())
+        batcher = SignalBatcher(flush, 100, 0.05)
+        batcher.start()
+        batcher.add([1])
+        batcher.add([2])
+        self.assertTrue(flushed.wait(1))
+        flush.assert_called_once_with([1, 2])
+        flushed.clear()
+        batcher.add([3])
+        self.assertTrue(flushed.wait(1))
+        flush.assert_called_with([3])
+        batcher.stop()
+        self.assertEqual(flush.call_count, 2)
@@ -1,3 +1,6 @@
+import asyncio
+from threading import Barrier, Event
+from time import sleep
 from unittest.mock import MagicMock
 from nio.signal.base import Signal
 from nio.testing.block_test_case import NIOBlockTestCase
@@ -145,7 +148,7 @@ class TestSNMPBlock(NIOBlockTestCase):
         """ Test that host expression props fail gracefully """
         block = SNMPBase()
         block._create_data = MagicMock()
-        block.execute_request = MagicMock()
+        block._execute_snmp_request = MagicMock()
         myOID = "1.3.6.1.2.1.31.1.1.1.6.2"
         ip = "0.0.0.0"
         port = 1611
@@ -160,14 +163,14 @@ class TestSNMPBlock(NIOBlockTestCase):
         block.start()
         # Send the starting signal, make sure everything was called correctly
         block.process_signals([starting_signal])
-        self.assertEqual(0, block.execute_request.call_count)
+        self.assertEqual(0, block._execute_snmp_request.call_count)
         block.stop()
 
     def test_invalid_port_expression_prop(self):
         """ Test that port expression props fail gracefully """
         block = SNMPBase()
         block._create_data = MagicMock()
-        block.execute_request = MagicMock()
+        block._execute_snmp_request = MagicMock()
         myOID = "1.3.6.1.2.1.31.1.1.1.6.2"
         ip = "0.0.0.0"
         port = 1611
@@ -182,5 +185,291 @@ class TestSNMPBlock(NIOBlockTestCase):
         block.start()
         # Send the starting signal, make sure everything was called correctly
         block.process_signals([starting_signal])
-        self.assertEqual(0, block.execute_request.call_count)
+        self.assertEqual(0, block._execute_snmp_request.call_count)
+        block.stop()
+
+    def test_concurrent_requests(self):
+        """ Requests to different agents are made at the same time """
+        block = SNMPBase()
+        block._create_data = MagicMock()
+        block._handle_data = MagicMock()
+        both_started = Barrier(2, timeout=1)
+
+        def execute(transport, oids):
+            # Blocks until the other agent's request is in flight too
+            both_started.wait()
+            return SAMPLE_SNMP_RESPONSE
+        block._execute_snmp_request = MagicMock(side_effect=execute)
+
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.1.0"}],
+            "agent_host": "{{ $ip }}",
+            "max_concurrency": 2
+        })
+        block.start()
+        block.process_signals([Signal({"ip": "10.0.0.1"}),
+                               Signal({"ip": "10.0.0.2"})])
+        self.assertFalse(both_started.broken)
+        self.assertEqual(block._handle_data.call_count, 2)
+        block.stop()
+
+    def test_sequential_result_order(self):
+        """ Requests made one at a time are made and handled in the order
+        signals came in
+        """
+        block = SNMPBase()
+        block._create_data = MagicMock()
+        block._execute_snmp_request = MagicMock(
+            return_value=SAMPLE_SNMP_RESPONSE)
+        block._handle_data = MagicMock()
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.1.0"}],
+            "agent_host": "{{ $ip }}"
+        })
+        block.start()
+        signals = [Signal({"ip": "10.0.0.1"}),
+                   Signal({"ip": "10.0.0.2"}),
+                   Signal({"ip": "10.0.0.1"})]
+        block.process_signals(signals)
+        requested = [args[0].transportAddr[0] for args, _ in
+                     block._execute_snmp_request.call_args_list]
+        self.assertEqual(requested, ["10.0.0.1", "10.0.0.2", "10.0.0.1"])
+        handled = [args[1] for args, _ in
+                   block._handle_data.call_args_list]
+        self.assertEqual(handled, signals)
+        block.stop()
+
+    def test_input_result_order(self):
+        """ Results can be handled in the order signals came in """
+        block = SNMPBase()
+        block._create_data = MagicMock()
+        block._handle_data = MagicMock()
+        requested = []
+
+        def execute(transport, oids):
+            requested.append(transport.transportAddr[0])
+            if transport.transportAddr[0] == "10.0.0.1":
+                # Completes after the other agent's request
+                sleep(0.1)
+            return SAMPLE_SNMP_RESPONSE
+        block._execute_snmp_request = MagicMock(side_effect=execute)
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.1.0"}],
+            "agent_host": "{{ $ip }}",
+            "max_concurrency": 2,
+            "result_order": "input"
+        })
+        block.start()
+        signals = [Signal({"ip": "10.0.0.1"}),
+                   Signal({"ip": "10.0.0.2"}),
+                   Signal({"ip": "10.0.0.1"})]
+        block.process_signals(signals)
+        # Handled in input order though 10.0.0.2 answered first
+        self.assertEqual(sorted(requested),
+                         ["10.0.0.1", "10.0.0.1", "10.0.0.2"])
+        handled = [args[1] for args, _ in
+                   block._handle_data.call_args_list]
+        self.assertEqual(handled, signals)
+        block.stop()
+
+    def test_asynchronous_requests(self):
+        """ Asynchronous requests run on the block's event loop """
+        block = SNMPBase()
+        block._create_data = MagicMock()
+        block._handle_data = MagicMock()
+        requested = []
+
+        async def execute(transport, oids):
+            requested.append(transport.transportAddr[0])
+            return SAMPLE_SNMP_RESPONSE
+        block._execute_snmp_request_async = execute
+
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.1.0"}],
+            "agent_host": "{{ $ip }}",
+            "asynchronous": True
+        })
+        block.start()
+        block.process_signals([Signal({"ip": "10.0.0.1"}),
+                               Signal({"ip": "10.0.0.2"})])
+        self.assertEqual(sorted(requested), ["10.0.0.1", "10.0.0.2"])
+        self.assertEqual(block._handle_data.call_count, 2)
+        block.stop()
+        self.assertIsNone(block._loop)
+
+    def test_outstanding_requests(self):
+        """ Asynchronous requests are outstanding together, up to
+        max_outstanding_requests
+        """
+        for limit, expected in ((1000, 5), (2, 2)):
+            block = SNMPBase()
+            block._create_data = MagicMock()
+            block._handle_data = MagicMock()
+            outstanding = []
+            most = []
+
+            async def execute(transport, oids):
+                outstanding.append(transport)
+                most.append(len(outstanding))
+                await asyncio.sleep(0.05)
+                outstanding.remove(transport)
+                return SAMPLE_SNMP_RESPONSE
+            block._execute_snmp_request_async = execute
+
+            properties = {
+                "oids": [{"oid": "1.3.6.1.2.1.1.1.0"}],
+                "agent_host": "{{ $ip }}",
+                "asynchronous": True
+            }
+            if limit != 1000:
+                properties["max_outstanding_requests"] = limit
+            self.configure_block(block, properties)
+            block.start()
+            block.process_signals([Signal({"ip": "10.0.0.{}".format(i)})
+                                   for i in range(5)])
+            block.stop()
+            self.assertEqual(max(most), expected)
+            self.assertEqual(block._handle_data.call_count, 5)
+
+    def test_transports_are_cached(self):
+        """ The same agent reuses its transport target """
+        block = SNMPBase()
+        block._create_data = MagicMock()
+        block._execute_snmp_request = MagicMock(
+            return_value=SAMPLE_SNMP_RESPONSE)
+        block._handle_data = MagicMock()
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.1.0"}]
+        })
+        block.start()
+        block.process_signals([Signal(), Signal()])
+        block.process_signals([Signal()])
+        transports = [args[0] for args, _ in
+                      block._execute_snmp_request.call_args_list]
+        self.assertEqual(len(transports), 3)
+        self.assertTrue(all(t is transports[0] for t in transports))
+        self.assertEqual(block._transports.stats()["misses"], 1)
+        block.stop()
+
+    def test_unresponsive_agents_are_skipped(self):
+        """ Agents that keep timing out are skipped """
+        block = SNMPBase()
+        block._create_data = MagicMock()
+        block._execute_snmp_request = MagicMock(
+            return_value=SAMPLE_ERROR_SNMP_RESPONSE)
+        block._handle_data = MagicMock()
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.1.0"}],
+            "failure_threshold": 2
+        })
+        block.start()
+        for _ in range(4):
+            block.process_signals([Signal()])
+        self.assertEqual(block._execute_snmp_request.call_count, 2)
+        block.stop()
+
+    def test_adaptive_timeout(self):
+        """ Agents get a timeout from their round trip times """
+        block = SNMPBase()
+        block._create_data = MagicMock()
+        block._execute_snmp_request = MagicMock(
+            return_value=SAMPLE_SNMP_RESPONSE)
+        block._handle_data = MagicMock()
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.1.0"}],
+            "adaptive_timeout": True,
+            "min_timeout": {"milliseconds": 300}
+        })
+        block.start()
+        block.process_signals([Signal()])
+        block.process_signals([Signal()])
+        first, second = [args[0] for args, _ in
+                         block._execute_snmp_request.call_args_list]
+        self.assertEqual(first.timeout, 1)
+        self.assertEqual(second.timeout, 0.3)
+        self.assertEqual(second.transportAddr, first.transportAddr)
+        block.stop()
+
+    def test_poll_targets(self):
+        """ Agents are polled on an interval without input signals """
+        block = SNMPBase()
+        block._create_data = MagicMock()
+        block._execute_snmp_request = MagicMock(
+            return_value=SAMPLE_SNMP_RESPONSE)
+        block._handle_data = MagicMock()
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.1.0"}],
+            "poll_targets": [{"host": "127.0.0.1", "port": 1161},
+                             {"host": "127.0.0.1", "port": 1162}],
+            "poll_interval": {"milliseconds": 100},
+            "poll_jitter": 0
+        })
+        block.start()
+        sleep(0.15)
+        block.stop()
+        ports = [args[0].transportAddr[1] for args, _ in
+                 block._execute_snmp_request.call_args_list]
+        self.assertEqual(ports[:3], [1161, 1162, 1161])
+        signal = block._handle_data.call_args_list[0][0][1]
+        self.assertEqual(signal.agent_port, 1161)
+
+    def test_slow_poll_target(self):
+        """ A slow agent doesn't hold up the polls scheduled after it """
+        block = SNMPBase()
+        block._create_data = MagicMock()
+        block._handle_data = MagicMock()
+        answer = Event()
+
+        def execute(transport, oids):
+            if transport.transportAddr[1] == 1161:
+                answer.wait(1)
+            return SAMPLE_SNMP_RESPONSE
+        block._execute_snmp_request = MagicMock(side_effect=execute)
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.1.0"}],
+            "poll_targets": [{"host": "127.0.0.1", "port": 1161},
+                             {"host": "127.0.0.1", "port": 1162}],
+            "poll_interval": {"milliseconds": 100},
+            "poll_jitter": 0
+        })
+        block.start()
+        sleep(0.25)
+        # Every poll was made in its slot while 1161 hasn't answered
+        stats = block._scheduler.stats()
+        self.assertGreaterEqual(stats["polls"], 5)
+        self.assertLess(stats["max_slip"], 0.05)
+        # 1161 isn't polled again until its last poll is done
+        self.assertGreaterEqual(
+            block.metrics()["counters"]["polls_skipped"], 2)
+        answer.set()
+        sleep(0.05)
+        block.stop()
+        ports = [args[0].transportAddr[1] for args, _ in
+                 block._execute_snmp_request.call_args_list]
+        self.assertEqual(ports[:2], [1161, 1162])
+
+    def test_static_oids_are_compiled(self):
+        """ Only OID expressions are evaluated for each signal """
+        block = SNMPBase()
+        block._create_data = MagicMock()
+        block._execute_snmp_request = MagicMock(
+            return_value=SAMPLE_SNMP_RESPONSE)
+        block._handle_data = MagicMock()
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.1.0"},
+                     {"oid": "{{ $oid }}"},
+                     {"oid": "1.3.6.1.2.1.1.5.0"}]
+        })
+        self.assertEqual(block._oids[0], "1.3.6.1.2.1.1.1.0")
+        self.assertEqual(block._oids[2], "1.3.6.1.2.1.1.5.0")
+        block.start()
+        block.process_signals([Signal({"oid": "1.3.6.1.2.1.1.3.0"})])
+        args, kwargs = block._execute_snmp_request.call_args
+        self.assertEqual(args[1], ["1.3.6.1.2.1.1.1.0", "1.3.6.1.2.1.1.3.0",
+                                   "1.3.6.1.2.1.1.5.0"])
+        # Static OIDs reuse the same parsed object on every request
+        identities = block._object_identities(args[1])
+        self.assertIs(identities[0],
+                      block._object_identities(args[1])[0])
+        self.assertNotIn("1.3.6.1.2.1.1.3.0", block._oid_identities)
         block.stop()
@@ -1,4 +1,7 @@
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+from pysnmp.proto.rfc1902 import Counter32, Counter64, Integer, \
+    ObjectName, OctetString, TimeTicks
+from nio.block.terminals import DEFAULT_TERMINAL
 from nio.signal.base import Signal
 from nio.testing.block_test_case import NIOBlockTestCase
 from ..snmp_get_block import SNMPGet
@@ -19,5 +22,254 @@ class TestSNMPGet(NIOBlockTestCase):
         # Send the starting signal, make sure everything was called correctly
         block.process_signals([starting_signal])
         args, kwargs = block._cmdGen.getCmd.call_args
-        self.assertEqual(args[2], myOID)
+        # Static OIDs are handed over already parsed
+        self.assertEqual(str(args[2].getOid()), myOID)
         block.stop()
+
+    @patch(SNMPGet.__module__ + '.snmp_asyncio.getCmd')
+    def test_asynchronous_get(self, get_cmd):
+        """ Asynchronous requests use the asyncio getCmd """
+        async def response(*args, **kwargs):
+            return None, 0, 0, []
+        get_cmd.side_effect = response
+        block = SNMPGet()
+        myOID = "1.3.6.1.2.1.31.1.1.1.6.2"
+        self.configure_block(block, {
+            "oids": [{"oid": myOID}],
+            "asynchronous": True
+        })
+        block.start()
+        block.process_signals([Signal()])
+        args, kwargs = get_cmd.call_args
+        self.assertEqual(args[0], block._snmp_engine)
+        self.assertIn(myOID, repr(args[4]))
+        self.assert_num_signals_notified(1)
+        block.stop()
+
+    def test_batch_requests(self):
+        """ OIDs of signals to the same agent are requested together """
+        block = SNMPGet()
+        block._execute_snmp_request = MagicMock(side_effect=lambda t, oids: (
+            None, 0, 0, [(ObjectName(oid), Integer(i))
+                         for i, oid in enumerate(oids)]))
+        self.configure_block(block, {
+            "oids": [{"oid": "{{ $oid }}"}, {"oid": "1.3.6.1.2.1.1.3.0"}],
+            "batch_requests": True,
+            "max_oids_per_request": 3
+        })
+        block.start()
+        block.process_signals([Signal({"oid": "1.1"}),
+                               Signal({"oid": "1.2"}),
+                               Signal({"oid": "1.3"})])
+        # 4 distinct OIDs, 3 per request
+        self.assertEqual(
+            [args[1] for args, _ in
+             block._execute_snmp_request.call_args_list],
+            [["1.1", "1.3.6.1.2.1.1.3.0", "1.2"], ["1.3"]])
+        # Each signal gets the values of its own OIDs
+        signals = self.last_notified[DEFAULT_TERMINAL]
+        self.assertEqual(len(signals), 3)
+        self.assertEqual(signals[0].to_dict(), {
+            "oid": "1.1", "SNMPv2-SMI::iso.1": "0",
+            "SNMPv2-MIB::sysUpTime.0": "1"})
+        self.assertEqual(signals[1].to_dict(), {
+            "oid": "1.2", "SNMPv2-SMI::iso.2": "2",
+            "SNMPv2-MIB::sysUpTime.0": "1"})
+        self.assertEqual(signals[2].to_dict(), {
+            "oid": "1.3", "SNMPv2-SMI::org": "0",
+            "SNMPv2-MIB::sysUpTime.0": "1"})
+        block.stop()
+
+    def test_batch_too_big(self):
+        """ Batches are split when the agent says they are too big """
+        def execute(transport, oids):
+            if len(oids) > 2:
+                return None, Integer(1), 0, []
+            return None, 0, 0, [(ObjectName(oid), Integer(0))
+                                for oid in oids]
+        block = SNMPGet()
+        block._execute_snmp_request = MagicMock(side_effect=execute)
+        self.configure_block(block, {
+            "oids": [{"oid": "{{ $oid }}"}],
+            "batch_requests": True
+        })
+        block.start()
+        block.process_signals([Signal({"oid": "1.{}".format(i)})
+                               for i in range(4)])
+        self.assert_num_signals_notified(4)
+        self.assertEqual(block._execute_snmp_request.call_count, 3)
+        # The next poll starts out with the smaller batch size
+        block.process_signals([Signal({"oid": "1.{}".format(i)})
+                               for i in range(4)])
+        self.assertEqual(block._execute_snmp_request.call_count, 5)
+        block.stop()
+
+    def test_batch_error_status(self):
+        """ An OID the agent has an error with only fails its own signal """
+        def execute(transport, oids):
+            if "1.9" in oids:
+                # noSuchName, at the position of the bad OID
+                return None, Integer(2), oids.index("1.9") + 1, []
+            return None, 0, 0, [(ObjectName(oid), Integer(0))
+                                for oid in oids]
+        block = SNMPGet()
+        block._execute_snmp_request = MagicMock(side_effect=execute)
+        self.configure_block(block, {
+            "oids": [{"oid": "{{ $oid }}"}],
+            "batch_requests": True
+        })
+        block.start()
+        block.process_signals([Signal({"oid": "1.{}".format(i)})
+                               for i in (1, 9, 2, 3)])
+        block.stop()
+        self.assertEqual(
+            [args[1] for args, _ in
+             block._execute_snmp_request.call_args_list],
+            [["1.1", "1.9", "1.2", "1.3"], ["1.1", "1.2", "1.3"]])
+        self.assertEqual(
+            [signal.oid for signal in self.last_notified[DEFAULT_TERMINAL]],
+            ["1.1", "1.2", "1.3"])
+
+    def test_native_values(self):
+        """ Values can be notified as Python values instead of strings """
+        block = SNMPGet()
+        block._execute_snmp_request = MagicMock(return_value=(
+            None, 0, 0, [
+                (ObjectName("1.3.6.1.2.1.1.5.0"), OctetString("router")),
+                (ObjectName("1.3.6.1.2.1.31.1.1.1.6.2"),
+                 Counter64(227651521193))]))
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.5.0"},
+                     {"oid": "1.3.6.1.2.1.31.1.1.1.6.2"}],
+            "value_format": "native"
+        })
+        block.start()
+        block.process_signals([Signal()])
+        block.stop()
+        self.assertEqual(self.last_notified[DEFAULT_TERMINAL][0].to_dict(), {
+            "SNMPv2-MIB::sysName.0": "router",
+            "SNMPv2-SMI::mib-2.31.1.1.1.6.2": 227651521193})
+
+    def test_counter_rates(self):
+        """ Counters are given a delta and rate since the last poll """
+        block = SNMPGet()
+        block._execute_snmp_request = MagicMock(side_effect=[
+            (None, 0, 0, [
+                (ObjectName("1.3.6.1.2.1.1.3.0"), TimeTicks(1000)),
+                (ObjectName("1.3.6.1.2.1.11.1.0"), Counter32(100))]),
+            (None, 0, 0, [
+                (ObjectName("1.3.6.1.2.1.1.3.0"), TimeTicks(1500)),
+                (ObjectName("1.3.6.1.2.1.11.1.0"), Counter32(600))])])
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.3.0"},
+                     {"oid": "1.3.6.1.2.1.11.1.0"}],
+            "counter_rates": True
+        })
+        block.start()
+        block.process_signals([Signal()])
+        block.process_signals([Signal()])
+        block.stop()
+        signals = self.last_notified[DEFAULT_TERMINAL]
+        self.assertIsNone(
+            signals[0].to_dict()["SNMPv2-MIB::snmpInPkts.0_rate"])
+        self.assertEqual(signals[1].to_dict(), {
+            "SNMPv2-MIB::sysUpTime.0": "1500",
+            "SNMPv2-MIB::snmpInPkts.0": "600",
+            "SNMPv2-MIB::snmpInPkts.0_delta": 500,
+            "SNMPv2-MIB::snmpInPkts.0_rate": 100})
+
+    def test_changes_only(self):
+        """ Only values that changed since the last poll are notified """
+        block = SNMPGet()
+        block._execute_snmp_request = MagicMock(side_effect=[
+            (None, 0, 0, [
+                (ObjectName("1.3.6.1.2.1.1.5.0"), OctetString("router")),
+                (ObjectName("1.3.6.1.2.1.11.1.0"), Counter32(100))]),
+            (None, 0, 0, [
+                (ObjectName("1.3.6.1.2.1.1.5.0"), OctetString("router")),
+                (ObjectName("1.3.6.1.2.1.11.1.0"), Counter32(100))]),
+            (None, 0, 0, [
+                (ObjectName("1.3.6.1.2.1.1.5.0"), OctetString("router")),
+                (ObjectName("1.3.6.1.2.1.11.1.0"), Counter32(600))])])
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.5.0"},
+                     {"oid": "1.3.6.1.2.1.11.1.0"}],
+            "changes_only": True,
+            "counter_rates": True
+        })
+        block.start()
+        for _ in range(3):
+            block.process_signals([Signal({"poll": True})])
+        block.stop()
+        signals = self.last_notified[DEFAULT_TERMINAL]
+        self.assertEqual(len(signals), 2)
+        self.assertEqual(signals[0].to_dict(), {
+            "poll": True,
+            "SNMPv2-MIB::sysName.0": "router",
+            "SNMPv2-MIB::snmpInPkts.0": "100",
+            "SNMPv2-MIB::snmpInPkts.0_delta": None,
+            "SNMPv2-MIB::snmpInPkts.0_rate": None})
+        self.assertEqual(signals[1].to_dict()["SNMPv2-MIB::snmpInPkts.0"],
+                         "600")
+        self.assertEqual(
+            signals[1].to_dict()["SNMPv2-MIB::snmpInPkts.0_delta"], 500)
+        self.assertNotIn("SNMPv2-MIB::sysName.0", signals[1].to_dict())
+
+    def test_snmp_v3(self):
+        """ SNMP v3 requests use keys localized for the agent's engine """
+        block = SNMPGet()
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.5.0"}],
+            "snmp_version": "SMIv3",
+            "usm": {"user": "poller", "auth_protocol": "sha",
+                    "auth_key": "authkey123", "priv_protocol": "aes128",
+                    "priv_key": "privkey123"}
+        })
+        block._cmdGen = MagicMock()
+        get_peer_engine_info = block._cmdGen.snmpEngine.\
+            messageProcessingSubsystems.__getitem__.return_value.\
+            getPeerEngineInfo
+        get_peer_engine_info.return_value = (None, None, None)
+        block.start()
+        block.process_signals([Signal()])
+        # The agent's engine ID isn't known before the first request
+        data = block._cmdGen.getCmd.call_args[0][0]
+        self.assertEqual(data.userName, "poller")
+        self.assertIsNone(data.securityEngineId)
+        get_peer_engine_info.return_value = (
+            OctetString(b"\x80\x00\x01"), None, None)
+        block.process_signals([Signal()])
+        data = block._cmdGen.getCmd.call_args[0][0]
+        self.assertEqual(bytes(data.securityEngineId), b"\x80\x00\x01")
+        block.stop()
+
+    def test_metrics(self):
+        """ Requests are counted per agent, with their component stats """
+        block = SNMPGet()
+        block._execute_snmp_request = MagicMock(side_effect=[
+            (None, 0, 0, [
+                (ObjectName("1.3.6.1.2.1.1.3.0"), TimeTicks(1000)),
+                (ObjectName("1.3.6.1.2.1.11.1.0"), Counter32(100))]),
+            (None, Integer(2), 1, [])])
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1.3.0"},
+                     {"oid": "1.3.6.1.2.1.11.1.0"}],
+            "agent_host": "10.0.0.1",
+            "counter_rates": True
+        })
+        block.start()
+        block.process_signals([Signal()])
+        block.process_signals([Signal()])
+        block.stop()
+        metrics = block.metrics()
+        self.assertEqual(metrics["in_flight"], 0)
+        self.assertEqual(metrics["counters"]["pdus_sent"], 2)
+        self.assertEqual(metrics["counters"]["var_binds"], 2)
+        agent = metrics["agents"]["10.0.0.1:161"]
+        self.assertEqual(agent["requests"], 2)
+        self.assertEqual(agent["error_statuses"], {"2": 1})
+        # Waiting on the lock to make each request
+        self.assertEqual(metrics["histograms"]["lock_wait"]["count"], 2)
+        self.assertEqual(metrics["transport_cache"]["misses"], 1)
+        self.assertEqual(metrics["counter_tracker"]["size"], 1)
+        self.assertIn("10.0.0.1:161", metrics["agent_tracker"])
@@ -1,15 +1,27 @@
+import socket
+from time import sleep
 from unittest.mock import MagicMock, patch
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto import api
 from pysnmp.proto.error import ProtocolError
 from nio.testing.block_test_case import NIOBlockTestCase
 from ..snmp_trap_block import SNMPTrap, TrapDispatcherThread
 
 
+TRAP = b'0Y\x02\x01\x01\x04\x06public\xa7L\x02\x04\x00\xb7\x19\x89' \
+       b'\x02\x01\x00\x02\x01\x000>0\r\x06\x08+\x06\x01\x02\x01\x01' \
+       b'\x03\x00C\x01\x000\x17\x06\n+\x06\x01\x06\x03\x01\x01\x04' \
+       b'\x01\x00\x06\t+\x06\x01\x06\x03\x01\x01\x05\x010\x14\x06' \
+       b'\x08+\x06\x01\x02\x01\x01\x05\x00\x04\x08new name'
+INFORM = TRAP.replace(b'public\xa7', b'public\xa6')
+
+
 class TestSNMPTrapBlock(NIOBlockTestCase):
 
     def test_init(self):
         block = SNMPTrap()
-        self.assertIsNone(block._transport_dispatcher)
-        self.assertIsNone(block._dispatcher_thread)
+        self.assertEqual(block._transport_dispatchers, [])
+        self.assertEqual(block._dispatcher_threads, [])
         self.assertEqual("127.0.0.1", block.ip_address())
         self.assertEqual(162, block.port())
 
@@ -20,8 +32,8 @@ class TestSNMPTrapBlock(NIOBlockTestCase):
         self.configure_block(block, {
             "ip_address": "10.0.0.1",
             "port": 9999})
-        self.assertIsNotNone(block._transport_dispatcher)
-        self.assertIsNone(block._dispatcher_thread)
+        self.assertEqual(len(block._transport_dispatchers), 1)
+        self.assertEqual(block._dispatcher_threads, [])
         self.assertEqual(block.ip_address(), "10.0.0.1")
         self.assertEqual(block.port(), 9999)
         self.assertEqual(block._register_transports.call_count, 1)
@@ -37,17 +49,19 @@ class TestSNMPTrapBlock(NIOBlockTestCase):
                 self.join = MagicMock()
 
         block = SNMPTrap()
+        block._register_transports = MagicMock()
+        self.configure_block(block, {})
         my_thread = DispatcherMyThread(None, None)
         thread_mock.return_value = my_thread
 
         block.start()
-        self.assertIsNotNone(block._dispatcher_thread)
+        self.assertEqual(block._dispatcher_threads, [my_thread])
         self.assertTrue(my_thread.start.called)
         self.assertFalse(my_thread.stop.called)
         self.assertFalse(my_thread.join.called)
 
         block.stop()
-        self.assertIsNone(block._dispatcher_thread)
+        self.assertEqual(block._dispatcher_threads, [])
         self.assertTrue(my_thread.stop.called)
         self.assertTrue(my_thread.join.called)
 
@@ -65,11 +79,7 @@ class TestSNMPTrapBlock(NIOBlockTestCase):
         self.assert_num_signals_notified(0, block, "trap")
 
         # use valid data
-        msg = b'0Y\x02\x01\x01\x04\x06public\xa7L\x02\x04\x00\xb7\x19\x89' \
-              b'\x02\x01\x00\x02\x01\x000>0\r\x06\x08+\x06\x01\x02\x01\x01' \
-              b'\x03\x00C\x01\x000\x17\x06\n+\x06\x01\x06\x03\x01\x01\x04' \
-              b'\x01\x00\x06\t+\x06\x01\x06\x03\x01\x01\x05\x010\x14\x06' \
-              b'\x08+\x06\x01\x02\x01\x01\x05\x00\x04\x08new name'
+        msg = TRAP
         # attempt to deliver signal since it throws a block router exception
         with self.assertRaises(AttributeError):
             block._on_trap(None, (1, 3, 6, 1, 1), ('127.0.0.1', 49999), msg)
@@ -82,6 +92,233 @@ class TestSNMPTrapBlock(NIOBlockTestCase):
         block._on_trap(None, (1, 3, 6, 1, 1), ('127.0.0.1', 49999), msg)
         self.assert_num_signals_notified(1, block, "trap")
 
+    def test_reuse_port_listeners(self):
+        """ Several sockets share the port, each with its own thread """
+        block = SNMPTrap()
+        self.configure_block(block, {
+            "port": 16262,
+            "listeners": 3,
+            "receive_buffer_size": 1 << 20})
+        self.assertEqual(len(block._transport_dispatchers), 3)
+        block.start()
+        self.assertEqual(len(block._dispatcher_threads), 3)
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for _ in range(5):
+            sender.sendto(TRAP, ("127.0.0.1", 16262))
+        sender.close()
+        for _ in range(100):
+            if len(self.notified_signals["trap"]) == 5:
+                break
+            sleep(0.01)
+        block.stop()
+        self.assert_num_signals_notified(5, block, "trap")
+        self.assertEqual(block._dispatcher_threads, [])
+
+    def test_reuse_port_sockets(self):
+        """ Listener sockets are opened with SO_REUSEPORT """
+        block = SNMPTrap()
+        block._register_transports = MagicMock()
+        self.configure_block(block, {"listeners": 2})
+        transport = MagicMock()
+        block._open_server(transport, ("127.0.0.1", 16200))
+        transport.socket.setsockopt.assert_called_once_with(
+            socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        transport.openServerMode.assert_called_once_with(
+            ("127.0.0.1", 16200))
+
+    @patch(SNMPTrap.__module__ + '.TrapDispatcherThread')
+    def test_decode_workers(self, thread_mock):
+        """ Traps are decoded by the worker pool when it is configured """
+        block = SNMPTrap()
+        block._register_transports = MagicMock()
+        self.configure_block(block, {"decode_workers": 2})
+        block.start()
+        workers = block._workers
+        block._on_trap(None, (1, 3, 6, 1, 1), ('127.0.0.1', 49999), TRAP)
+        block._on_trap(None, (1, 3, 6, 1, 1), ('127.0.0.1', 49999), TRAP)
+        block.stop()
+        self.assertEqual(workers.stats()["handled"], 2)
+        self.assert_num_signals_notified(2, block, "trap")
+
+    @patch(SNMPTrap.__module__ + '.TrapDispatcherThread')
+    def test_metrics(self, thread_mock):
+        """ Traps are counted and timed, metrics go out on their output """
+        block = SNMPTrap()
+        block._register_transports = MagicMock()
+        self.configure_block(block, {
+            "decode_workers": 1,
+            "metrics_interval": {"seconds": 0.1}})
+        block.start()
+        dispatcher = MagicMock()
+        for message in (TRAP, INFORM, b'\x30'):
+            block._on_trap(
+                dispatcher, (1, 3, 6, 1, 1), ('127.0.0.1', 49999), message)
+        sleep(0.3)
+        metrics = block.metrics()
+        block.stop()
+        self.assertEqual(metrics["counters"], {
+            "received": 3, "informs_acknowledged": 1, "notified": 2,
+            "decode_errors": 1})
+        self.assertEqual(metrics["histograms"]["decode"]["count"], 2)
+        self.assertEqual(metrics["histograms"]["queue_wait"]["count"], 3)
+        self.assertEqual(metrics["trap_workers"]["errors"], 1)
+        self.assertNotIn("agents", metrics)
+        self.assertGreater(len(self.last_notified["stats"]), 0)
+        self.assertIn("counters", self.last_notified["stats"][0].to_dict())
+
+    @patch(SNMPTrap.__module__ + '.TrapDispatcherThread')
+    def test_batched_traps(self, thread_mock):
+        """ Traps are notified in batches when a batch size is set """
+        block = SNMPTrap()
+        block._register_transports = MagicMock()
+        self.configure_block(block, {
+            "batch_size": 3,
+            "batch_latency": {"seconds": 10}})
+        block.start()
+        for _ in range(4):
+            block._on_trap(None, (1, 3, 6, 1, 1), ('127.0.0.1', 49999), TRAP)
+        self.assert_num_signals_notified(3, block, "trap")
+        block.stop()
+        self.assert_num_signals_notified(4, block, "trap")
+        self.assertEqual(len(self.last_notified["trap"]), 4)
+
+    def test_fast_decode(self):
+        """ The fast decoder builds the same signals as pyasn1 """
+        block = SNMPTrap()
+        block._register_transports = MagicMock()
+        self.configure_block(block, {"fast_decode": True})
+        block._decode = MagicMock(side_effect=block._decode)
+        block._on_trap(None, (1, 3, 6, 1, 1), ('127.0.0.1', 49999), TRAP)
+        self.assertEqual(block._decode.call_count, 0)
+        fast = self.last_notified["trap"][0].to_dict()
+
+        block._decode_fast = MagicMock(return_value=None)
+        block._on_trap(None, (1, 3, 6, 1, 1), ('127.0.0.1', 49999), TRAP)
+        self.assertEqual(block._decode.call_count, 1)
+        self.assertEqual(self.last_notified["trap"][1].to_dict(), fast)
+        self.assertEqual(
+            fast["var-binds"]["1.3.6.1.6.3.1.1.4.1.0"],
+            {"value": {"simple": {"objectID-value": "1.3.6.1.6.3.1.1.5.1"}}})
+
+    @patch(SNMPTrap.__module__ + '.TrapDispatcherThread')
+    def test_dedup(self, thread_mock):
+        """ Repeats of a trap from an agent are suppressed """
+        block = SNMPTrap()
+        block._register_transports = MagicMock()
+        self.configure_block(block, {
+            "dedup_window": {"seconds": 60},
+            "dedup_var_binds": [{"oid": "1.3.6.1.2.1.1.5.0"}]})
+        block.start()
+        for _ in range(3):
+            block._on_trap(None, (1, 3, 6, 1, 1), ('127.0.0.1', 49999), TRAP)
+        # Another agent
+        block._on_trap(None, (1, 3, 6, 1, 1), ('127.0.0.2', 49999), TRAP)
+        # Another value of a dedup var bind
+        block._on_trap(None, (1, 3, 6, 1, 1), ('127.0.0.1', 49999),
+                       TRAP.replace(b'new name', b'old name'))
+        self.assert_num_signals_notified(3, block, "trap")
+        self.assertEqual(self.last_notified["trap"][0].suppressed, 0)
+        block.stop()
+        # The last repeat is notified with its count on stop
+        self.assert_num_signals_notified(4, block, "trap")
+        self.assertEqual(self.last_notified["trap"][3].suppressed, 2)
+
+    def test_acknowledge_informs(self):
+        """ Informs are answered before they are decoded """
+        block = SNMPTrap()
+        block._register_transports = MagicMock()
+        self.configure_block(block, {})
+        dispatcher = MagicMock()
+        block._on_trap(dispatcher, (1, 3, 6, 1, 1), ('127.0.0.1', 49999),
+                       INFORM)
+        response = TRAP.replace(b'public\xa7', b'public\xa2')
+        dispatcher.sendMessage.assert_called_once_with(
+            response, (1, 3, 6, 1, 1), ('127.0.0.1', 49999))
+        self.assertEqual(block._build_inform_responses(INFORM), [response])
+        # Informs carry their var-binds like traps do
+        self.assertEqual(
+            self.last_notified["trap"][0].to_dict()["var-binds"],
+            block._decode((1, 3, 6, 1, 1), ('127.0.0.1', 49999),
+                          TRAP)[0].to_dict()["var-binds"])
+        # Traps aren't answered
+        block._on_trap(dispatcher, (1, 3, 6, 1, 1), ('127.0.0.1', 49999),
+                       TRAP)
+        self.assertEqual(dispatcher.sendMessage.call_count, 1)
+
+        block = SNMPTrap()
+        block._register_transports = MagicMock()
+        self.configure_block(block, {"acknowledge_informs": False})
+        dispatcher = MagicMock()
+        block._on_trap(dispatcher, (1, 3, 6, 1, 1), ('127.0.0.1', 49999),
+                       INFORM)
+        self.assertEqual(dispatcher.sendMessage.call_count, 0)
+
+    def test_snmp_v3(self):
+        """ SNMPv3 notifications are notified like v2c traps """
+        block = SNMPTrap()
+        block._register_transports = MagicMock()
+        self.configure_block(block, {
+            "listeners": 2,
+            "usm_users": [{"user": "user", "auth_protocol": "sha",
+                           "auth_key": "authkey123"}]})
+        receivers = block._usm_receivers
+        self.assertEqual(len(receivers), 2)
+        self.assertEqual(receivers[0].engine_id, receivers[1].engine_id)
+        p_mod = api.protoModules[api.protoVersion2c]
+        msg, _ = decoder.decode(TRAP, asn1Spec=p_mod.Message())
+        block._on_v3_notification((1, 3, 6, 1, 1), ('127.0.0.1', 49999),
+                                  p_mod.apiMessage.getPDU(msg))
+        self.assertEqual(
+            self.last_notified["trap"][0].to_dict(),
+            block._decode(
+                (1, 3, 6, 1, 1), ('127.0.0.1', 49999), TRAP)[0].to_dict())
+
+    def test_routes(self):
+        """ Traps are routed by OID subtree, or dropped before decoding """
+        v1 = api.protoModules[api.protoVersion1]
+        pdu = v1.TrapPDU()
+        v1.apiTrapPDU.setDefaults(pdu)
+        v1.apiTrapPDU.setEnterprise(pdu, (1, 3, 6, 1, 4, 1, 9))
+        v1.apiTrapPDU.setGenericTrap(pdu, 6)
+        msg = v1.Message()
+        v1.apiMessage.setDefaults(msg)
+        v1.apiMessage.setCommunity(msg, 'public')
+        v1.apiMessage.setPDU(msg, pdu)
+        v1_trap = encoder.encode(msg)
+        warm_start = TRAP.replace(b'\x05\x010\x14', b'\x05\x020\x14')
+        for fast_decode in (False, True):
+            block = SNMPTrap()
+            block._register_transports = MagicMock()
+            self.configure_block(block, {
+                "fast_decode": fast_decode,
+                "routes": [
+                    {"name": "cold", "match": "trap_oid",
+                     "prefix": "1.3.6.1.6.3.1.1.5.1"},
+                    {"match": "enterprise", "prefix": "1.3.6.1.4.1.9",
+                     "action": "drop"},
+                    {"name": "local", "match": "source",
+                     "prefix": "127"}],
+                "unrouted_action": "drop"})
+            block._get_var_binds_data = MagicMock(return_value={})
+            block._get_fast_var_bind_data = MagicMock(return_value={})
+            for trap, source in ((TRAP, '10.0.0.1'), (v1_trap, '127.0.0.1'),
+                                 (warm_start, '10.0.0.1'),
+                                 (warm_start, '127.0.0.1')):
+                block._on_trap(None, (1, 3, 6, 1, 1), (source, 49999), trap)
+            signals = self.last_notified["trap"][-2:]
+            self.assertEqual(signals[0].route, "cold")
+            self.assertEqual(signals[1].route, "local")
+            self.assertEqual(block._router.stats(), {
+                "routed": {"cold": 1, "local": 1},
+                "dropped": 1,
+                "unmatched": 1})
+            # Dropped traps never get their var-binds built, once per
+            # message with pyasn1, once per var bind with fast_decode
+            self.assertEqual(block._get_var_binds_data.call_count +
+                             block._get_fast_var_bind_data.call_count,
+                             6 if fast_decode else 2)
+            self.assert_num_signals_notified(2, block, "trap")
+
     def test_var_bind_data(self):
         """ Provides coverage for _get_var_bind_data method
         """
@@ -1,4 +1,6 @@
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+from pysnmp.proto.rfc1902 import Integer, ObjectName, OctetString
+from nio.block.terminals import DEFAULT_TERMINAL
 from nio.signal.base import Signal
 from nio.testing.block_test_case import NIOBlockTestCase
 from ..snmp_walk_block import SNMPWalk
@@ -19,5 +21,178 @@ class TestSNMPWalk(NIOBlockTestCase):
         # Send the starting signal, make sure everything was called correctly
         block.process_signals([starting_signal])
         args, kwargs = block._cmdGen.nextCmd.call_args
-        self.assertEqual(args[2], myOID)
+        # Static OIDs are handed over already parsed
+        self.assertEqual(str(args[2].getOid()), myOID)
         block.stop()
+
+    def test_bulk_walk(self):
+        """ Bulk walks are made one round trip at a time """
+        block = SNMPWalk()
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1"}],
+            "bulk_walk": True,
+            "max_repetitions": 10
+        })
+        block._walk_step = MagicMock(side_effect=[
+            (None, Integer(1), 1, []),
+            (None, 0, 0, [[(ObjectName("1.3.6.1.2.1.1.1.0"), Integer(1))],
+                          [(ObjectName("1.3.6.1.2.1.1.2.0"), Integer(2))]]),
+            (None, 0, 0, [[(ObjectName("1.3.6.1.2.1.2.1.0"), Integer(3))]])
+        ])
+        block.start()
+        block.process_signals([Signal()])
+        self.assert_num_signals_notified(1)
+        self.assertEqual(self.last_notified[DEFAULT_TERMINAL][0].to_dict(), {
+            "SNMPv2-MIB::sysDescr.0": "1", "SNMPv2-MIB::sysObjectID.0": "2"})
+        # The response was too big the first time
+        transport = block._walk_step.call_args[0][1]
+        self.assertEqual(block._repetitions(transport), 5)
+        block.stop()
+
+    @patch(SNMPWalk.__module__ + '.snmp_asyncore.nextCmd')
+    @patch(SNMPWalk.__module__ + '.snmp_asyncore.bulkCmd')
+    def test_snmp_v3_bulk_walk(self, bulk_cmd, next_cmd):
+        """ SNMP v3 walks use GETBULK too """
+        def respond(*args, **kwargs):
+            kwargs["cbFun"](args[0], 1, None, 0, 0, [
+                [(ObjectName("1.3.6.1.2.1.1.1.0"), Integer(1))],
+                [(ObjectName("1.3.6.1.2.1.2.1.0"), Integer(2))]], None)
+        bulk_cmd.side_effect = respond
+        block = SNMPWalk()
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.1"}],
+            "snmp_version": "SMIv3",
+            "usm": {"user": "poller", "auth_protocol": "sha",
+                    "auth_key": "authkey123"},
+            "bulk_walk": True,
+            "max_repetitions": 10
+        })
+        block._cmdGen.snmpEngine.transportDispatcher = MagicMock()
+        block.start()
+        block.process_signals([Signal()])
+        block.stop()
+        self.assertEqual(bulk_cmd.call_count, 1)
+        self.assertEqual(next_cmd.call_count, 0)
+        # Non repeaters, then max repetitions
+        self.assertEqual(bulk_cmd.call_args[0][4:6], (0, 10))
+        self.assertEqual(self.last_notified[DEFAULT_TERMINAL][0].to_dict(), {
+            "SNMPv2-MIB::sysDescr.0": "1"})
+
+    def test_streaming_walk(self):
+        """ Rows are notified in signals of rows_per_signal rows """
+        def page(start, end):
+            return None, 0, 0, [
+                [(ObjectName("1.3.6.1.2.1.4.22.1.2.{}".format(i)),
+                  Integer(i))] for i in range(start, end)]
+        block = SNMPWalk()
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.4.22.1.2"}],
+            "rows_per_signal": 2,
+            "max_rows": 6
+        })
+        block._walk_step = MagicMock(
+            side_effect=[page(1, 4), page(4, 7), page(7, 10)])
+        block.start()
+        block.process_signals([Signal({"existing": "value"})])
+        # The walk stopped at max_rows without asking for the last page
+        self.assertEqual(block._walk_step.call_count, 2)
+        self.assert_num_signals_notified(3)
+        signals = self.last_notified[DEFAULT_TERMINAL]
+        self.assertEqual(signals[0].to_dict(), {
+            "existing": "value",
+            "SNMPv2-SMI::mib-2.4.22.1.2.1": "1",
+            "SNMPv2-SMI::mib-2.4.22.1.2.2": "2"})
+        self.assertEqual(signals[2].to_dict(), {
+            "existing": "value",
+            "SNMPv2-SMI::mib-2.4.22.1.2.5": "5",
+            "SNMPv2-SMI::mib-2.4.22.1.2.6": "6"})
+        block.stop()
+
+    def _table_walk(self, table_output, value_format="string"):
+        block = SNMPWalk()
+        self.configure_block(block, {
+            "oids": [{"oid": "1.3.6.1.2.1.2.2.1.2"},
+                     {"oid": "1.3.6.1.2.1.2.2.1.8"}],
+            "table_output": table_output,
+            "value_format": value_format
+        })
+        block._walk_step = MagicMock(side_effect=[
+            (None, 0, 0, [
+                [(ObjectName("1.3.6.1.2.1.2.2.1.2.1"), OctetString("lo")),
+                 (ObjectName("1.3.6.1.2.1.2.2.1.8.1"), Integer(1))],
+                [(ObjectName("1.3.6.1.2.1.2.2.1.2.2"), OctetString("eth0")),
+                 (ObjectName("1.3.6.1.2.1.2.2.1.8.2"), Integer(2))],
+                [(ObjectName("1.3.6.1.2.1.2.2.1.3.1"), Integer(24)),
+                 (ObjectName("1.3.6.1.2.1.2.2.1.9.1"), Integer(0))]])])
+        block.start()
+        block.process_signals([Signal({"host": "router"})])
+        block.stop()
+        return self.last_notified[DEFAULT_TERMINAL]
+
+    @patch(SNMPWalk.__module__ + '.MAX_COLUMN_ROOTS', 1)
+    def test_dynamic_table_columns(self):
+        """ Roots of dynamic columns are resolved once, and only so many
+        are kept
+        """
+        block = SNMPWalk()
+        self.configure_block(block, {
+            "oids": [{"oid": "{{ $column }}"}],
+            "table_output": "rows"
+        })
+        # Each walk ends at the next column
+        block._walk_step = MagicMock(side_effect=[
+            (None, 0, 0, [[(ObjectName("1.3.6.1.2.1.2.2.1.2.1"),
+                            OctetString("lo"))]]),
+            (None, 0, 0, [[(ObjectName("1.3.6.1.2.1.2.2.1.3.1"),
+                            Integer(24))]]),
+            (None, 0, 0, [[(ObjectName("1.3.6.1.2.1.2.2.1.8.1"),
+                            Integer(1))]]),
+            (None, 0, 0, [[(ObjectName("1.3.6.1.2.1.2.2.1.9.1"),
+                            Integer(0))]])])
+        block.start()
+        block.process_signals([Signal({"column": "1.3.6.1.2.1.2.2.1.2"})])
+        block.process_signals([Signal({"column": "1.3.6.1.2.1.2.2.1.8"})])
+        block.stop()
+        self.assertEqual(list(block._column_roots),
+                         ["1.3.6.1.2.1.2.2.1.8"])
+        self.assertEqual(
+            [signal.to_dict() for signal in
+             self.last_notified[DEFAULT_TERMINAL]], [
+                {"column": "1.3.6.1.2.1.2.2.1.2", "index": "1",
+                 "1.3.6.1.2.1.2.2.1.2": "lo"},
+                {"column": "1.3.6.1.2.1.2.2.1.8", "index": "1",
+                 "1.3.6.1.2.1.2.2.1.8": "1"}])
+
+    def test_table_rows(self):
+        """ Table walks notify a signal per row """
+        signals = self._table_walk("rows")
+        self.assertEqual(len(signals), 2)
+        self.assertDictEqual(signals[0].to_dict(), {
+            "host": "router",
+            "index": "1",
+            "1.3.6.1.2.1.2.2.1.2": "lo",
+            "1.3.6.1.2.1.2.2.1.8": "1"})
+        self.assertDictEqual(signals[1].to_dict(), {
+            "host": "router",
+            "index": "2",
+            "1.3.6.1.2.1.2.2.1.2": "eth0",
+            "1.3.6.1.2.1.2.2.1.8": "2"})
+
+    def test_table_columns(self):
+        """ Table walks can notify a single signal of columns """
+        signals = self._table_walk("columns")
+        self.assertEqual(len(signals), 1)
+        self.assertDictEqual(signals[0].to_dict(), {
+            "host": "router",
+            "index": ["1", "2"],
+            "1.3.6.1.2.1.2.2.1.2": ["lo", "eth0"],
+            "1.3.6.1.2.1.2.2.1.8": ["1", "2"]})
+
+    def test_native_table_values(self):
+        """ Table cells can be Python values instead of strings """
+        signals = self._table_walk("columns", "native")
+        self.assertDictEqual(signals[0].to_dict(), {
+            "host": "router",
+            "index": ["1", "2"],
+            "1.3.6.1.2.1.2.2.1.2": ["lo", "eth0"],
+            "1.3.6.1.2.1.2.2.1.8": [1, 2]})
@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock, patch
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..transport_cache import TransportCache
+
+
+class TestTransportCache(NIOBlockTestCase):
+
+    def test_cached_targets(self):
+        """ Targets are only built once per key """
+        cache = TransportCache(10, 60)
+        factory = MagicMock(side_effect=lambda: object())
+        target = cache.get(("1.1.1.1", 161), factory)
+        self.assertIs(cache.get(("1.1.1.1", 161), factory), target)
+        self.assertIsNot(cache.get(("1.1.1.2", 161), factory), target)
+        self.assertEqual(factory.call_count, 2)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_least_recently_used_eviction(self):
+        """ The least recently used target is evicted when full """
+        cache = TransportCache(2, 60)
+        first = cache.get(1, object)
+        second = cache.get(2, object)
+        cache.get(1, object)
+        cache.get(3, object)
+        self.assertIs(cache.get(1, object), first)
+        self.assertIsNot(cache.get(2, object), second)
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    @patch(TransportCache.__module__ + '.monotonic')
+    def test_expiration(self, monotonic):
+        """ Targets older than the ttl are rebuilt """
+        cache = TransportCache(10, 60)
+        monotonic.return_value = 0
+        target = cache.get(1, object)
+        monotonic.return_value = 59
+        self.assertIs(cache.get(1, object), target)
+        monotonic.return_value = 61
+        self.assertIsNot(cache.get(1, object), target)
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_disabled(self):
+        """ A size of 0 never caches """
+        cache = TransportCache(0, 60)
+        self.assertIsNot(cache.get(1, object), cache.get(1, object))
+        self.assertEqual(cache.stats()["size"], 0)
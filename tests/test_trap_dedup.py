@@ -0,0 +1,62 @@
+from unittest.mock import patch
+from nio.signal.base import Signal
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..trap_dedup import TrapDeduplicator
+
+
+@patch(TrapDeduplicator.__module__ + '.monotonic')
+class TestTrapDeduplicator(NIOBlockTestCase):
+
+    def test_repeats_are_suppressed(self, monotonic):
+        """ Repeats in a window are counted and the last one let through """
+        monotonic.return_value = 0
+        dedup = TrapDeduplicator(10)
+        first = Signal({"n": 1})
+        self.assertEqual(dedup.check("key", first), [first])
+        self.assertEqual(first.suppressed, 0)
+        for n in range(2, 5):
+            self.assertEqual(dedup.check("key", Signal({"n": n})), [])
+        other = Signal({"n": 5})
+        self.assertEqual(dedup.check("other", other), [other])
+        self.assertEqual(dedup.expire(), [])
+
+        monotonic.return_value = 10
+        last, = dedup.expire()
+        self.assertEqual(last.n, 4)
+        self.assertEqual(last.suppressed, 3)
+        self.assertEqual(dedup.stats(), {"windows": 0, "suppressed": 3})
+        # A new window is started for the next trap
+        again = Signal({"n": 6})
+        self.assertEqual(dedup.check("key", again), [again])
+
+    def test_late_expiry(self, monotonic):
+        """ A trap after an unexpired window carries its count """
+        monotonic.return_value = 0
+        dedup = TrapDeduplicator(10)
+        dedup.check("key", Signal())
+        dedup.check("key", Signal())
+        monotonic.return_value = 11
+        signal = Signal()
+        self.assertEqual(dedup.check("key", signal), [signal])
+        self.assertEqual(signal.suppressed, 1)
+
+    def test_eviction(self, monotonic):
+        """ Only max_keys windows are kept, evicted repeats are let out """
+        monotonic.return_value = 0
+        dedup = TrapDeduplicator(10, max_keys=2)
+        dedup.check("a", Signal())
+        repeat = Signal({"key": "a"})
+        dedup.check("a", repeat)
+        dedup.check("b", Signal())
+        signal = Signal()
+        self.assertEqual(dedup.check("c", signal), [repeat, signal])
+        self.assertEqual(repeat.suppressed, 1)
+        self.assertEqual(dedup.stats()["windows"], 2)
+
+    def test_force_expire(self, monotonic):
+        monotonic.return_value = 0
+        dedup = TrapDeduplicator(10)
+        dedup.check("key", Signal())
+        dedup.check("key", Signal())
+        self.assertEqual(dedup.expire(), [])
+        self.assertEqual(len(dedup.expire(force=True)), 1)
@@ -0,0 +1,71 @@
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..trap_router import OidTrie, TrapRouter, Route, v1_trap_oid, \
+    TRAP_OID, ENTERPRISE, VAR_BIND, SOURCE
+
+LINK_DOWN = (1, 3, 6, 1, 6, 3, 1, 1, 5, 3)
+IF_INDEX = (1, 3, 6, 1, 2, 1, 2, 2, 1, 1)
+CISCO = (1, 3, 6, 1, 4, 1, 9)
+
+
+class TestOidTrie(NIOBlockTestCase):
+
+    def test_matches(self):
+        """ Every prefix of an OID is found, shortest first """
+        trie = OidTrie()
+        trie.add((1, 3, 6), "org")
+        trie.add((1, 3, 6, 1, 4), "private")
+        trie.add((1, 3, 6, 1, 4), "private again")
+        trie.add((1, 3, 7), "other")
+        self.assertEqual(trie.size, 3)
+        self.assertEqual(trie.matches((1, 3, 6, 1, 4, 1, 9)),
+                         ["org", "private again"])
+        self.assertEqual(trie.matches((1, 3, 6)), ["org"])
+        self.assertEqual(trie.matches((1, 3)), [])
+        self.assertEqual(trie.get((1, 3, 7)), "other")
+        self.assertIsNone(trie.get((1, 3)))
+        trie.add((), "everything")
+        self.assertEqual(trie.matches((2,)), ["everything"])
+
+
+class TestTrapRouter(NIOBlockTestCase):
+
+    def test_first_rule_wins(self):
+        """ Of the rules matching a trap, the first configured wins """
+        router = TrapRouter([
+            (SOURCE, (10, 0, 0, 9), Route(None, True)),
+            (TRAP_OID, LINK_DOWN, Route("links", False)),
+            (ENTERPRISE, CISCO, Route("cisco", False)),
+            (VAR_BIND, IF_INDEX, Route("interfaces", False)),
+            (TRAP_OID, LINK_DOWN, Route("shadowed", False))])
+        self.assertEqual(
+            router.route("10.0.0.1", LINK_DOWN, None, [IF_INDEX + (7,)]),
+            Route("links", False))
+        self.assertEqual(
+            router.route("10.0.0.9", LINK_DOWN, None, [IF_INDEX + (7,)]),
+            Route(None, True))
+        self.assertEqual(
+            router.route("10.0.0.1", CISCO + (0, 1), CISCO, [IF_INDEX]),
+            Route("cisco", False))
+        self.assertEqual(
+            router.route("10.0.0.1", None, None, [(1, 3), IF_INDEX + (1,)]),
+            Route("interfaces", False))
+        # Unmatched, and IPv6 sources aren't matched
+        self.assertEqual(router.route("::1", (1, 3, 6), None, []),
+                         Route(None, False))
+        self.assertEqual(router.stats(), {
+            "routed": {"links": 1, "cisco": 1, "interfaces": 1,
+                       "shadowed": 0},
+            "dropped": 1,
+            "unmatched": 1})
+
+    def test_default_route(self):
+        """ Traps no rule matches take the default route """
+        router = TrapRouter([(SOURCE, (10,), Route("ten", False))],
+                            Route(None, True))
+        self.assertEqual(router.route("10.1.2.3"), Route("ten", False))
+        self.assertEqual(router.route("192.168.0.1"), Route(None, True))
+
+    def test_v1_trap_oid(self):
+        """ v1 traps are given the trap OID RFC 3584 translates them to """
+        self.assertEqual(v1_trap_oid(CISCO, 2, 0), LINK_DOWN)
+        self.assertEqual(v1_trap_oid(CISCO, 6, 17), CISCO + (0, 17))
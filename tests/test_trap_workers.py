@@ -0,0 +1,53 @@
+from threading import Event
+from unittest.mock import MagicMock
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..trap_workers import TrapWorkerPool
+
+
+class TestTrapWorkerPool(NIOBlockTestCase):
+
+    def test_items_are_handled(self):
+        """ Queued items are handed to the handler by the workers """
+        handler = MagicMock()
+        pool = TrapWorkerPool(handler, 2, 10)
+        pool.start()
+        for index in range(5):
+            self.assertTrue(pool.submit(("domain", "address", index)))
+        pool.stop()
+        self.assertEqual(handler.call_count, 5)
+        self.assertEqual(
+            sorted(args[2] for args, _ in handler.call_args_list),
+            list(range(5)))
+        stats = pool.stats()
+        self.assertEqual(stats["queued"], 5)
+        self.assertEqual(stats["handled"], 5)
+        self.assertEqual(stats["dropped"], 0)
+        self.assertEqual(stats["depth"], 0)
+
+    def test_full_queue_drops(self):
+        """ Items are dropped and counted once the queue is full """
+        release = Event()
+        handler = MagicMock(side_effect=lambda *args: release.wait(1))
+        pool = TrapWorkerPool(handler, 1, 2)
+        pool.start()
+        results = [pool.submit((index,)) for index in range(6)]
+        release.set()
+        pool.stop()
+        # One item may already be held by the worker, the queue holds two
+        self.assertIn(results.count(True), (2, 3))
+        self.assertEqual(pool.dropped, results.count(False))
+        self.assertEqual(pool.max_depth, 2)
+        self.assertEqual(handler.call_count, results.count(True))
+
+    def test_handler_errors(self):
+        """ Handler exceptions are logged and don't stop the worker """
+        logger = MagicMock()
+        handler = MagicMock(side_effect=[ValueError, None])
+        pool = TrapWorkerPool(handler, 1, 10, logger)
+        pool.start()
+        pool.submit((1,))
+        pool.submit((2,))
+        pool.stop()
+        self.assertEqual(pool.errors, 1)
+        self.assertEqual(pool.handled, 2)
+        self.assertEqual(logger.exception.call_count, 1)
@@ -0,0 +1,76 @@
+from pysnmp.entity import config
+from pysnmp.proto.rfc1902 import OctetString
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..usm_keys import UsmKeyCache
+
+ENGINE_ID = OctetString(hexValue="80004fb805766d35e13580")
+
+
+class TestUsmKeyCache(NIOBlockTestCase):
+
+    def _cache(self, max_size=10):
+        return UsmKeyCache(
+            "user", config.usmHMACSHAAuthProtocol, "authkey123",
+            config.usmAesCfb128Protocol, "privkey123", max_size)
+
+    def test_master_keys(self):
+        """ Pass phrases are hashed up front """
+        data = self._cache().user_data(("10.0.0.1", 161))
+        self.assertEqual(data.authKeyType, config.usmKeyTypeMaster)
+        self.assertEqual(data.privKeyType, config.usmKeyTypeMaster)
+        self.assertIsNone(data.securityEngineId)
+        self.assertEqual(
+            data.authKey,
+            config.authServices[config.usmHMACSHAAuthProtocol]
+            .hashPassphrase("authkey123"))
+
+    def test_localized_keys(self):
+        """ Keys are localized once an agent's engine ID is known """
+        cache = self._cache()
+        cache.learn(("10.0.0.1", 161), ENGINE_ID)
+        cache.learn(("10.0.0.2", 161), ENGINE_ID)
+        data = cache.user_data(("10.0.0.1", 161))
+        self.assertIs(cache.user_data(("10.0.0.2", 161)), data)
+        self.assertIs(cache.learn(("10.0.0.2", 161), ENGINE_ID), data)
+        self.assertEqual(data.authKeyType, config.usmKeyTypeLocalized)
+        self.assertEqual(data.securityEngineId, ENGINE_ID)
+        auth = config.authServices[config.usmHMACSHAAuthProtocol]
+        self.assertEqual(data.authKey, auth.localizeKey(
+            auth.hashPassphrase("authkey123"), ENGINE_ID))
+        priv = config.privServices[config.usmAesCfb128Protocol]
+        self.assertEqual(data.privKey, priv.localizeKey(
+            config.usmHMACSHAAuthProtocol,
+            priv.hashPassphrase(config.usmHMACSHAAuthProtocol, "privkey123"),
+            ENGINE_ID))
+        self.assertEqual(cache.stats(),
+                         {"agents": 2, "engines": 1, "learned": 2})
+
+    def test_changed_engine_id(self):
+        """ An agent's new engine ID replaces the old one """
+        cache = self._cache()
+        cache.learn(("10.0.0.1", 161), ENGINE_ID)
+        cache.learn(("10.0.0.1", 161), ENGINE_ID)
+        cache.learn(("10.0.0.1", 161), b"\x80\x00\x01")
+        self.assertEqual(
+            bytes(cache.user_data(("10.0.0.1", 161)).securityEngineId),
+            b"\x80\x00\x01")
+        self.assertEqual(cache.stats(),
+                         {"agents": 1, "engines": 1, "learned": 2})
+
+    def test_bounded_size(self):
+        """ Only max_size agents are kept """
+        cache = self._cache(2)
+        for index in range(3):
+            cache.learn(("10.0.0.{}".format(index), 161),
+                        b"\x80\x00" + bytes([index]))
+        self.assertEqual(cache.stats()["agents"], 2)
+        self.assertEqual(cache.stats()["engines"], 2)
+        self.assertEqual(
+            cache.user_data(("10.0.0.0", 161)).authKeyType,
+            config.usmKeyTypeMaster)
+
+    def test_no_auth(self):
+        """ Users without authentication have no keys """
+        data = UsmKeyCache("user").user_data(("10.0.0.1", 161))
+        self.assertIsNone(data.authKey)
+        self.assertEqual(data.authProtocol, config.usmNoAuthProtocol)
@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock
+from pysnmp.entity import config
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..usm_keys import UsmKeyCache
+from ..usm_receiver import UsmReceiver, V3_RECV_ID
+from .test_ber_decoder import encode_v3
+from .test_snmp_trap_block import TRAP
+
+ENGINE_ID = b'\x80\x00\x4f\xb8\x05\x01'
+AGENT = ('10.0.0.1', 5000)
+
+
+class TestUsmReceiver(NIOBlockTestCase):
+
+    def _receiver(self, max_engines=10):
+        self.key_cache = UsmKeyCache(
+            "user", config.usmHMACSHAAuthProtocol, "authkey123",
+            max_size=max_engines)
+        self.dispatcher = MagicMock()
+        return UsmReceiver(
+            self.dispatcher, [self.key_cache], MagicMock(),
+            max_engines=max_engines)
+
+    def test_routing(self):
+        """ v3 messages are routed to the engine, the rest to the block """
+        receiver = self._receiver()
+        self.dispatcher.registerRoutingCbFun.assert_called_once_with(
+            receiver.route)
+        self.assertEqual(
+            receiver.route(None, AGENT, encode_v3(ENGINE_ID)), V3_RECV_ID)
+        self.assertIsNone(receiver.route(None, AGENT, TRAP))
+        self.assertIsNone(receiver.route(None, AGENT, b'trash'))
+
+    def test_engine_ids(self):
+        """ Users are added once for each agent engine ID """
+        receiver = self._receiver()
+        for _ in range(3):
+            receiver.route(None, AGENT, encode_v3(ENGINE_ID))
+        # Discovery and informs don't add anything
+        receiver.route(None, AGENT, encode_v3(b''))
+        receiver.route(None, AGENT, encode_v3(receiver.engine_id))
+        self.assertEqual(receiver.stats(), {"engines": 1, "added": 1})
+        self.assertEqual(self.key_cache.stats()["engines"], 1)
+
+    def test_bounded_engine_ids(self):
+        """ The least recently seen engine IDs are removed """
+        receiver = self._receiver(max_engines=2)
+        for index in range(3):
+            receiver.route(None, AGENT, encode_v3(ENGINE_ID + bytes((index,))))
+        self.assertEqual(receiver.stats(), {"engines": 2, "added": 3})
+        receiver.route(None, AGENT, encode_v3(ENGINE_ID + b'\x00'))
+        self.assertEqual(receiver.stats(), {"engines": 2, "added": 4})
+
+    def test_shared_engine_id(self):
+        """ A receiver can be given the engine ID to use """
+        receiver = self._receiver()
+        other = UsmReceiver(MagicMock(), [self.key_cache], MagicMock(),
+                            receiver.engine_id)
+        self.assertEqual(other.engine_id, receiver.engine_id)
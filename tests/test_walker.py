@@ -0,0 +1,57 @@
+from pysnmp.proto.rfc1902 import Integer, ObjectName
+from pysnmp.proto.rfc1905 import endOfMibView
+from nio.testing.block_test_case import NIOBlockTestCase
+from ..walker import Walker
+
+
+def var_bind(oid, value=0):
+    return ObjectName(oid), Integer(value)
+
+
+class TestWalker(NIOBlockTestCase):
+
+    def test_subtree_boundary(self):
+        """ Columns stop at the end of their subtree """
+        walker = Walker([ObjectName("1.3.6.1.2.1.2.2.1.2"),
+                         ObjectName("1.3.6.1.2.1.2.2.1.3")])
+        self.assertEqual([str(name) for name, _ in walker.var_binds],
+                         ["1.3.6.1.2.1.2.2.1.2", "1.3.6.1.2.1.2.2.1.3"])
+        rows = walker.feed([
+            [var_bind("1.3.6.1.2.1.2.2.1.2.1"),
+             var_bind("1.3.6.1.2.1.2.2.1.3.1")],
+            [var_bind("1.3.6.1.2.1.2.2.1.2.2"),
+             var_bind("1.3.6.1.2.1.2.2.1.4.1")]])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(len(rows[0]), 2)
+        # The second column left its subtree, it isn't asked for anymore
+        self.assertEqual(len(rows[1]), 1)
+        self.assertEqual([str(name) for name, _ in walker.var_binds],
+                         ["1.3.6.1.2.1.2.2.1.2.2"])
+        self.assertFalse(walker.done)
+        rows = walker.feed([[var_bind("1.3.6.1.2.1.2.2.1.2.3")],
+                            [("1.3.6.1.2.1.2.2.1.2.3", endOfMibView)]])
+        self.assertEqual(len(rows), 1)
+        self.assertTrue(walker.done)
+        self.assertEqual(walker.rows, 3)
+
+    def test_non_repeaters(self):
+        """ Non repeaters are only fetched with the first request """
+        walker = Walker([ObjectName("1.3.6.1.2.1.1.3"),
+                         ObjectName("1.3.6.1.2.1.2.2.1.2")], 1)
+        self.assertEqual(walker.non_repeaters, 1)
+        rows = walker.feed([
+            [var_bind("1.3.6.1.2.1.1.3.0"),
+             var_bind("1.3.6.1.2.1.2.2.1.2.1")],
+            [var_bind("1.3.6.1.2.1.1.3.0"),
+             var_bind("1.3.6.1.2.1.2.2.1.2.2")]])
+        self.assertEqual([len(row) for row in rows], [2, 1])
+        self.assertEqual(walker.non_repeaters, 0)
+        self.assertEqual([str(name) for name, _ in walker.var_binds],
+                         ["1.3.6.1.2.1.2.2.1.2.2"])
+
+    def test_not_increasing(self):
+        """ An agent returning the same OID doesn't loop forever """
+        walker = Walker([ObjectName("1.3.6.1.2.1.1")])
+        walker.feed([[var_bind("1.3.6.1.2.1.1.1.0")]])
+        self.assertEqual(walker.feed([[var_bind("1.3.6.1.2.1.1.1.0")]]), [])
+        self.assertTrue(walker.done)
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+class TransportCache(object):
+
+    """ A bounded, least recently used cache of SNMP transport targets
+
+    Building a transport target resolves the agent's host name, so targets
+    are kept around and only rebuilt once they are older than the TTL, which
+    lets DNS changes still be picked up.
+    """
+
+    def __init__(self, max_size, ttl):
+        """ Create a cache
+
+        Args:
+            max_size (int): maximum number of targets kept, 0 disables caching
+            ttl (float): seconds a target is kept before being rebuilt
+        """
+        self._max_size = max_size
+        self._ttl = ttl
+        self._targets = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, factory):
+        """ Get the target for a key, building it with factory if needed
+
+        Args:
+            key (tuple): anything that identifies the target, usually
+                (host, port, timeout, retries)
+            factory (callable): builds the target when it isn't cached
+
+        Returns:
+            the transport target
+        """
+        now = monotonic()
+        with self._lock:
+            entry = self._targets.get(key)
+            if entry is not None:
+                created, target = entry
+                if now - created < self._ttl:
+                    self._targets.move_to_end(key)
+                    self.hits += 1
+                    return target
+                del self._targets[key]
+                self.expirations += 1
+            self.misses += 1
+
+        # Resolve outside of the lock so a slow lookup doesn't hold up others
+        target = factory()
+        if self._max_size <= 0:
+            return target
+        with self._lock:
+            self._targets[key] = (now, target)
+            self._targets.move_to_end(key)
+            while len(self._targets) > self._max_size:
+                self._targets.popitem(last=False)
+                self.evictions += 1
+        return target
+
+    def clear(self):
+        with self._lock:
+            self._targets.clear()
+
+    def stats(self):
+        """ Returns a dictionary of the cache's counters """
+        return {
+            "size": len(self._targets),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
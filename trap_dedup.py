@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+class _Window(object):
+
+    __slots__ = ["started", "suppressed", "last"]
+
+    def __init__(self, started):
+        self.started = started
+        self.suppressed = 0
+        self.last = None
+
+
+class TrapDeduplicator(object):
+
+    """ Suppresses repeats of a trap within a time window
+
+    The first trap of a key is let through and starts a window, repeats of
+    it during the window are held back and counted. Once the window is over
+    the last repeat is let through with the number of suppressed traps, so
+    the latest state of a flapping agent is never lost. Only max_keys windows
+    are kept, the least recently seen is closed early to make room.
+    """
+
+    def __init__(self, window, max_keys=10000):
+        """ Create a deduplicator
+
+        Args:
+            window (float): seconds repeats of a trap are suppressed for
+            max_keys (int): most windows open at once
+        """
+        self._window = window
+        self._max_keys = max_keys
+        self._windows = OrderedDict()
+        self._lock = Lock()
+        self.suppressed = 0
+
+    def check(self, key, signal):
+        """ Check a trap signal against the open windows
+
+        Args:
+            key (tuple): what identifies repeats of the trap
+            signal (Signal): the trap's signal
+
+        Returns:
+            list: the signals to notify now, given a suppressed count
+        """
+        now = monotonic()
+        signals = []
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None and now - window.started < self._window:
+                window.suppressed += 1
+                window.last = signal
+                self._windows.move_to_end(key)
+                self.suppressed += 1
+                return signals
+            # A window that is over, but wasn't expired yet, is replaced by
+            # this newer trap which carries its count
+            signal.suppressed = window.suppressed if window else 0
+            self._windows[key] = _Window(now)
+            self._windows.move_to_end(key)
+            while len(self._windows) > self._max_keys:
+                _, evicted = self._windows.popitem(last=False)
+                if evicted.suppressed:
+                    signals.append(self._summary(evicted))
+        signals.append(signal)
+        return signals
+
+    def expire(self, force=False):
+        """ Close the windows that are over
+
+        Args:
+            force (bool): close every window, over or not
+
+        Returns:
+            list: the last repeat of each closed window that had any
+        """
+        now = monotonic()
+        signals = []
+        with self._lock:
+            for key, window in list(self._windows.items()):
+                if force or now - window.started >= self._window:
+                    del self._windows[key]
+                    if window.suppressed:
+                        signals.append(self._summary(window))
+        return signals
+
+    @staticmethod
+    def _summary(window):
+        window.last.suppressed = window.suppressed
+        return window.last
+
+    def stats(self):
+        """ Returns a dictionary of the deduplicator's counters """
+        return {
+            "windows": len(self._windows),
+            "suppressed": self.suppressed
+        }
@@ -0,0 +1,159 @@
+from collections import namedtuple
+from threading import Lock
+
+from . import oids
+
+# Where a rule looks for its prefix
+TRAP_OID = "trap_oid"
+ENTERPRISE = "enterprise"
+VAR_BIND = "var_bind"
+SOURCE = "source"
+
+# snmpTraps, the parent of the trap OIDs of the v1 generic traps
+SNMP_TRAPS = (1, 3, 6, 1, 6, 3, 1, 1, 5)
+# snmpTrapOID.0, the var bind naming a v2c notification
+SNMP_TRAP_OID = (1, 3, 6, 1, 6, 3, 1, 1, 4, 1, 0)
+
+# name: set as the route of the trap's signals, if any
+# drop: whether the trap is dropped instead of notified
+Route = namedtuple('Route', ['name', 'drop'])
+
+
+def v1_trap_oid(enterprise, generic, specific):
+    """ The snmpTrapOID of a v1 trap, as RFC 3584 translates it """
+    if 0 <= generic < 6:
+        return SNMP_TRAPS + (generic + 1,)
+    return tuple(enterprise) + (0, specific)
+
+
+class OidTrie(object):
+
+    """ Values kept under OID prefixes, found by the OIDs below them
+
+    Each node is a dict of its children by sub-identifier, with the value
+    of its prefix under the None key, so a lookup is a dict lookup per
+    sub-identifier of the OID looked up.
+    """
+
+    def __init__(self):
+        self._root = {}
+        self.size = 0
+
+    def add(self, prefix, value):
+        """ Keep a value under a prefix, replacing the one it had """
+        node = self._root
+        for arc in prefix:
+            node = node.setdefault(arc, {})
+        if None not in node:
+            self.size += 1
+        node[None] = value
+
+    def get(self, prefix, default=None):
+        """ The value kept under exactly this prefix """
+        node = self._root
+        for arc in prefix:
+            node = node.get(arc)
+            if node is None:
+                return default
+        return node.get(None, default)
+
+    def matches(self, oid):
+        """ The values of every prefix of oid, shortest prefix first """
+        node = self._root
+        values = []
+        if None in node:
+            values.append(node[None])
+        for arc in oid:
+            node = node.get(arc)
+            if node is None:
+                break
+            if None in node:
+                values.append(node[None])
+        return values
+
+
+class TrapRouter(object):
+
+    """ Picks the route of a trap from OID subtree rules
+
+    Rules are compiled into a trie for each of the trap OID, the enterprise,
+    the var bind OIDs and the source address of a trap, an IPv4 address
+    being a prefix like any OID. Of the rules matching a trap, the first one
+    configured wins, and traps no rule matches take the default route.
+    """
+
+    def __init__(self, rules, default=Route(None, False)):
+        """ Compile the rules
+
+        Args:
+            rules (list): (match, prefix, route) tuples, where match is
+                TRAP_OID, ENTERPRISE, VAR_BIND or SOURCE, prefix an OID
+                tuple and route a Route
+            default (Route): the route of traps no rule matches
+        """
+        self._tries = {match: OidTrie()
+                       for match in (TRAP_OID, ENTERPRISE, VAR_BIND, SOURCE)}
+        self._routes = []
+        for match, prefix, route in rules:
+            trie = self._tries[match]
+            # An earlier rule with the same prefix wins
+            if trie.get(prefix) is None:
+                trie.add(prefix, len(self._routes))
+            self._routes.append(route)
+        self._default = default
+        self._counts = [0] * len(self._routes)
+        self._lock = Lock()
+        self.unmatched = 0
+
+    def route(self, source=None, trap_oid=None, enterprise=None,
+              var_bind_oids=()):
+        """ The route of a trap
+
+        Args:
+            source (str): the address the trap came from
+            trap_oid (tuple): the snmpTrapOID of the trap
+            enterprise (tuple): the enterprise of a v1 trap
+            var_bind_oids (iterable): the OIDs of the trap's var binds
+
+        Returns:
+            Route: of the first rule matching the trap, or the default
+        """
+        indexes = []
+        if source is not None and self._tries[SOURCE].size:
+            try:
+                address = oids.to_tuple(source)
+            except ValueError:
+                # Only IPv4 addresses are matched
+                address = None
+            if address is not None:
+                indexes.extend(self._tries[SOURCE].matches(address))
+        if trap_oid is not None:
+            indexes.extend(self._tries[TRAP_OID].matches(trap_oid))
+        if enterprise is not None:
+            indexes.extend(self._tries[ENTERPRISE].matches(enterprise))
+        var_binds = self._tries[VAR_BIND]
+        if var_binds.size:
+            for oid in var_bind_oids:
+                indexes.extend(var_binds.matches(oid))
+        with self._lock:
+            if not indexes:
+                self.unmatched += 1
+                return self._default
+            index = min(indexes)
+            self._counts[index] += 1
+        return self._routes[index]
+
+    def stats(self):
+        """ Returns a dictionary of the router's counters """
+        routed = {}
+        dropped = 0
+        for route, count in zip(self._routes, self._counts):
+            if route.drop:
+                dropped += count
+            else:
+                routed[route.name] = routed.get(route.name, 0) + count
+        return {
+            "routed": routed,
+            "dropped": dropped,
+            "unmatched": self.unmatched
+        }
@@ -0,0 +1,91 @@
+from queue import Queue, Full
+from threading import Lock
+from nio.util.threading import spawn
+
+
+class TrapWorkerPool(object):
+
+    """ Hands received traps off to worker threads through a bounded queue
+
+    The thread reading the socket only has to queue each datagram, so it gets
+    back to the socket right away. Once the queue is full traps are dropped
+    and counted instead of blocking the reading thread.
+    """
+
+    def __init__(self, handler, workers, queue_size, logger=None):
+        """ Create a pool
+
+        Args:
+            handler (callable): called by a worker with each queued item
+            workers (int): number of worker threads
+            queue_size (int): most items waiting on a worker, 0 for no limit
+            logger: where to log exceptions raised by handler
+        """
+        self._handler = handler
+        self._workers = workers
+        self._queue = Queue(maxsize=queue_size)
+        self._logger = logger
+        self._threads = []
+        self._lock = Lock()
+        self.queued = 0
+        self.dropped = 0
+        self.handled = 0
+        self.errors = 0
+        self.max_depth = 0
+
+    def start(self):
+        self._threads = [spawn(self._work) for _ in range(self._workers)]
+
+    def stop(self):
+        """ Stop the workers once they've handled what's already queued """
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, item):
+        """ Queue an item for the workers
+
+        Returns:
+            bool: False if the queue was full and the item was dropped
+        """
+        try:
+            self._queue.put_nowait(item)
+        except Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        depth = self._queue.qsize()
+        with self._lock:
+            self.queued += 1
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return True
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._handler(*item)
+            except:
+                with self._lock:
+                    self.errors += 1
+                if self._logger:
+                    self._logger.exception("Unable to handle trap")
+            with self._lock:
+                self.handled += 1
+
+    def stats(self):
+        """ Returns a dictionary of the pool's counters """
+        return {
+            "workers": self._workers,
+            "depth": self._queue.qsize(),
+            "max_depth": self.max_depth,
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "handled": self.handled,
+            "errors": self.errors
+        }
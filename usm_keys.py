@@ -0,0 +1,125 @@
+from collections import OrderedDict
+from threading import Lock
+from pysnmp.entity import config
+from pysnmp.hlapi import UsmUserData
+from pysnmp.proto.rfc1902 import OctetString
+
+
+class UsmKeyCache(object):
+
+    """ Keeps the SNMPv3 keys of a USM user, and the engine ID of each agent
+
+    Turning a pass phrase into a key hashes a megabyte of data, and pysnmp
+    does it again for every SNMP engine the user is added to. The pass
+    phrases are hashed once here instead, and once the engine ID of an agent
+    is known its keys are localized once too, so engines are handed keys
+    that are ready to use. Only max_size agents are kept, the least recently
+    used are forgotten.
+    """
+
+    def __init__(self, user, auth_protocol=config.usmNoAuthProtocol,
+                 auth_key=None, priv_protocol=config.usmNoPrivProtocol,
+                 priv_key=None, max_size=10000):
+        """ Create a cache for a user
+
+        Args:
+            user (str): the USM user name
+            auth_protocol (tuple): pysnmp's ID of the authentication protocol
+            auth_key (str): the authentication pass phrase
+            priv_protocol (tuple): pysnmp's ID of the privacy protocol
+            priv_key (str): the privacy pass phrase
+            max_size (int): most agents kept track of
+        """
+        self._user = user
+        self._auth_protocol = auth_protocol
+        self._priv_protocol = priv_protocol
+        self._auth_master = self._priv_master = None
+        if auth_protocol != config.usmNoAuthProtocol:
+            self._auth_master = config.authServices[
+                auth_protocol].hashPassphrase(auth_key or '')
+        if priv_protocol != config.usmNoPrivProtocol:
+            self._priv_master = config.privServices[
+                priv_protocol].hashPassphrase(auth_protocol, priv_key or '')
+        self._max_size = max_size
+        self._agents = OrderedDict()
+        self._localized = {}
+        self._lock = Lock()
+        self.learned = 0
+        # Until an agent's engine ID is known, engines localize the keys
+        self._master_data = self._user_data()
+
+    def _user_data(self, engine_id=None):
+        if engine_id is None:
+            key_type = config.usmKeyTypeMaster
+            auth_key, priv_key = self._auth_master, self._priv_master
+        else:
+            key_type = config.usmKeyTypeLocalized
+            engine_id = OctetString(engine_id)
+            auth_key, priv_key = self._localize(engine_id)
+        return UsmUserData(
+            self._user, auth_key, priv_key,
+            authProtocol=self._auth_protocol,
+            privProtocol=self._priv_protocol,
+            securityEngineId=engine_id,
+            authKeyType=key_type, privKeyType=key_type)
+
+    def _localize(self, engine_id):
+        auth_key = priv_key = None
+        if self._auth_master is not None:
+            auth_key = config.authServices[self._auth_protocol].localizeKey(
+                self._auth_master, engine_id)
+        if self._priv_master is not None:
+            priv_key = config.privServices[self._priv_protocol].localizeKey(
+                self._auth_protocol, self._priv_master, engine_id)
+        return auth_key, priv_key
+
+    def user_data(self, agent):
+        """ The UsmUserData to make requests to an agent with
+
+        Args:
+            agent (tuple): the agent's transport address
+
+        Returns:
+            UsmUserData: with keys localized for the agent's engine once its
+                engine ID is known, master keys until then
+        """
+        with self._lock:
+            engine_id = self._agents.get(agent)
+            if engine_id is None:
+                return self._master_data
+            self._agents.move_to_end(agent)
+            return self._localized[engine_id]
+
+    def learn(self, agent, engine_id):
+        """ Remember the engine ID an agent was found to have, replacing the
+        one it had if it changed
+
+        Returns:
+            UsmUserData: with keys localized for the engine ID
+        """
+        engine_id = bytes(engine_id)
+        with self._lock:
+            if self._agents.get(agent) == engine_id:
+                self._agents.move_to_end(agent)
+                return self._localized[engine_id]
+            self.learned += 1
+            if engine_id not in self._localized:
+                self._localized[engine_id] = self._user_data(engine_id)
+            self._agents[agent] = engine_id
+            self._agents.move_to_end(agent)
+            while len(self._agents) > self._max_size:
+                self._agents.popitem(last=False)
+            # Drop the keys of engines no agent has anymore
+            if len(self._localized) > len(self._agents):
+                engine_ids = set(self._agents.values())
+                for unused in set(self._localized) - engine_ids:
+                    del self._localized[unused]
+            return self._localized[engine_id]
+
+    def stats(self):
+        """ Returns a dictionary of the cache's counters """
+        return {
+            "agents": len(self._agents),
+            "engines": len(self._localized),
+            "learned": self.learned
+        }
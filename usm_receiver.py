@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from pysnmp.entity import config, engine
+from pysnmp.entity.rfc3413 import ntfrcv
+from pysnmp.proto.api import v2c
+
+from . import ber_decoder
+
+# The receive callback id SNMPv3 messages are routed to
+V3_RECV_ID = "v3"
+
+
+class UsmReceiver(object):
+
+    """ Receives the SNMPv3 notifications of a transport dispatcher
+
+    The dispatcher's SNMPv3 messages are handed to a pysnmp engine, which
+    authenticates and decrypts them, and acknowledges informs, while other
+    messages go on to the dispatcher's own receive callback.
+
+    A trap is authenticated with keys localized for the engine ID of the
+    agent that sent it, and pysnmp only looks for a user configured for that
+    engine ID. So the engine ID of each message is read before the engine
+    gets it, and the first time one is seen the users are added for it with
+    keys the UsmKeyCaches localized once. Only max_engines engine IDs are
+    kept, the least recently seen are removed from the engine.
+    """
+
+    def __init__(self, transport_dispatcher, key_caches, callback,
+                 engine_id=None, max_engines=10000):
+        """ Create a receiver
+
+        Args:
+            transport_dispatcher: the dispatcher messages are received on
+            key_caches (list): a UsmKeyCache for each user
+            callback (callable): called with the transport domain, transport
+                address and PDU of every notification
+            engine_id (bytes): the receiver's engine ID, generated if None
+            max_engines (int): most agent engine IDs kept track of
+        """
+        self._key_caches = key_caches
+        self._callback = callback
+        self._max_engines = max_engines
+        self._engine_ids = OrderedDict()
+        self.added = 0
+        self.snmp_engine = engine.SnmpEngine(
+            v2c.OctetString(engine_id) if engine_id is not None else None)
+        self.engine_id = bytes(self.snmp_engine.snmpEngineID)
+        # Informs are sent to the receiver's engine, pysnmp localizes the
+        # master keys for it
+        self._users = [key_cache.user_data(None) for key_cache in key_caches]
+        for data in self._users:
+            self._add_user(data, None)
+        self._receiver = ntfrcv.NotificationReceiver(
+            self.snmp_engine, self._on_notification)
+        self.snmp_engine.registerTransportDispatcher(
+            transport_dispatcher, V3_RECV_ID)
+        transport_dispatcher.registerRoutingCbFun(self.route)
+
+    def _add_user(self, data, engine_id):
+        key_type = config.usmKeyTypeMaster if engine_id is None \
+            else config.usmKeyTypeLocalized
+        config.addV3User(
+            self.snmp_engine, data.userName,
+            data.authProtocol, data.authKey, data.privProtocol, data.privKey,
+            securityEngineId=data.securityEngineId,
+            authKeyType=key_type, privKeyType=key_type)
+
+    def route(self, transport_domain, transport_address, whole_msg):
+        """ The dispatcher's routing callback
+
+        Returns:
+            V3_RECV_ID for SNMPv3 messages, None for anything else
+        """
+        if ber_decoder.message_version(whole_msg) != 3:
+            return None
+        engine_id = ber_decoder.usm_engine_id(whole_msg)
+        # Discovery messages have no engine ID, pysnmp answers those
+        if engine_id and engine_id != self.engine_id:
+            self._learn(transport_address, engine_id)
+        return V3_RECV_ID
+
+    def _learn(self, transport_address, engine_id):
+        if engine_id in self._engine_ids:
+            self._engine_ids.move_to_end(engine_id)
+            return
+        for key_cache in self._key_caches:
+            self._add_user(
+                key_cache.learn(transport_address[0], engine_id), engine_id)
+        self.added += 1
+        self._engine_ids[engine_id] = True
+        while len(self._engine_ids) > self._max_engines:
+            forgotten, _ = self._engine_ids.popitem(last=False)
+            for data in self._users:
+                config.delV3User(self.snmp_engine, data.userName,
+                                 securityEngineId=v2c.OctetString(forgotten))
+
+    def _on_notification(self, snmp_engine, state_reference,
+                         context_engine_id, context_name, var_binds, cb_ctx):
+        """ pysnmp's callback, after an inform has been acknowledged """
+        context = snmp_engine.observer.getExecutionContext(
+            'rfc3412.receiveMessage:request')
+        self._callback(context['transportDomain'],
+                       context['transportAddress'], context['pdu'])
+
+    def close(self):
+        transport_dispatcher = self.snmp_engine.transportDispatcher
+        self._receiver.close(self.snmp_engine)
+        self.snmp_engine.unregisterTransportDispatcher(V3_RECV_ID)
+        transport_dispatcher.unregisterRoutingCbFun()
+
+    def stats(self):
+        """ Returns a dictionary of the receiver's counters """
+        return {
+            "engines": len(self._engine_ids),
+            "added": self.added
+        }
@@ -0,0 +1,94 @@
+from time import monotonic
+from pyasn1.type.univ import Null
+from pysnmp.proto import rfc1905
+
+from . import oids
+
+
+# Values an agent returns once a column has no more rows
+END_OF_COLUMN = (Null.tagSet,
+                 rfc1905.NoSuchObject.tagSet,
+                 rfc1905.NoSuchInstance.tagSet,
+                 rfc1905.EndOfMibView.tagSet)
+
+
+def var_bind_oid(var_bind):
+    """ The ObjectName of a var bind, whether or not it was resolved """
+    name = var_bind[0]
+    return name.getOid() if hasattr(name, 'getOid') else name
+
+
+class Walker(object):
+
+    """ Keeps track of the columns of a walk that are still in their subtree
+
+    A walk asks for the var binds of every unfinished column, hands each
+    response's table to feed, and stops once done is True. Columns are
+    dropped from the walk as soon as they leave their subtree, so they aren't
+    requested any further.
+    """
+
+    def __init__(self, roots, non_repeaters=0):
+        """ Create a walk of the given subtrees
+
+        Args:
+            roots (list): ObjectName of each subtree to walk
+            non_repeaters (int): the first columns that are only fetched once
+        """
+        self._names = list(roots)
+        # Names are compared as tuples, much faster than as ObjectNames
+        self._roots = [root.asTuple() for root in roots]
+        self._last_oids = list(self._roots)
+        self.non_repeaters = min(non_repeaters, len(self._roots))
+        self.rows = 0
+        self.started = monotonic()
+
+    @property
+    def done(self):
+        return not self._roots
+
+    @property
+    def var_binds(self):
+        """ The var binds to request next """
+        return [(name, Null('')) for name in self._names]
+
+    def feed(self, var_bind_table):
+        """ Take in the table of a response
+
+        Args:
+            var_bind_table (list): rows of var binds, one per requested column
+
+        Returns:
+            list: the rows of var binds that are inside of their subtrees
+        """
+        finished = set()
+        rows = []
+        for table_row in var_bind_table:
+            row = []
+            for col, var_bind in enumerate(table_row[:len(self._roots)]):
+                if col in finished:
+                    continue
+                name = var_bind_oid(var_bind)
+                oid = oids.as_tuple(name)
+                if var_bind[1].tagSet in END_OF_COLUMN or \
+                        not oids.is_prefix(self._roots[col], oid) or \
+                        oid <= self._last_oids[col]:
+                    finished.add(col)
+                    continue
+                row.append(var_bind)
+                self._names[col] = name
+                self._last_oids[col] = oid
+                if col < self.non_repeaters:
+                    finished.add(col)
+            if row:
+                rows.append(row)
+        if not rows:
+            # Nothing new came back, there is nothing left to ask for
+            finished.update(range(len(self._roots)))
+        keep = [col for col in range(len(self._roots)) if col not in finished]
+        self.non_repeaters = 0
+        self._roots = [self._roots[col] for col in keep]
+        self._names = [self._names[col] for col in keep]
+        self._last_oids = [self._last_oids[col] for col in keep]
+        self.rows += len(rows)
+        return rows